@@ -5,10 +5,20 @@ from sqlalchemy import inspect
 
 
 from config import config
+from controllers.job_controller import JobController
 from controllers.search_controller import SearchController
+from data.migrations import SchemaUpgradeError, upgrade_schema
 from data.models import db
+from data.partitioning import get_partitioner
+from data.versions import get_data_version_tracker
 from scripts.data_importer import DataImporter
+from services.container import get_services
+from utils import metrics
+from utils.admission import register_admission_control
+from utils.compression import register_compression
 from utils.logger import setup_logging
+from utils.profiling import register_profiling
+from utils.serialization import dumps
 
 
 def create_app(config_name=None):
@@ -27,13 +37,23 @@ def create_app(config_name=None):
 
     register_routes(app)
 
+    register_profiling(app)
+
+    register_admission_control(app)
+
+    register_compression(app)
+
     initialize_data(app)
 
+    warm_caches(app)
+
     return app
 
 
 def register_routes(app):
-    search_controller = SearchController(app.config)
+    services = get_services(app)
+    search_controller = SearchController(app.config, services)
+    job_controller = JobController(app.config, services)
 
     @app.route("/", methods=["GET", "POST"])
     def index():
@@ -42,6 +62,35 @@ def register_routes(app):
         else:
             return search_controller.handle_search_page()
 
+    @app.route("/api/estimate", methods=["GET", "POST"])
+    def api_estimate():
+        return search_controller.handle_api_request()
+
+    @app.route("/api/trend", methods=["GET"])
+    def api_trend():
+        return search_controller.handle_trend_request()
+
+    @app.route("/jobs", methods=["GET"])
+    def job_list():
+        return job_controller.handle_job_list()
+
+    @app.route("/jobs/<int:job_id>", methods=["GET"])
+    def job_status(job_id):
+        return job_controller.handle_job_status(job_id)
+
+    @app.route("/admin/rebuild", methods=["POST"])
+    def admin_rebuild():
+        return job_controller.handle_rebuild_request()
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_snapshot():
+        # Counters for this worker only
+        payload = {"counters": metrics.snapshot()}
+        admission = app.extensions.get("admission")
+        if admission is not None:
+            payload["admission"] = {"active": admission.active, "queued": admission.waiting}
+        return app.response_class(dumps(payload), mimetype="application/json")
+
     @app.errorhandler(404)
     def not_found(error):
         return render_template("404.html"), 404
@@ -55,28 +104,59 @@ def register_routes(app):
 def initialize_data(app):
     try:
         with app.app_context():
-            from data.models import Vehicle
-
             inspector = inspect(db.engine)
 
-            if 'vehicles' not in inspector.get_table_names():
-                db.create_all()
+            vehicles_missing = 'vehicles' not in inspector.get_table_names()
+            # Also adds any tables introduced since the database was created
+            db.create_all()
+            if vehicles_missing:
                 app.logger.info("Vehicle table created successfully")
-                if not Vehicle.query.first():
-                    importer = DataImporter(app.config)
-                    success = importer.import_inventory_data(app)
-
-                    if success:
-                        app.logger.info("Data initialization completed successfully")
-                    else:
-                        app.logger.error("Data initialization failed")
-                else:
-                    app.logger.info("Data already exists, skipping initialization")
+            upgrade_schema(app.config)
+
+            if app.config.get("IMPORT_MODE", "queue") == "inline":
+                importer = DataImporter(app.config)
+                success = importer.import_inventory_data(app)
 
+                if success:
+                    get_services(app).search_cache.clear()
+                    app.logger.info("Data initialization completed successfully")
+                else:
+                    app.logger.error("Data initialization failed")
+            elif not get_partitioner(app.config).has_data():
+                # Several workers may race here; the queue keeps a single active job
+                job, created = get_services(app).import_jobs.enqueue("import")
+                if created:
+                    app.logger.info(f"Queued initial data import as job {job.id}")
+            else:
+                app.logger.info("Data already exists, skipping initialization")
+
+    except SchemaUpgradeError:
+        # Every search would fail against the old schema, so don't start serving
+        raise
     except Exception as e:
         app.logger.error(f"Error during data initialization: {str(e)}")
 
 
+def warm_caches(app):
+    search_cache = get_services(app).search_cache
+    if search_cache.enabled and not search_cache.cache.shared:
+        # Entries warmed by the import worker are not visible here, so a newly
+        # published data version is warmed in this worker before it is served
+        with app.app_context():
+            get_data_version_tracker(app.config).prepare_with(
+                lambda version: search_cache.warm_up(app, version=version)
+            )
+
+    # Runs in every worker before it serves requests; without gunicorn --preload
+    # create_app runs once per worker, so each one starts warm
+    if not app.config.get("CACHE_WARMUP_ON_BOOT", True):
+        return
+    try:
+        search_cache.warm_up(app)
+    except Exception as e:
+        app.logger.error(f"Error warming search cache: {str(e)}")
+
+
 app = create_app()
 
 if __name__ == "__main__":
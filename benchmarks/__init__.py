@@ -0,0 +1,3 @@
+"""
+Benchmark scripts for measuring performance-sensitive paths.
+"""
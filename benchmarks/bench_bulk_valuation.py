@@ -0,0 +1,62 @@
+"""
+Throughput of the offline bulk valuation CLI: import a synthetic feed, then value
+a synthetic dealer inventory inline and across a process pool.
+
+Usage: python -m benchmarks.bench_bulk_valuation [--listings 100000] [--rows 1000000]
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+
+from benchmarks.common import make_app
+from benchmarks.synthetic_feed import MAKES_MODELS, generate_feed
+from data.models import db
+from scripts.bulk_valuation import BulkValuer
+from scripts.data_importer import DataImporter
+
+
+def write_inventory(path, rows, seed=11):
+    rng = random.Random(seed)
+    pairs = [(make, model) for make, models in MAKES_MODELS.items() for model in models]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["year", "make", "model", "mileage"])
+        for _ in range(rows):
+            make, model = rng.choice(pairs)
+            writer.writerow([rng.randint(2005, 2023), make, model, rng.randrange(0, 200000, 500)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=100000)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    app = make_app(MIN_YEAR=2000, MAX_YEAR=2024, SEARCH_CACHE_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        DataImporter(app.config)._process_and_store_data(
+            generate_feed(args.listings, invalid_rate=0.0, min_year=2005, max_year=2022), app
+        )
+
+    fd, input_path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    write_inventory(input_path, args.rows)
+    output_path = input_path + ".out.csv"
+
+    print(f"{'workers':10} {'seconds':>8} {'rows/s':>10} {'rows/min':>12}")
+    with app.app_context():
+        for workers in (0, args.workers):
+            summary = BulkValuer(app.config).run(input_path, output_path, workers, progress_stream=None)
+            print(f"{workers:<10} {summary['seconds']:>8.2f} {summary['rows_per_second']:>10,}"
+                  f" {summary['rows_per_second'] * 60:>12,}")
+
+    for path in (input_path, output_path, app.config["BENCH_DB_PATH"]):
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
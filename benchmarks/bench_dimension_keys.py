@@ -0,0 +1,135 @@
+"""
+Compare storage size and search latency of string make/model keys against the
+integer make_id/model_id dimension keys.
+
+Usage: python -m benchmarks.bench_dimension_keys [--rows 200000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+from benchmarks.common import make_app, percentile
+from benchmarks.synthetic_feed import generate_feed
+from data.models import Vehicle, db
+from scripts.data_importer import DataImporter
+from services.vehicle_service import VehicleService
+
+
+def object_sizes(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY name"
+    ).fetchall()
+    conn.close()
+    return dict(rows)
+
+
+def build_legacy_db(source_path, legacy_path):
+    conn = sqlite3.connect(legacy_path)
+    conn.execute(f"ATTACH DATABASE '{source_path}' AS src")
+    conn.execute(
+        "CREATE TABLE vehicles (id INTEGER PRIMARY KEY, vin VARCHAR(64), year INTEGER, "
+        "make VARCHAR(100), model VARCHAR(100), city VARCHAR(100), state VARCHAR(10), "
+        "listing_price FLOAT, listing_mileage INTEGER)"
+    )
+    conn.execute(
+        "INSERT INTO vehicles SELECT id, vin, year, make, model, city, state, "
+        "listing_price, listing_mileage FROM src.vehicles"
+    )
+    conn.execute(
+        "CREATE INDEX ix_vehicles_year_make_model_state ON vehicles (year, make, model, state)"
+    )
+    conn.commit()
+    conn.execute("DETACH DATABASE src")
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def latency(fn, keys):
+    samples = []
+    for key in keys:
+        start = time.perf_counter()
+        fn(*key)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentile(samples, 50), percentile(samples, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app()
+    source_path = app.config["BENCH_DB_PATH"]
+    legacy_path = source_path + ".legacy"
+    feed = generate_feed(args.rows, invalid_rate=0.0)
+
+    with app.app_context():
+        db.create_all()
+        DataImporter(app.config)._process_and_store_data(feed, app)
+        keys = [
+            (v.year, v.make, v.model)
+            for v in db.session.query(Vehicle.year, Vehicle.make, Vehicle.model).distinct()
+        ]
+    sqlite3.connect(source_path).execute("VACUUM")
+    build_legacy_db(source_path, legacy_path)
+
+    rng = random.Random(7)
+    query_keys = [rng.choice(keys) for _ in range(args.queries)]
+
+    legacy_sizes = object_sizes(legacy_path)
+    new_sizes = object_sizes(source_path)
+    index = "ix_vehicles_year_make_model_state"
+    storage = [
+        ("legacy index (year, make, model, state)", legacy_sizes[index]),
+        ("integer index (year, make_id, model_id, state)", new_sizes[index]),
+        ("makes + models dimension tables", new_sizes.get("makes", 0) + new_sizes.get("models", 0)),
+        ("legacy vehicles table", legacy_sizes["vehicles"]),
+        ("vehicles table with id columns", new_sizes["vehicles"]),
+    ]
+    print("storage (bytes)")
+    for label, size in storage:
+        print(f"  {label:<48} {size:>12,}")
+
+    legacy_conn = sqlite3.connect(legacy_path)
+    new_conn = sqlite3.connect(source_path)
+    id_lookup = dict(
+        ((make, model), (make_id, model_id))
+        for make, model, make_id, model_id in new_conn.execute(
+            "SELECT makes.name, models.name, makes.id, models.id "
+            "FROM models JOIN makes ON makes.id = models.make_id"
+        )
+    )
+
+    def legacy_query(year, make, model):
+        return legacy_conn.execute(
+            "SELECT * FROM vehicles WHERE year = ? AND make = ? AND model = ?",
+            (year, make, model),
+        ).fetchall()
+
+    def integer_query(year, make, model):
+        make_id, model_id = id_lookup[(make, model)]
+        return new_conn.execute(
+            "SELECT * FROM vehicles WHERE year = ? AND make_id = ? AND model_id = ?",
+            (year, make_id, model_id),
+        ).fetchall()
+
+    service = VehicleService(app.config)
+
+    print(f"\nquery latency over {args.queries} searches (ms, p50 / p95)")
+    print("  raw SQL, string keys:   %.3f / %.3f" % latency(legacy_query, query_keys))
+    print("  raw SQL, integer keys:  %.3f / %.3f" % latency(integer_query, query_keys))
+    with app.app_context():
+        print("  search_vehicles():      %.3f / %.3f" % latency(service.search_vehicles, query_keys))
+
+    legacy_conn.close()
+    new_conn.close()
+    os.unlink(legacy_path)
+    os.unlink(source_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare the per-row and columnar importer parse modes: validation alone, then
+a full import into SQLite, and check both modes reject the same rows.
+
+Usage: python -m benchmarks.bench_import_parse [--rows 200000] [--invalid-rate 0.05]
+"""
+import argparse
+import csv
+import os
+import time
+from collections import Counter
+from io import StringIO
+
+from benchmarks.common import make_app
+from benchmarks.synthetic_feed import generate_feed
+from data.models import db
+from scripts.data_importer import DataImporter
+from scripts.feed_parser import parse_columns, row_reject_reason
+
+
+def validate_rows(importer, feed):
+    rejects = Counter()
+    for row in csv.DictReader(StringIO(feed), delimiter="|"):
+        if importer._create_vehicle_from_row(row) is None:
+            rejects[row_reject_reason(row) or "error"] += 1
+    return rejects
+
+
+def validate_columnar(feed, chunk_size):
+    rejects = Counter()
+    reader = csv.reader(StringIO(feed), delimiter="|")
+    header = next(reader)
+    chunk = []
+    for row in reader:
+        if row:
+            chunk.append(row)
+        if len(chunk) >= chunk_size:
+            rejects.update(parse_columns(header, chunk)[2])
+            chunk = []
+    if chunk:
+        rejects.update(parse_columns(header, chunk)[2])
+    return rejects
+
+
+def full_import(feed, mode):
+    app = make_app(IMPORT_PARSE_MODE=mode, MIN_YEAR=2000, MAX_YEAR=2024)
+    importer = DataImporter(app.config)
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        importer._process_and_store_data(feed, app)
+        seconds = time.perf_counter() - start
+    os.unlink(app.config["BENCH_DB_PATH"])
+    return seconds, importer.reject_counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--invalid-rate", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    feed = generate_feed(args.rows, invalid_rate=args.invalid_rate, min_year=2000, max_year=2022)
+    importer = DataImporter(make_app().config)
+
+    start = time.perf_counter()
+    row_rejects = validate_rows(importer, feed)
+    row_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columnar_rejects = validate_columnar(feed, args.batch_size)
+    columnar_seconds = time.perf_counter() - start
+
+    print(f"{'validate only':16} {'seconds':>8} {'rows/s':>10}")
+    print(f"{'rows':16} {row_seconds:>8.2f} {args.rows / row_seconds:>10.0f}")
+    print(f"{'columnar':16} {columnar_seconds:>8.2f} {args.rows / columnar_seconds:>10.0f}")
+    print(f"rejects match: {row_rejects == columnar_rejects} {dict(row_rejects)}")
+    print()
+
+    print(f"{'full import':16} {'seconds':>8} {'rows/s':>10}")
+    results = {}
+    for mode in ("rows", "columnar"):
+        seconds, rejects = full_import(feed, mode)
+        results[mode] = rejects
+        print(f"{mode:16} {seconds:>8.2f} {args.rows / seconds:>10.0f}")
+    print(f"rejects match: {results['rows'] == results['columnar']}")
+
+
+if __name__ == "__main__":
+    main()
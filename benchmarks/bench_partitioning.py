@@ -0,0 +1,62 @@
+"""
+Compare import time and search latency with and without year partitioning
+(one table per year range on SQLite).
+
+Usage: python -m benchmarks.bench_partitioning [--rows 200000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import time
+
+from benchmarks.common import make_app, percentile
+from benchmarks.synthetic_feed import generate_feed
+from data.models import Vehicle, db
+from scripts.data_importer import DataImporter
+from services.vehicle_service import VehicleService
+
+
+def run(feed, partitioned, queries):
+    app = make_app(VEHICLE_PARTITIONING=partitioned, MIN_YEAR=2000, MAX_YEAR=2024)
+    importer = DataImporter(app.config)
+    service = VehicleService(app.config)
+
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        importer._process_and_store_data(feed, app)
+        import_seconds = time.perf_counter() - start
+
+        samples = []
+        for year, make, model in queries:
+            start = time.perf_counter()
+            service.search_vehicles(year, make, model)
+            samples.append((time.perf_counter() - start) * 1000)
+            db.session.remove()
+
+    os.unlink(app.config["BENCH_DB_PATH"])
+    return import_seconds, percentile(samples, 50), percentile(samples, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    feed = generate_feed(args.rows, invalid_rate=0.0, min_year=2000, max_year=2022)
+    rng = random.Random(7)
+    lines = feed.splitlines()[1:]
+    queries = []
+    for _ in range(args.queries):
+        fields = rng.choice(lines).split("|")
+        queries.append((int(fields[1]), fields[2], fields[3]))
+
+    print(f"{'layout':14} {'import s':>9} {'rows/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, partitioned in (("single table", False), ("partitioned", True)):
+        seconds, p50, p95 = run(feed, partitioned, queries)
+        print(f"{label:14} {seconds:>9.2f} {args.rows / seconds:>10.0f} {p50:>8.3f} {p95:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Per-request overhead of building services on every request against the shared
+ServiceContainer with its prepared search statements.
+
+Each request runs the body of a search: validate the mileage, load the
+listings and estimate a price, with the search cache off so the database is
+hit. Reports time and peak traced allocation per request.
+
+Usage: python -m benchmarks.bench_request_overhead [--listings 1000] [--requests 2000]
+"""
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+from sqlalchemy import select
+
+from benchmarks.common import make_app
+from benchmarks.synthetic_feed import MAKES_MODELS, generate_feed
+from data.dimensions import get_dimension_cache
+from data.models import db
+from scripts.data_importer import DataImporter
+from services.container import ServiceContainer
+
+
+def adhoc_search(services, year, make, model):
+    # What search_vehicles did before: a fresh select() for every search
+    make_id, model_id = get_dimension_cache().resolve(make, model)
+    source = services.vehicle_service.partitioner.entity_for_year(year)
+    return db.session.scalars(select(source).where(
+        source.year == year, source.make_id == make_id, source.model_id == model_id
+    )).all()
+
+
+def per_request(config, year, make, model, mileage):
+    services = ServiceContainer(config)
+    vehicles = adhoc_search(services, year, make, model)
+    return services.price_estimator.estimate_price(
+        vehicles, services.price_estimator.validate_mileage(mileage)
+    )
+
+
+def shared(services):
+    def handle(config, year, make, model, mileage):
+        vehicles = services.vehicle_service.search_vehicles(year, make, model)
+        return services.price_estimator.estimate_price(
+            vehicles, services.price_estimator.validate_mileage(mileage)
+        )
+    return handle
+
+
+def measure(handler, config, searches):
+    start = time.perf_counter()
+    for search in searches:
+        handler(config, *search)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    peaks = []
+    for search in searches[:200]:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        handler(config, *search)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return elapsed / len(searches) * 1e6, sum(peaks) / len(peaks) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app(MIN_YEAR=2000, MAX_YEAR=2024, SEARCH_CACHE_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        DataImporter(app.config)._process_and_store_data(
+            generate_feed(args.listings, invalid_rate=0.0, min_year=2015, max_year=2016), app
+        )
+
+        rng = random.Random(5)
+        pairs = [(make, model) for make, models in MAKES_MODELS.items() for model in models][:8]
+        searches = [
+            (rng.randint(2015, 2016), *rng.choice(pairs), f"{rng.randrange(5, 150)},000")
+            for _ in range(args.requests)
+        ]
+
+        handlers = [("per-request", per_request), ("shared", shared(ServiceContainer(app.config)))]
+        # Warm SQLAlchemy's compiled cache and the dimension cache for both
+        for _, handler in handlers:
+            for search in searches[:50]:
+                handler(app.config, *search)
+
+        print(f"{'services':12} {'us/request':>11} {'peak KiB/request':>17}")
+        for name, handler in handlers:
+            micros, kib = measure(handler, app.config, searches)
+            print(f"{name:12} {micros:>11.0f} {kib:>17.1f}")
+
+    os.unlink(app.config["BENCH_DB_PATH"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare payload size and serialization time of the results page against the
+full and compact JSON modes, with and without compression.
+
+Usage: python -m benchmarks.bench_response_payload [--listings 100] [--repeat 200]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import time
+
+from flask import Flask, render_template
+
+from utils.compression import brotli
+from utils.serialization import dumps, listings_to_columns, orjson
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+
+CITIES = [("Seattle", "WA"), ("Dallas", "TX"), ("Newark", "NJ"), ("Chicago", "IL"), ("Miami", "FL")]
+
+
+def make_listings(count):
+    rng = random.Random(42)
+    listings = []
+    for i in range(count):
+        city, state = rng.choice(CITIES)
+        listings.append({
+            "id": f"1HGBH41JXMN{100000 + i}",
+            "vehicle": "2015 toyota camry",
+            "price": float(rng.randrange(9000, 19000, 100)),
+            "mileage": rng.randrange(20000, 180000),
+            "location": f"{city}, {state}",
+        })
+    return listings
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    listings = make_listings(args.listings)
+    metadata = {"method": "regression", "vehicle_count": args.listings, "slope": -0.05,
+                "intercept": 18000.0, "r_squared": 0.71}
+    app = Flask(__name__, template_folder=TEMPLATE_DIR)
+
+    def render_html():
+        with app.test_request_context("/"):
+            return render_template(
+                "results.html", ymm="2015 Toyota Camry", mileage="80000",
+                estimated_price=14600, listings=listings, metadata=metadata,
+            ).encode("utf-8")
+
+    def full_stdlib():
+        return json.dumps({"ymm": "2015 Toyota Camry", "estimated_price": 14600,
+                           "metadata": metadata, "listings": listings}).encode("utf-8")
+
+    def full_json():
+        return dumps({"ymm": "2015 Toyota Camry", "estimated_price": 14600,
+                      "metadata": metadata, "listings": listings})
+
+    def compact_json():
+        return dumps({"ymm": "2015 Toyota Camry", "estimated_price": 14600,
+                      "method": "regression", "vehicle_count": args.listings,
+                      "listings": listings_to_columns(listings)})
+
+    cases = [
+        ("html (results.html)", render_html),
+        ("json full (stdlib)", full_stdlib),
+        (f"json full ({'orjson' if orjson else 'stdlib'})", full_json),
+        (f"json compact ({'orjson' if orjson else 'stdlib'})", compact_json),
+    ]
+
+    print(f"{'mode':32} {'raw B':>8} {'gzip B':>8} {'br B':>8} {'ser us':>9} {'gzip us':>9}")
+    for name, fn in cases:
+        body, ser_time = timed(fn, args.repeat)
+        gz, gz_time = timed(lambda: gzip.compress(body, compresslevel=6, mtime=0), args.repeat)
+        br_size = len(brotli.compress(body, quality=7)) if brotli else "-"
+        print(f"{name:32} {len(body):>8} {len(gz):>8} {br_size:>8} "
+              f"{ser_time * 1e6:>9.1f} {gz_time * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
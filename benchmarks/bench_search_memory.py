@@ -0,0 +1,66 @@
+"""
+Peak memory of summarizing one search as the group grows: loading every
+listing with .all() against the one-pass yield_per stream.
+
+Usage: python -m benchmarks.bench_search_memory [--sizes 10000,50000,200000]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from benchmarks.bench_streaming_results import load_group
+from benchmarks.common import make_app
+from data.models import db
+from services.price_stats import PriceStats
+from services.vehicle_service import VehicleService
+
+
+def materialized(service):
+    # What SearchCache computed before: every listing, then statistics and samples
+    vehicles = service.search_vehicles(2016, "Toyota", "Camry")
+    stats = PriceStats()
+    for vehicle in vehicles:
+        stats.add(vehicle.listing_price, vehicle.listing_mileage)
+    return {"vehicle_count": len(vehicles), "stats": stats.to_dict(),
+            "listings": service.get_sample_listings(vehicles)}
+
+
+def streamed(service):
+    return service.summarize_vehicles(2016, "Toyota", "Camry")
+
+
+def measure(fn, service):
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    summary = fn(service)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summary, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,50000,200000")
+    args = parser.parse_args()
+
+    print(f"{'listings':>9} {'mode':13} {'seconds':>8} {'peak MiB':>9}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        app = make_app(MIN_YEAR=2000, MAX_YEAR=2024)
+        with app.app_context():
+            db.create_all()
+            load_group(size)
+            service = VehicleService(app.config)
+            results = []
+            for name, fn in (("materialized", materialized), ("streamed", streamed)):
+                summary, elapsed, peak = measure(fn, service)
+                results.append(summary)
+                print(f"{size:>9} {name:13} {elapsed:>8.2f} {peak / 2**20:>9.1f}")
+            assert results[0] == results[1]
+        os.unlink(app.config["BENCH_DB_PATH"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+ORM statement construction and SQL compilation overhead on the search path.
+
+Runs the same one-group search against a small table, so the database work is
+constant and the differences come from building and compiling the statement:
+
+    legacy-query   Vehicle.query.filter_by(...), the pre-2.0 Query API
+    uncached       a fresh select() on an engine with the compiled cache off
+    select         a fresh select() per call; compiled once, cache key built per call
+    lambda_stmt    lambda_stmt(lambda: select(...)); construction is cached too
+    prepared       VehicleService's bound-parameter statement, built once
+
+It also times the importer's small-batch INSERTs with a fresh insert() per batch
+against the cached statement.
+
+Usage: python -m benchmarks.bench_statement_cache [--iterations 5000]
+"""
+import argparse
+import os
+
+from sqlalchemy import create_engine, func, insert, lambda_stmt, select
+
+from benchmarks.common import make_app, timed
+from benchmarks.synthetic_feed import generate_feed
+from data.dimensions import get_dimension_cache
+from data.models import Vehicle, db
+from scripts.data_importer import DataImporter
+from services.vehicle_service import VehicleService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    app = make_app(MIN_YEAR=2000, MAX_YEAR=2024)
+    with app.app_context():
+        db.create_all()
+        DataImporter(app.config)._process_and_store_data(
+            generate_feed(2000, invalid_rate=0.0, min_year=2010, max_year=2022), app
+        )
+        # A small group, so loading rows does not drown out statement overhead
+        year, make, model = db.session.execute(
+            select(Vehicle.year, Vehicle.make, Vehicle.model)
+            .group_by(Vehicle.year, Vehicle.make, Vehicle.model)
+            .having(func.count() >= 3)
+            .order_by(func.count())
+            .limit(1)
+        ).one()
+        make_id, model_id = get_dimension_cache().resolve(make, model)
+        uncached_engine = create_engine(db.engine.url, query_cache_size=0)
+        service = VehicleService(app.config)
+
+        variants = {
+            "legacy-query": lambda: Vehicle.query.filter_by(
+                year=year, make_id=make_id, model_id=model_id
+            ).all(),
+            "uncached": lambda: db.session.scalars(
+                select(Vehicle).where(
+                    Vehicle.year == year, Vehicle.make_id == make_id, Vehicle.model_id == model_id
+                ),
+                bind_arguments={"bind": uncached_engine},
+            ).all(),
+            "select": lambda: db.session.scalars(select(Vehicle).where(
+                Vehicle.year == year, Vehicle.make_id == make_id, Vehicle.model_id == model_id
+            )).all(),
+            "lambda_stmt": lambda: db.session.scalars(lambda_stmt(lambda: select(Vehicle).where(
+                Vehicle.year == year, Vehicle.make_id == make_id, Vehicle.model_id == model_id
+            ))).all(),
+            "prepared": lambda: service.search_vehicles(year, make, model),
+        }
+
+        print(f"{'search':14} {'us/call':>9} {'rows':>5}")
+        for name, fn in variants.items():
+            rows = len(fn())
+            _, seconds = timed(fn, args.iterations)
+            db.session.expunge_all()
+            print(f"{name:14} {seconds * 1e6:>9.0f} {rows:>5}")
+
+        table = Vehicle.__table__
+        rows = [
+            {"id": 10_000_000 + i, "vin": f"BENCH{i}", "year": year, "make": make, "model": model,
+             "make_id": make_id, "model_id": model_id, "state": "WA",
+             "listing_price": 15000.0, "listing_mileage": 40000}
+            for i in range(50)
+        ]
+        cached = insert(table)
+        inserts = {
+            "fresh insert": lambda: db.session.execute(insert(table), rows),
+            "cached insert": lambda: db.session.execute(cached, rows),
+        }
+        print(f"\n{'50-row batch':14} {'us/call':>9}")
+        for name, fn in inserts.items():
+            def run():
+                fn()
+                db.session.rollback()
+            _, seconds = timed(run, max(1, args.iterations // 10))
+            print(f"{name:14} {seconds * 1e6:>9.0f}")
+
+    os.unlink(app.config["BENCH_DB_PATH"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Time to first byte and peak memory of the results page for one large group,
+rendered whole against streamed from the aggregates and a yield_per cursor.
+
+Usage: python -m benchmarks.bench_streaming_results [--listings 100000]
+"""
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from benchmarks.common import make_app
+from controllers.search_controller import SearchController
+from data.dimensions import DimensionWriter
+from data.models import Vehicle, db
+from services.aggregate_builder import AggregateBuilder
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+
+def load_group(listings, seed=3):
+    rng = random.Random(seed)
+    make, make_id, model, model_id = DimensionWriter(db.session).get_ids("Toyota", "Camry")
+    rows = []
+    for i in range(listings):
+        mileage = rng.randrange(1000, 200000)
+        rows.append({
+            "id": i + 1, "vin": f"BENCH{i:08d}", "year": 2016, "make": make, "model": model,
+            "make_id": make_id, "model_id": model_id, "city": "Seattle", "state": "WA",
+            "listing_price": round(24000 - mileage * 0.06 + rng.gauss(0, 1500), 2),
+            "listing_mileage": mileage,
+        })
+    db.session.execute(insert(Vehicle), rows)
+    db.session.commit()
+
+
+def measure(app, min_listings):
+    app.config["STREAM_RESULTS_MIN_LISTINGS"] = min_listings
+    controller = SearchController(app.config)
+    form = {"year": "2016", "make": "Toyota", "model": "Camry", "mileage": "60000"}
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with app.test_request_context("/", method="POST", data=form):
+        result = controller.handle_search_request()
+        chunks = iter(result.response) if hasattr(result, "response") else iter([result])
+        first = next(chunks)
+        first_byte = time.perf_counter() - start
+        size = len(first) + sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte, total, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=100000)
+    args = parser.parse_args()
+
+    app = make_app(MIN_YEAR=2000, MAX_YEAR=2024, SEARCH_CACHE_ENABLED=False, QUERY_LOG_PATH=None,
+                   SECRET_KEY="bench")
+    app.template_folder = TEMPLATE_DIR
+    with app.app_context():
+        db.create_all()
+        load_group(args.listings)
+        AggregateBuilder(app.config).build()
+        db.session.commit()
+
+    print(f"{'mode':10} {'TTFB ms':>9} {'total ms':>9} {'peak MiB':>9} {'bytes':>8}")
+    for name, min_listings in (("buffered", 0), ("streamed", 1)):
+        with app.app_context():
+            first_byte, total, peak, size = measure(app, min_listings)
+        print(f"{name:10} {first_byte * 1000:>9.1f} {total * 1000:>9.1f} {peak / 2**20:>9.1f} {size:>8}")
+
+    os.unlink(app.config["BENCH_DB_PATH"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Resident memory per gunicorn worker with and without the pre-forked master.
+
+Builds a SQLite database from the synthetic feed and trains a valuation model.
+It then starts gunicorn from gunicorn.conf.py twice, with GUNICORN_PRELOAD off
+and on. Each run sends a search mix to warm the workers and reads every
+worker's /proc/<pid>/smaps_rollup. RSS counts shared pages in full; PSS splits
+them between the processes sharing them; Private is what the worker alone holds.
+
+Usage: python -m benchmarks.bench_worker_memory [--workers 4] [--listings 50000]
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+from benchmarks.common import build_dataset, gunicorn_server
+from benchmarks.synthetic_feed import MAKES_MODELS
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def smaps(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values["Rss"], "pss": values["Pss"],
+        "private": values["Private_Clean"] + values["Private_Dirty"],
+    }
+
+
+def search_mix(port, requests, seed=9):
+    rng = random.Random(seed)
+    pairs = [(make, model) for make, models in MAKES_MODELS.items() for model in models]
+    ok = 0
+    for _ in range(requests):
+        make, model = rng.choice(pairs)
+        query = urllib.parse.urlencode({
+            "year": rng.randint(2005, 2022), "make": make, "model": model,
+            "mileage": rng.randrange(5000, 150000, 1000),
+        })
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/estimate?{query}", timeout=30) as r:
+                r.read()
+                ok += 1
+        except OSError:
+            pass
+    return ok
+
+
+def run(preload, workers, db_path, model_path, requests):
+    with gunicorn_server(
+        DATABASE_URL=f"sqlite:///{db_path}",
+        VALUATION_MODEL_PATH=model_path,
+        ADMISSION_CONTROL_ENABLED=False,
+        GUNICORN_WORKERS=workers,
+        GUNICORN_PRELOAD=preload,
+        GUNICORN_WORKER_CLASS="sync",
+    ) as (master, port):
+        ok = search_mix(port, requests)
+        time.sleep(1)
+        return ok, smaps(master.pid), [smaps(pid) for pid in children(master.pid)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--listings", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        db_path, model_path = build_dataset(directory, args.listings)
+        print(f"{'preload':8} {'process':8} {'RSS MiB':>8} {'PSS MiB':>8} {'private MiB':>12}")
+        for preload in (False, True):
+            ok, master, workers = run(preload, args.workers, db_path, model_path, args.requests)
+            rows = [("master", master)] + [("worker", worker) for worker in workers]
+            for name, usage in rows:
+                print(f"{str(preload):8} {name:8} {usage['rss'] / 1024:>8.1f} "
+                      f"{usage['pss'] / 1024:>8.1f} {usage['private'] / 1024:>12.1f}")
+            total = sum(usage["pss"] for _, usage in rows)
+            print(f"{str(preload):8} {'total':8} {'':>8} {total / 1024:>8.1f}"
+                  f"   ({ok}/{args.requests} searches answered)")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
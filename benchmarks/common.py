@@ -0,0 +1,101 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from flask import Flask
+
+from config import TestingConfig
+from data.models import db
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def make_app(db_path=None, **overrides):
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    app.config.update(overrides)
+    db.init_app(app)
+    app.config["BENCH_DB_PATH"] = db_path
+    return app
+
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def build_dataset(directory, listings, seed=42):
+    """SQLite database imported from the synthetic feed, with aggregates and a valuation model."""
+    from benchmarks.synthetic_feed import generate_feed
+    from scripts.data_importer import DataImporter
+    from scripts.train_valuation_model import ValuationModelTrainer
+    from services.aggregate_builder import AggregateBuilder
+
+    db_path = os.path.join(directory, "inventory.db")
+    model_path = os.path.join(directory, "valuation_model.npz")
+    app = make_app(db_path, MIN_YEAR=2000, MAX_YEAR=2024)
+    with app.app_context():
+        db.create_all()
+        DataImporter(app.config)._process_and_store_data(
+            generate_feed(listings, seed=seed, invalid_rate=0.0, min_year=2005, max_year=2022), app
+        )
+        AggregateBuilder(app.config).build()
+        db.session.commit()
+        ValuationModelTrainer(app.config).train(model_path)
+    return db_path, model_path
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_server(timeout=120, **env):
+    """Run gunicorn from gunicorn.conf.py; env entries override the environment."""
+    port = free_port()
+    environ = dict(os.environ, FLASK_ENV="production", QUERY_LOG_PATH="",
+                   GUNICORN_BIND=f"127.0.0.1:{port}")
+    environ.update({name: str(value) for name, value in env.items()})
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        cwd=ROOT, env=environ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if master.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with status {master.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=2):
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.2)
+        yield master, port
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
@@ -0,0 +1,286 @@
+"""
+Load test: replay a realistic search mix against the app and report throughput,
+latency percentiles and error rates as JSON.
+
+    python -m benchmarks.load_test --serve [--workers 4] [--worker-class gthread]
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 32 --duration 30
+
+``--serve`` builds a SQLite database from the synthetic feed and starts gunicorn
+from gunicorn.conf.py in front of it. Any other setting (pool sizes, cache
+backend, admission limits...) is taken from the environment. Leave
+RATE_LIMIT_PER_SECOND unset (off): every simulated user shares one address.
+``--database-url`` serves an existing database, such as a MySQL
+instance, instead. The mix draws (year, make, model) with the feed's Zipf
+popularity, so a few groups get most of the traffic.
+
+Each response is classified as
+- ``ok``: an expected status; 400 and 404 are expected for the invalid inputs
+- ``rejected``: 429 or 503 from admission control
+- ``error``: anything else, including timeouts and dropped connections
+Only requests started after ``--warmup`` seconds are reported.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.common import build_dataset, gunicorn_server, percentile
+from benchmarks.synthetic_feed import LOCATIONS, ymm_popularity
+
+REJECTED_STATUSES = {429, 503}
+
+
+class HttpConnection:
+    """Minimal HTTP/1.1 keep-alive client on asyncio streams, so the harness needs no extra packages."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, target: str, body: bytes = b"") -> Tuple[int, int]:
+        """Send one request; returns (status, body bytes)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        head = f"{method} {target} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+        if method == "POST":
+            head += "Content-Type: application/x-www-form-urlencoded\r\n"
+        head += f"Content-Length: {len(body)}\r\n\r\n"
+        self.writer.write(head.encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        size = 0
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                chunk_size = int((await self.reader.readline()).split(b";")[0], 16)
+                if chunk_size == 0:
+                    while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                await self.reader.readexactly(chunk_size + 2)
+                size += chunk_size
+        elif "content-length" in headers:
+            size = int(headers["content-length"])
+            await self.reader.readexactly(size)
+        else:
+            size = len(await self.reader.read())
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, size
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class SearchMix:
+    """Weighted scenarios; each returns (method, target, body, expected statuses)."""
+
+    SCENARIOS = (
+        ("estimate", 0.45),
+        ("estimate_no_mileage", 0.15),
+        ("search_page", 0.12),
+        ("regional", 0.08),
+        ("trend", 0.05),
+        ("invalid", 0.15),
+    )
+
+    def __init__(self, feed_seed: int = 42):
+        self.groups, self.weights = ymm_popularity(random.Random(feed_seed))
+        self.names = [name for name, _ in self.SCENARIOS]
+        self.scenario_weights = [weight for _, weight in self.SCENARIOS]
+
+    def next(self, rng: random.Random) -> Tuple[str, str, str, bytes, frozenset]:
+        name = rng.choices(self.names, weights=self.scenario_weights)[0]
+        year, make, model = rng.choices(self.groups, weights=self.weights)[0]
+        mileage = rng.randrange(5000, 150000, 500)
+        found = frozenset({200, 404})
+        params = {"year": year, "make": make, "model": model}
+
+        if name == "estimate":
+            return name, "GET", self._path("/api/estimate", params, mileage=mileage), b"", found
+        if name == "estimate_no_mileage":
+            return name, "GET", self._path("/api/estimate", params), b"", found
+        if name == "search_page":
+            body = urllib.parse.urlencode(dict(params, mileage=f"{mileage:,}")).encode()
+            return name, "POST", "/", body, frozenset({200})
+        if name == "regional":
+            _, state, _ = rng.choice(LOCATIONS)
+            return name, "GET", self._path("/api/estimate", params, mileage=mileage, state=state), b"", found
+        if name == "trend":
+            return name, "GET", self._path("/api/trend", params), b"", found
+
+        broken = rng.choice([
+            dict(params, year="1800"),
+            dict(params, year="20x5"),
+            dict(params, model=""),
+            dict(params, mileage="12abc"),
+            dict(params, make="Zastava", model="Yugo"),
+            dict(params, state="ZZ"),
+        ])
+        return name, "GET", self._path("/api/estimate", broken), b"", frozenset({400, 404})
+
+    @staticmethod
+    def _path(path: str, params: dict, **extra) -> str:
+        return f"{path}?{urllib.parse.urlencode(dict(params, **extra))}"
+
+
+async def run_load(host: str, port: int, concurrency: int, duration: float, warmup: float,
+                   timeout: float, seed: int, feed_seed: int) -> List[Tuple[str, Optional[int], str, float]]:
+    """Closed-loop load: each simulated user sends its next request as soon as the last one returns."""
+    mix = SearchMix(feed_seed)
+    results: List[Tuple[str, Optional[int], str, float]] = []
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def user(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        connection = HttpConnection(host, port)
+        while time.monotonic() < stop_at:
+            name, method, target, body, expected = mix.next(rng)
+            request_started = time.monotonic()
+            status = None
+            try:
+                status, _ = await asyncio.wait_for(connection.request(method, target, body), timeout)
+                if status in expected:
+                    outcome = "ok"
+                elif status in REJECTED_STATUSES:
+                    outcome = "rejected"
+                else:
+                    outcome = "error"
+            except (OSError, asyncio.TimeoutError, ValueError, asyncio.IncompleteReadError):
+                connection.close()
+                outcome = "error"
+            if request_started >= measure_from:
+                results.append((name, status, outcome, time.monotonic() - request_started))
+        connection.close()
+
+    await asyncio.gather(*(user(index) for index in range(concurrency)))
+    return results
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    millis = [latency * 1000 for latency in latencies]
+    summary = {f"p{pct}": round(percentile(millis, pct), 2) for pct in (50, 90, 95, 99)}
+    summary["max"] = round(max(millis), 2) if millis else 0.0
+    summary["mean"] = round(sum(millis) / len(millis), 2) if millis else 0.0
+    return summary
+
+
+def summarize(results, duration: float) -> dict:
+    def section(rows):
+        total = len(rows)
+        outcomes = {outcome: 0 for outcome in ("ok", "rejected", "error")}
+        for _, _, outcome, _ in rows:
+            outcomes[outcome] += 1
+        return {
+            "requests": total,
+            "throughput_rps": round(total / duration, 2),
+            "ok": outcomes["ok"],
+            "rejected_rate": round(outcomes["rejected"] / total, 4) if total else 0.0,
+            "error_rate": round(outcomes["error"] / total, 4) if total else 0.0,
+            "latency_ms": latency_summary([latency for _, _, _, latency in rows]),
+        }
+
+    report = section(results)
+    statuses: Dict[str, int] = {}
+    for _, status, _, _ in results:
+        key = str(status) if status is not None else "failed"
+        statuses[key] = statuses.get(key, 0) + 1
+    report["status_counts"] = dict(sorted(statuses.items()))
+    report["scenarios"] = {
+        name: section([row for row in results if row[0] == name])
+        for name in sorted({row[0] for row in results})
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a search mix and report latency as JSON")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="base URL of a running server")
+    target.add_argument("--serve", action="store_true", help="start gunicorn on a synthetic database")
+    parser.add_argument("--database-url", help="with --serve: serve this database instead of building one")
+    parser.add_argument("--listings", type=int, default=50000, help="synthetic listings for --serve")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() * 2 + 1)
+    parser.add_argument("--worker-class", default="gthread")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16, help="simulated users")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds first")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", help="free-form name stored with the report")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    config = {
+        "label": args.label, "concurrency": args.concurrency, "duration": args.duration,
+        "warmup": args.warmup, "seed": args.seed,
+    }
+
+    def load(host, port):
+        return asyncio.run(run_load(host, port, args.concurrency, args.duration, args.warmup,
+                                    args.timeout, args.seed, feed_seed=42))
+
+    if args.url:
+        parsed = urllib.parse.urlsplit(args.url)
+        config["url"] = args.url
+        results = load(parsed.hostname, parsed.port or 80)
+    else:
+        directory = tempfile.mkdtemp()
+        try:
+            env = {
+                "GUNICORN_WORKERS": args.workers,
+                "GUNICORN_WORKER_CLASS": args.worker_class,
+                "GUNICORN_THREADS": args.threads,
+            }
+            if args.database_url:
+                env["DATABASE_URL"] = args.database_url
+            else:
+                print(f"Building a database of {args.listings} synthetic listings...", file=sys.stderr)
+                db_path, model_path = build_dataset(directory, args.listings)
+                env.update(DATABASE_URL=f"sqlite:///{db_path}", VALUATION_MODEL_PATH=model_path)
+            config.update(workers=args.workers, worker_class=args.worker_class, threads=args.threads,
+                          listings=None if args.database_url else args.listings)
+            with gunicorn_server(**env) as (_, port):
+                results = load("127.0.0.1", port)
+        finally:
+            shutil.rmtree(directory)
+
+    report = {"config": config, **summarize(results, args.duration)}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Generate synthetic inventory feeds in the same pipe-delimited format as
+INVENTORY_DATA_URL, for benchmarks and load tests.
+
+YMM popularity is Zipf-skewed so a few groups are very large, prices depend on
+year and mileage, and a configurable fraction of rows is malformed.
+
+Usage: python -m benchmarks.synthetic_feed --rows 100000 --output feed.txt
+"""
+import argparse
+import random
+from typing import Iterator, List, Tuple
+
+HEADER = [
+    "vin", "year", "make", "model", "trim", "dealer_name", "dealer_street",
+    "dealer_city", "dealer_state", "dealer_zip", "listing_price",
+    "listing_mileage", "used", "certified", "style", "driven_wheels",
+    "engine", "fuel_type", "exterior_color", "interior_color", "seller_website",
+    "first_seen_date", "last_seen_date", "dealer_vdp_last_seen_date",
+    "listing_status",
+]
+
+MAKES_MODELS = {
+    "Toyota": ["Camry", "Corolla", "RAV4", "Tacoma", "Highlander", "Prius"],
+    "Honda": ["Civic", "Accord", "CR-V", "Pilot", "Odyssey"],
+    "Ford": ["F-150", "Escape", "Explorer", "Mustang", "Fusion", "Focus"],
+    "Chevrolet": ["Silverado 1500", "Equinox", "Malibu", "Tahoe", "Camaro"],
+    "Nissan": ["Altima", "Rogue", "Sentra", "Pathfinder"],
+    "Jeep": ["Wrangler", "Grand Cherokee", "Cherokee", "Compass"],
+    "Subaru": ["Outback", "Forester", "Impreza", "Crosstrek"],
+    "BMW": ["3 Series", "5 Series", "X3", "X5"],
+    "Hyundai": ["Elantra", "Sonata", "Tucson", "Santa Fe"],
+    "Kia": ["Optima", "Sorento", "Soul", "Sportage"],
+}
+
+LOCATIONS = [
+    ("Seattle", "WA", "98101"), ("Portland", "OR", "97201"),
+    ("San Francisco", "CA", "94103"), ("Los Angeles", "CA", "90012"),
+    ("San Diego", "CA", "92101"), ("Phoenix", "AZ", "85004"),
+    ("Denver", "CO", "80202"), ("Dallas", "TX", "75201"),
+    ("Houston", "TX", "77002"), ("Austin", "TX", "78701"),
+    ("Chicago", "IL", "60601"), ("Minneapolis", "MN", "55401"),
+    ("Detroit", "MI", "48226"), ("Atlanta", "GA", "30303"),
+    ("Miami", "FL", "33130"), ("Orlando", "FL", "32801"),
+    ("Charlotte", "NC", "28202"), ("Washington", "DC", "20001"),
+    ("Philadelphia", "PA", "19107"), ("Newark", "NJ", "07102"),
+    ("New York", "NY", "10001"), ("Boston", "MA", "02108"),
+]
+
+VIN_CHARS = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+
+
+def _ymm_groups(min_year: int, max_year: int) -> List[Tuple[int, str, str]]:
+    groups = []
+    for make, models in MAKES_MODELS.items():
+        for model in models:
+            for year in range(min_year, max_year + 1):
+                groups.append((year, make, model))
+    return groups
+
+
+def _zipf_weights(count: int, exponent: float) -> List[float]:
+    return [1.0 / ((rank + 1) ** exponent) for rank in range(count)]
+
+
+def ymm_popularity(
+    rng: random.Random, min_year: int = 2005, max_year: int = 2022, skew: float = 1.1
+) -> Tuple[List[Tuple[int, str, str]], List[float]]:
+    """(year, make, model) groups and their Zipf weights, in the feed's order for rng's seed."""
+    groups = _ymm_groups(min_year, max_year)
+    rng.shuffle(groups)
+    return groups, _zipf_weights(len(groups), skew)
+
+
+def _vin(rng: random.Random) -> str:
+    return "".join(rng.choice(VIN_CHARS) for _ in range(17))
+
+
+def generate_rows(
+    rows: int,
+    seed: int = 42,
+    invalid_rate: float = 0.02,
+    min_year: int = 2005,
+    max_year: int = 2022,
+    skew: float = 1.1,
+) -> Iterator[List[str]]:
+    rng = random.Random(seed)
+    groups, weights = ymm_popularity(rng, min_year, max_year, skew)
+    base_prices = {
+        (make, model): rng.randrange(18000, 45000, 500)
+        for make, models in MAKES_MODELS.items() for model in models
+    }
+
+    sample = rng.choices(groups, weights=weights, k=rows)
+    for year, make, model in sample:
+        city, state, zip_code = rng.choice(LOCATIONS)
+        age = max(0, max_year - year)
+        mileage = max(0, int(rng.gauss(12000 * age + 5000, 8000)))
+        price = base_prices[(make, model)] * (0.88 ** age) - 0.04 * mileage
+        price = max(1500, price * rng.uniform(0.9, 1.1))
+
+        row = {
+            "vin": _vin(rng),
+            "year": str(year),
+            "make": make,
+            "model": model,
+            "dealer_city": city,
+            "dealer_state": state,
+            "dealer_zip": zip_code,
+            "listing_price": f"{price:.0f}",
+            "listing_mileage": str(mileage),
+            "used": "TRUE",
+        }
+
+        if rng.random() < invalid_rate:
+            broken = rng.choice(["vin", "year", "make", "listing_price", "listing_mileage"])
+            row[broken] = rng.choice(["", "n/a", "  "])
+
+        yield [row.get(column, "") for column in HEADER]
+
+
+def generate_feed(rows: int, **kwargs) -> str:
+    lines = ["|".join(HEADER)]
+    lines.extend("|".join(values) for values in generate_rows(rows, **kwargs))
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--invalid-rate", type=float, default=0.02)
+    parser.add_argument("--output", default="-")
+    args = parser.parse_args()
+
+    feed = generate_feed(args.rows, seed=args.seed, invalid_rate=args.invalid_rate)
+    if args.output == "-":
+        print(feed, end="")
+    else:
+        with open(args.output, "w") as f:
+            f.write(feed)
+
+
+if __name__ == "__main__":
+    main()
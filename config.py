@@ -16,26 +16,127 @@ class Config:
         'mysql+pymysql://root:@localhost/car_value_project_db_5'
     )
 
+    # Read Replica Configuration
+    SQLALCHEMY_REPLICA_URIS = [
+        uri.strip() for uri in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()
+    ]
+    REPLICA_HEALTH_CHECK_INTERVAL = int(os.getenv('REPLICA_HEALTH_CHECK_INTERVAL', '10'))
+    REPLICA_MAX_LAG_SECONDS = int(os.getenv('REPLICA_MAX_LAG_SECONDS', '30'))
+
     # Data Import Configuration
     INVENTORY_DATA_URL = os.getenv(
         'INVENTORY_DATA_URL',
         'https://linkgrid.com/downloads/carvalue_project/inventory-listing-2022-08-17_first1000.txt'
     )
     DATA_IMPORT_TIMEOUT = int(os.getenv('DATA_IMPORT_TIMEOUT', '30'))
+    # YYYY-MM-DD; defaults to the date in INVENTORY_DATA_URL, or today
+    SNAPSHOT_DATE = os.getenv('SNAPSHOT_DATE')
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+    # 'columnar' validates each batch with numpy masks; 'rows' parses row by row
+    IMPORT_PARSE_MODE = os.getenv('IMPORT_PARSE_MODE', 'columnar')
+    # Keep only the last listing per VIN in each feed
+    IMPORT_DEDUP_VINS = os.getenv('IMPORT_DEDUP_VINS', 'True').lower() == 'true'
+    # Directory for per-import JSON quality reports; unset to only store them in the database
+    IMPORT_REPORT_DIR = os.getenv('IMPORT_REPORT_DIR')
+    # 'queue' enqueues the initial import for scripts.import_worker; 'inline' runs it at startup
+    IMPORT_MODE = os.getenv('IMPORT_MODE', 'queue')
+    IMPORT_JOB_STALE_SECONDS = int(os.getenv('IMPORT_JOB_STALE_SECONDS', '300'))
+    # Rebuild jobs also run ANALYZE on the vehicle and aggregate tables
+    REBUILD_ANALYZE_TABLES = os.getenv('REBUILD_ANALYZE_TABLES', 'True').lower() == 'true'
+    # How often workers check for a newly published data version (cache generation)
+    DATA_VERSION_CHECK_SECONDS = float(os.getenv('DATA_VERSION_CHECK_SECONDS', '5'))
+
+    # Partitioning Configuration
+    VEHICLE_PARTITIONING = os.getenv('VEHICLE_PARTITIONING', 'False').lower() == 'true'
+    PARTITION_YEAR_SPAN = int(os.getenv('PARTITION_YEAR_SPAN', '5'))
 
     # Application Configuration
     MAX_LISTINGS_DISPLAY = int(os.getenv('MAX_LISTINGS_DISPLAY', '100'))
     PRICE_ROUNDING_FACTOR = int(os.getenv('PRICE_ROUNDING_FACTOR', '100'))
     MIN_VEHICLES_FOR_REGRESSION = int(os.getenv('MIN_VEHICLES_FOR_REGRESSION', '2'))
+    REGION_DEFAULT_RADIUS_MILES = int(os.getenv('REGION_DEFAULT_RADIUS_MILES', '50'))
+    REGION_MAX_RADIUS_MILES = int(os.getenv('REGION_MAX_RADIUS_MILES', '500'))
+    # CSV of zip,city,state,lat,lon used by radius searches; empty for the bundled major-city file
+    GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', '')
+    # Fixed-width mileage buckets for price histograms; the last bucket is open-ended
+    MILEAGE_BUCKET_SIZE = int(os.getenv('MILEAGE_BUCKET_SIZE', '25000'))
+    MILEAGE_BUCKET_COUNT = int(os.getenv('MILEAGE_BUCKET_COUNT', '9'))
+    # Size of the per-YMM price quantile sketches (rank error is roughly 1.7/k)
+    QUANTILE_SKETCH_K = int(os.getenv('QUANTILE_SKETCH_K', '200'))
+
+    # Offline valuation model (scripts.train_valuation_model); used for sparse and unseen groups
+    VALUATION_MODEL_PATH = os.getenv('VALUATION_MODEL_PATH', 'models/valuation_model.npz') or None
+    VALUATION_MODEL_ALPHA = float(os.getenv('VALUATION_MODEL_ALPHA', '1.0'))
+    # Rows per task handed to a scripts.bulk_valuation worker process
+    BULK_VALUATION_TASK_ROWS = int(os.getenv('BULK_VALUATION_TASK_ROWS', '20000'))
 
     # Validation Configuration
     MIN_YEAR = int(os.getenv('MIN_YEAR', '1920'))
     MAX_YEAR = int(os.getenv('MAX_YEAR', '2025'))
     MAX_MILEAGE = int(os.getenv('MAX_MILEAGE', '500000'))
+    # Listings priced outside this range are dropped at import
+    MIN_LISTING_PRICE = float(os.getenv('MIN_LISTING_PRICE', '500'))
+    MAX_LISTING_PRICE = float(os.getenv('MAX_LISTING_PRICE', '500000'))
+
+    # Response Configuration
+    # brotli and orjson in requirements.txt are the fast paths; without them
+    # responses fall back to gzip and the stdlib json encoder
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '500'))
+    COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', '6'))
+    # Stream the results page of uncached groups with at least this many listings; 0 disables
+    STREAM_RESULTS_MIN_LISTINGS = int(os.getenv('STREAM_RESULTS_MIN_LISTINGS', '5000'))
+    # Rows fetched per round trip when streaming listings from the database
+    STREAM_YIELD_PER = int(os.getenv('STREAM_YIELD_PER', '500'))
+
+    # Profiling Configuration
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '200'))
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'True').lower() == 'true'
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = int(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS', '300'))
+    SLOW_QUERY_MAX_PARAM_LENGTH = int(os.getenv('SLOW_QUERY_MAX_PARAM_LENGTH', '500'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/carvalue-profiles')
+    # Required for per-request profiles; unset disables every admin-only feature
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+    # Admission Control Configuration (per worker process)
+    ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'True').lower() == 'true'
+    # Token bucket per client; 0 (the default) disables rate limiting. Behind a
+    # reverse proxy it also needs RATE_LIMIT_TRUST_PROXY, or all users share one bucket
+    RATE_LIMIT_PER_SECOND = float(os.getenv('RATE_LIMIT_PER_SECOND', '0'))
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '20'))
+    RATE_LIMIT_MAX_CLIENTS = int(os.getenv('RATE_LIMIT_MAX_CLIENTS', '10000'))
+    # Identify clients by the first X-Forwarded-For address (only behind a trusted proxy)
+    RATE_LIMIT_TRUST_PROXY = os.getenv('RATE_LIMIT_TRUST_PROXY', 'False').lower() == 'true'
+    MAX_CONCURRENT_SEARCHES = int(os.getenv('MAX_CONCURRENT_SEARCHES', '8'))
+    ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '16'))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_SECONDS', '2'))
+    ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv('ADMISSION_RETRY_AFTER_SECONDS', '1'))
+
+    # Search Cache Configuration
+    SEARCH_CACHE_ENABLED = os.getenv('SEARCH_CACHE_ENABLED', 'True').lower() == 'true'
+    # 'memory' (per worker) or 'file' (shared by all workers on a host, under CACHE_DIR)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_DIR = os.getenv('CACHE_DIR', '/tmp/carvalue-cache')
+    CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', '600'))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '2048'))
+    CACHE_WARMUP_ON_BOOT = os.getenv('CACHE_WARMUP_ON_BOOT', 'True').lower() == 'true'
+    CACHE_WARMUP_TOP_N = int(os.getenv('CACHE_WARMUP_TOP_N', '50'))
+    # Shared log of popular searches used for warmup; empty keeps it per worker
+    QUERY_LOG_PATH = os.getenv('QUERY_LOG_PATH', '/tmp/carvalue-cache/query_log.json') or None
+    QUERY_LOG_TOP_K = int(os.getenv('QUERY_LOG_TOP_K', '100'))
+    QUERY_LOG_FLUSH_EVERY = int(os.getenv('QUERY_LOG_FLUSH_EVERY', '50'))
+    QUERY_LOG_HALF_LIFE_SECONDS = int(os.getenv('QUERY_LOG_HALF_LIFE_SECONDS', '86400'))
+    # Coalesce concurrent identical searches into one query (per process, and
+    # across processes through the file cache when CROSS_PROCESS is set)
+    SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+    SINGLE_FLIGHT_CROSS_PROCESS = os.getenv('SINGLE_FLIGHT_CROSS_PROCESS', 'False').lower() == 'true'
+    SINGLE_FLIGHT_TIMEOUT_SECONDS = int(os.getenv('SINGLE_FLIGHT_TIMEOUT_SECONDS', '30'))
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    IMPORT_MODE = os.getenv('IMPORT_MODE', 'inline')
 
 
 class ProductionConfig(Config):
@@ -46,6 +147,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    QUERY_LOG_PATH = None
+    VALUATION_MODEL_PATH = None
 
 
 config = {
@@ -0,0 +1,51 @@
+import logging
+from flask import Response
+from services.container import ServiceContainer
+from utils.auth import is_admin
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class JobController:
+
+    def __init__(self, config, services=None):
+        self.config = config
+        self.queue = (services or ServiceContainer(config)).import_jobs
+
+    def handle_job_list(self):
+        jobs = self.queue.recent()
+        return self._json_response({"jobs": [self._job_payload(job) for job in jobs]})
+
+    def handle_job_status(self, job_id):
+        job = self.queue.get(job_id)
+        if job is None:
+            return self._json_response({"error": f"Job {job_id} not found"}, 404)
+
+        payload = self._job_payload(job)
+        if job.total_rows:
+            payload["progress"] = round(job.rows_processed / job.total_rows, 4)
+        return self._json_response(payload)
+
+    def handle_rebuild_request(self):
+        """Queue an online rebuild of the derived data; the import worker runs it."""
+        if not is_admin(self.config):
+            return self._json_response({"error": "Admin token required"}, 403)
+
+        job, created = self.queue.enqueue("rebuild")
+        if not created:
+            # An import also ends by switching to a fresh data version
+            return self._json_response(
+                {"error": f"Job {job.id} is already {job.status}", "job": job.to_dict()}, 409
+            )
+        return self._json_response({"job": job.to_dict(), "status_url": f"/jobs/{job.id}"}, 202)
+
+    def _job_payload(self, job):
+        payload = job.to_dict()
+        if not is_admin(self.config):
+            # Stored exception text can name hosts, paths and SQL; only admins see it
+            payload.pop("error")
+        return payload
+
+    def _json_response(self, payload, status=200):
+        return Response(dumps(payload), status=status, mimetype="application/json")
@@ -1,17 +1,25 @@
 import logging
-from flask import request, render_template, flash
-from services.vehicle_service import VehicleService
-from services.price_estimator import PriceEstimator
+from flask import current_app, request, render_template, flash, Response, stream_with_context
+from services.container import ServiceContainer
+from services.price_stats import PriceStats
+from utils.serialization import dumps, listings_to_columns
 
 logger = logging.getLogger(__name__)
 
+# Template chunks buffered per write when streaming; a listing row is about 15
+STREAM_BUFFER_CHUNKS = 20
+
 
 class SearchController:
 
-    def __init__(self, config):
+    def __init__(self, config, services=None):
         self.config = config
-        self.vehicle_service = VehicleService(config)
-        self.price_estimator = PriceEstimator(config)
+        services = services or ServiceContainer(config)
+        self.vehicle_service = services.vehicle_service
+        self.price_estimator = services.price_estimator
+        self.price_history = services.price_history
+        self.search_cache = services.search_cache
+        self.stream_min_listings = config.get("STREAM_RESULTS_MIN_LISTINGS", 5000)
 
     def handle_search_page(self):
         return render_template('search.html')
@@ -22,55 +30,63 @@ class SearchController:
             make = request.form.get("make", "").strip()
             model = request.form.get("model", "").strip()
             mileage = request.form.get("mileage", "").strip()
+            state = request.form.get("state", "").strip()
+            near = request.form.get("near", "").strip()
+            radius = request.form.get("radius", "").strip()
+            form_values = dict(
+                year=year, make=make, model=model, mileage=mileage,
+                state=state, near=near, radius=radius
+            )
 
             is_valid, error = self.vehicle_service.validate_search_input(year, make, model)
             if not is_valid:
                 flash(error)
-                return render_template(
-                    'search.html',
-                    year=year,
-                    make=make,
-                    model=model,
-                    mileage=mileage
-                )
-
-            vehicles = self.vehicle_service.search_vehicles(int(year), make, model)
+                return render_template('search.html', **form_values)
 
-            if not vehicles:
-                flash(f"No vehicles found for {year} {make} {model}")
-                return render_template(
-                    'search.html',
-                    year=year,
-                    make=make,
-                    model=model,
-                    mileage=mileage
-                )
+            region, error = self.vehicle_service.parse_region(state, near, radius)
+            if error:
+                flash(error)
+                return render_template('search.html', **form_values)
 
             parsed_mileage = None
             if mileage:
                 parsed_mileage = self.price_estimator.validate_mileage(mileage)
                 if parsed_mileage is None:
                     flash("Invalid mileage format. Please enter a valid number.")
-                    return render_template(
-                        'search.html',
-                        year=year,
-                        make=make,
-                        model=model,
-                        mileage=mileage
+                    return render_template('search.html', **form_values)
+
+            summary = self.search_cache.cached_summary(int(year), make, model, region)
+            if summary is None:
+                stats = self._streaming_stats(int(year), make, model, region)
+                if stats is not None:
+                    return self._stream_results(
+                        stats, int(year), make, model, parsed_mileage, region, form_values
                     )
+                summary = self.search_cache.get_summary(int(year), make, model, region)
 
-            estimated_price, metadata = self.price_estimator.estimate_price(
-                vehicles, parsed_mileage
+            estimated_price, metadata = self._estimate(
+                summary, int(year), make, model, parsed_mileage, region
             )
+            if metadata is None:
+                region_label = f" {region.label}" if region else ""
+                flash(f"No vehicles found for {year} {make} {model}{region_label}")
+                return render_template('search.html', **form_values)
+            listings = summary['listings'] if summary else []
+            self.search_cache.record_query(int(year), make, model, state, near, radius)
 
-            listings = self.vehicle_service.get_sample_listings(vehicles)
+            distribution = self.price_estimator.get_price_distribution(
+                int(year), make, model, parsed_mileage
+            )
 
             return render_template(
                 'results.html',
                 ymm=f"{year} {make} {model}",
                 mileage=mileage if mileage else None,
+                region=region.label if region else None,
+                region_note=region.note if region else None,
                 estimated_price=estimated_price,
                 listings=listings,
+                distribution=distribution,
                 metadata=metadata
             )
 
@@ -78,3 +94,171 @@ class SearchController:
             logger.error(f"Error in search request: {str(e)}")
             flash("An error occurred while processing your request.")
             return render_template('search.html')
+
+    def _streaming_stats(self, year, make, model, region):
+        """Aggregate PriceStats of a group big enough to stream, else None."""
+        if self.stream_min_listings <= 0:
+            return None
+        stats = self.price_estimator.load_group_stats(year, make, model, region)
+        if stats.listing_count < self.stream_min_listings:
+            return None
+        return stats
+
+    def _stream_results(self, stats, year, make, model, parsed_mileage, region, form_values):
+        # The estimate comes from the aggregates, so the header goes out before
+        # any listing is read; rows then stream from the cursor as they arrive
+        estimated_price, metadata = self._estimate_from_stats(
+            stats, year, make, model, parsed_mileage, region
+        )
+        self.search_cache.record_query(
+            year, make, model, form_values['state'], form_values['near'], form_values['radius']
+        )
+        distribution = self.price_estimator.get_price_distribution(year, make, model, parsed_mileage)
+
+        max_listings = self.vehicle_service.max_listings
+        listings = (
+            vehicle.to_dict() for vehicle in
+            self.vehicle_service.iter_vehicles(year, make, model, region, limit=max_listings)
+        )
+        # The listing count is only known once the rows have streamed, so the
+        # template counts them as it renders them
+        context = dict(
+            ymm=f"{year} {make} {model}",
+            mileage=form_values['mileage'] or None,
+            region=region.label if region else None,
+            region_note=region.note if region else None,
+            estimated_price=estimated_price,
+            listings=listings,
+            streamed=True,
+            distribution=distribution,
+            metadata=metadata,
+        )
+        current_app.update_template_context(context)
+        stream = current_app.jinja_env.get_template('results.html').stream(context)
+        stream.enable_buffering(STREAM_BUFFER_CHUNKS)
+        return Response(stream_with_context(stream), mimetype='text/html')
+
+    def _estimate(self, summary, year, make, model, mileage, region):
+        # The summary's PriceStats cover exactly the matched listings, so this is
+        # the same estimate estimate_price would give for them; sparse or missing
+        # groups fall back to the valuation model
+        stats = PriceStats(**summary['stats']) if summary else None
+        return self._estimate_from_stats(stats, year, make, model, mileage, region)
+
+    def _estimate_from_stats(self, stats, year, make, model, mileage, region):
+        estimate = self.price_estimator.estimate_group(
+            stats, year, make, model, mileage, region.state if region else None
+        )
+        if estimate is None:
+            return None, None
+        estimated_price, metadata = estimate
+        if region is not None:
+            metadata['region'] = region.label
+        return estimated_price, metadata
+
+    def handle_api_request(self):
+        try:
+            year = request.values.get("year", "").strip()
+            make = request.values.get("make", "").strip()
+            model = request.values.get("model", "").strip()
+            mileage = request.values.get("mileage", "").strip()
+            state = request.values.get("state", "").strip()
+            near = request.values.get("near", "").strip()
+            radius = request.values.get("radius", "").strip()
+            output_format = request.values.get("format", "full").strip().lower()
+
+            if output_format not in ("full", "compact"):
+                return self._json_response({"error": "format must be 'full' or 'compact'"}, 400)
+
+            is_valid, error = self.vehicle_service.validate_search_input(year, make, model)
+            if not is_valid:
+                return self._json_response({"error": error}, 400)
+
+            region, error = self.vehicle_service.parse_region(state, near, radius)
+            if error:
+                return self._json_response({"error": error}, 400)
+
+            parsed_mileage = None
+            if mileage:
+                parsed_mileage = self.price_estimator.validate_mileage(mileage)
+                if parsed_mileage is None:
+                    return self._json_response(
+                        {"error": "Invalid mileage format. Please enter a valid number."}, 400
+                    )
+
+            summary = self.search_cache.get_summary(int(year), make, model, region)
+            estimated_price, metadata = self._estimate(
+                summary, int(year), make, model, parsed_mileage, region
+            )
+            if metadata is None:
+                region_label = f" {region.label}" if region else ""
+                return self._json_response(
+                    {"error": f"No vehicles found for {year} {make} {model}{region_label}"}, 404
+                )
+            listings = summary['listings'] if summary else []
+            self.search_cache.record_query(int(year), make, model, state, near, radius)
+
+            payload = {
+                "ymm": f"{year} {make} {model}",
+                "mileage": parsed_mileage,
+                "region": region.label if region else None,
+                "region_note": region.note if region else None,
+                "estimated_price": estimated_price,
+            }
+            if output_format == "compact":
+                payload["method"] = metadata.get("method")
+                payload["vehicle_count"] = metadata.get("vehicle_count")
+                payload["listings"] = listings_to_columns(listings)
+            else:
+                payload["metadata"] = metadata
+                payload["distribution"] = self.price_estimator.get_price_distribution(
+                    int(year), make, model, parsed_mileage
+                )
+                # Histograms are built per (year, make, model) only, whatever the region
+                payload["distribution_scope"] = "national"
+                payload["statistics"] = self.vehicle_service.get_vehicle_statistics(
+                    int(year), make, model, region
+                )
+                payload["listings"] = listings
+
+            return self._json_response(payload)
+
+        except Exception as e:
+            logger.error(f"Error in API search request: {str(e)}")
+            return self._json_response(
+                {"error": "An error occurred while processing your request."}, 500
+            )
+
+    def handle_trend_request(self):
+        try:
+            year = request.values.get("year", "").strip()
+            make = request.values.get("make", "").strip()
+            model = request.values.get("model", "").strip()
+            start = request.values.get("start", "").strip()
+            end = request.values.get("end", "").strip()
+
+            is_valid, error = self.vehicle_service.validate_search_input(year, make, model)
+            if not is_valid:
+                return self._json_response({"error": error}, 400)
+
+            start_date = self.price_history.parse_date(start) if start else None
+            end_date = self.price_history.parse_date(end) if end else None
+            if (start and start_date is None) or (end and end_date is None):
+                return self._json_response({"error": "start and end must be YYYY-MM-DD dates"}, 400)
+
+            series = self.price_history.get_trend(int(year), make, model, start_date, end_date)
+            if not series or not series["count"]:
+                return self._json_response(
+                    {"error": f"No price history for {year} {make} {model}"}, 404
+                )
+
+            return self._json_response({"ymm": f"{year} {make} {model}", "series": series})
+
+        except Exception as e:
+            logger.error(f"Error in trend request: {str(e)}")
+            return self._json_response(
+                {"error": "An error occurred while processing your request."}, 500
+            )
+
+    def _json_response(self, payload, status=200):
+        return Response(dumps(payload), status=status, mimetype="application/json")
@@ -0,0 +1,181 @@
+"""
+Make/model dimension lookups.
+
+Names are normalized (stripped, lowercased) once and mapped to integer surrogate
+keys, so the hot search path filters ``vehicles`` on integers instead of strings.
+"""
+import logging
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from data.models import Make, Vehicle, VehicleModel, db
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_name(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+class DimensionCache:
+    """Read-side cache of (make, model) name -> (make_id, model_id).
+
+    Only successful lookups are cached, so names that appear after a later
+    import are still found.  Dimension rows are never deleted, which keeps the
+    cached ids valid for the lifetime of the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: Dict[Tuple[str, str], Tuple[int, int]] = {}
+
+    def resolve(self, make: str, model: str) -> Optional[Tuple[int, int]]:
+        key = (normalize_name(make), normalize_name(model))
+        ids = self._ids.get(key)
+        if ids is not None:
+            return ids
+
+        row = db.session.execute(
+            select(Make.id, VehicleModel.id)
+            .join(VehicleModel, VehicleModel.make_id == Make.id)
+            .where(Make.name == key[0], VehicleModel.name == key[1])
+        ).first()
+        if row is None:
+            return None
+
+        ids = (row[0], row[1])
+        with self._lock:
+            self._ids[key] = ids
+        return ids
+
+    def load_all(self) -> int:
+        """Cache every known (make, model); returns how many pairs were loaded."""
+        rows = db.session.execute(
+            select(Make.name, VehicleModel.name, Make.id, VehicleModel.id)
+            .join(VehicleModel, VehicleModel.make_id == Make.id)
+        ).all()
+        with self._lock:
+            for make, model, make_id, model_id in rows:
+                self._ids[(make, model)] = (make_id, model_id)
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+
+
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def get_dimension_cache() -> DimensionCache:
+    # One cache per engine: ids are only meaningful for the database they came from
+    engine = db.engine
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            cache = DimensionCache()
+            _caches[engine] = cache
+        return cache
+
+
+class DimensionWriter:
+    """Write-side make/model id assignment used during bulk loads.
+
+    Keeps in-memory dictionaries keyed by the raw feed value, so each distinct
+    spelling is normalized and looked up once per import rather than per row.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._make_ids: Dict[str, int] = {}
+        self._model_ids: Dict[Tuple[int, str], int] = {}
+        self._raw_makes: Dict[str, Tuple[str, int]] = {}
+        self._raw_models: Dict[Tuple[int, str], Tuple[str, int]] = {}
+        self._load_existing()
+
+    def _load_existing(self) -> None:
+        for make_id, name in self.session.execute(select(Make.id, Make.name)):
+            self._make_ids[name] = make_id
+        for model_id, make_id, name in self.session.execute(
+            select(VehicleModel.id, VehicleModel.make_id, VehicleModel.name)
+        ):
+            self._model_ids[(make_id, name)] = model_id
+
+    def get_ids(self, raw_make: str, raw_model: str) -> Tuple[str, int, str, int]:
+        """Return (make, make_id, model, model_id), creating dimension rows as needed."""
+        cached_make = self._raw_makes.get(raw_make)
+        if cached_make is None:
+            make = normalize_name(raw_make)
+            make_id = self._make_ids.get(make)
+            if make_id is None:
+                make_row = Make(name=make)
+                self.session.add(make_row)
+                self.session.flush()
+                make_id = make_row.id
+                self._make_ids[make] = make_id
+            cached_make = (make, make_id)
+            self._raw_makes[raw_make] = cached_make
+        make, make_id = cached_make
+
+        cached_model = self._raw_models.get((make_id, raw_model))
+        if cached_model is None:
+            model = normalize_name(raw_model)
+            model_id = self._model_ids.get((make_id, model))
+            if model_id is None:
+                model_row = VehicleModel(make_id=make_id, name=model)
+                self.session.add(model_row)
+                self.session.flush()
+                model_id = model_row.id
+                self._model_ids[(make_id, model)] = model_id
+            cached_model = (model, model_id)
+            self._raw_models[(make_id, raw_model)] = cached_model
+        model, model_id = cached_model
+
+        return make, make_id, model, model_id
+
+
+@event.listens_for(Session, "before_flush")
+def _assign_vehicle_dimensions(session, flush_context, instances):
+    """Fill make_id/model_id for vehicles added through the ORM without them."""
+    pending = [
+        obj for obj in session.new
+        if isinstance(obj, Vehicle) and obj.make_id is None and obj.make and obj.model
+    ]
+    if not pending:
+        return
+
+    with session.no_autoflush:
+        makes: Dict[str, Make] = {}
+        models: Dict[Tuple[str, str], VehicleModel] = {}
+        for vehicle in pending:
+            make_name = normalize_name(vehicle.make)
+            model_name = normalize_name(vehicle.model)
+
+            make = makes.get(make_name)
+            if make is None:
+                make = session.scalars(select(Make).where(Make.name == make_name)).first()
+                if make is None:
+                    make = Make(name=make_name)
+                    session.add(make)
+                makes[make_name] = make
+
+            model = models.get((make_name, model_name))
+            if model is None:
+                if make.id is not None:
+                    model = session.scalars(
+                        select(VehicleModel).where(
+                            VehicleModel.make_id == make.id, VehicleModel.name == model_name
+                        )
+                    ).first()
+                if model is None:
+                    model = VehicleModel(name=model_name, make_ref=make)
+                    session.add(model)
+                models[(make_name, model_name)] = model
+
+            vehicle.make_ref = make
+            vehicle.model_ref = model
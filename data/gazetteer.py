@@ -0,0 +1,135 @@
+"""
+Offline gazetteer for resolving ZIP codes and city names to coordinates.
+
+The bundled ``gazetteer.csv`` covers major US cities with one representative ZIP
+each. Listings only carry a city and state, so a radius search matches the
+listings in the gazetteer's cities inside the radius; listings in other towns
+are left out (state searches are unaffected). Set ``GAZETTEER_PATH`` to a file
+with the same columns, e.g. built from the Census place gazetteer, to cover
+more towns. Radius regions carry a ``note`` saying so, shown with the results.
+"""
+import csv
+import math
+import os
+import re
+from functools import lru_cache
+from typing import FrozenSet, List, NamedTuple, Optional, Tuple
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "gazetteer.csv")
+
+EARTH_RADIUS_MILES = 3958.8
+
+US_STATES = frozenset([
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID",
+    "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO",
+    "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA",
+    "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY",
+])
+
+_ZIP_RE = re.compile(r"^\d{5}$")
+
+
+def normalize_state(value: Optional[str]) -> str:
+    return (value or "").strip().upper()
+
+
+def normalize_city(value: Optional[str]) -> str:
+    # One spelling per city, so listings, aggregates and radius places compare as plain strings
+    return " ".join((value or "").split()).title()
+
+
+class Place(NamedTuple):
+    zip: str
+    city: str
+    state: str
+    lat: float
+    lon: float
+
+
+class RegionFilter:
+    """Either a whole state or a set of (city, state) places around a point."""
+
+    def __init__(self, label: str, state: Optional[str] = None,
+                 places: Optional[FrozenSet[Tuple[str, str]]] = None, note: Optional[str] = None):
+        self.label = label
+        self.state = state
+        self.places = places
+        # Caveat about what the region covers, shown alongside the label
+        self.note = note
+
+    @property
+    def states(self) -> List[str]:
+        if self.state is not None:
+            return [self.state]
+        return sorted({state for _, state in self.places or ()})
+
+    def cache_key(self) -> Tuple:
+        return (self.state, tuple(sorted(self.places)) if self.places is not None else None)
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+class Gazetteer:
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        self.places: List[Place] = []
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                self.places.append(Place(
+                    zip=row["zip"], city=row["city"], state=row["state"],
+                    lat=float(row["lat"]), lon=float(row["lon"]),
+                ))
+        self._by_zip = {place.zip: place for place in self.places}
+        self._by_city = {}
+        for place in self.places:
+            self._by_city.setdefault(place.city.lower(), []).append(place)
+
+    def resolve(self, query: str) -> Optional[Place]:
+        """Resolve a ZIP, "City, ST" or unambiguous "City" to a place."""
+        query = (query or "").strip()
+        if not query:
+            return None
+
+        if _ZIP_RE.match(query):
+            return self._by_zip.get(query)
+
+        if "," in query:
+            city, state = (part.strip() for part in query.rsplit(",", 1))
+            for place in self._by_city.get(city.lower(), []):
+                if place.state == state.upper():
+                    return place
+            return None
+
+        candidates = self._by_city.get(query.lower(), [])
+        return candidates[0] if len(candidates) == 1 else None
+
+    def places_within(self, origin: Place, radius_miles: float) -> List[Place]:
+        return [
+            place for place in self.places
+            if haversine_miles(origin.lat, origin.lon, place.lat, place.lon) <= radius_miles
+        ]
+
+    @lru_cache(maxsize=1024)
+    def radius_region(self, origin: Place, radius_miles: float) -> RegionFilter:
+        places = frozenset(
+            (normalize_city(place.city), place.state)
+            for place in self.places_within(origin, radius_miles)
+        )
+        label = f"within {radius_miles:g} mi of {origin.city}, {origin.state}"
+        note = (
+            f"Only listings in the {len(places)} gazetteer "
+            f"{'city' if len(places) == 1 else 'cities'} within this radius are included; "
+            f"listings in other towns are not matched."
+        )
+        return RegionFilter(label, places=places, note=note)
+
+
+@lru_cache(maxsize=4)
+def get_gazetteer(path: Optional[str] = None) -> Gazetteer:
+    return Gazetteer(path or GAZETTEER_PATH)
@@ -0,0 +1,114 @@
+"""
+In-place upgrades for databases created by earlier versions.
+
+``db.create_all()`` adds missing tables but never changes existing ones. Each
+upgrade runs once and is recorded in ``schema_upgrades``; ``upgrade_schema``
+runs the pending ones on every start.
+"""
+import logging
+import time
+from typing import List
+
+from sqlalchemy import inspect, select, text, update
+
+from data.dimensions import DimensionWriter
+from data.gazetteer import normalize_city, normalize_state
+from data.models import SchemaUpgrade, Vehicle, db
+from data.partitioning import get_partitioner
+from data.versions import new_version, publish_version
+from services.aggregate_builder import AggregateBuilder
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaUpgradeError(RuntimeError):
+    """The database could not be brought up to the current schema."""
+
+
+def upgrade_schema(config) -> List[str]:
+    """Apply pending upgrades and return their names; raises SchemaUpgradeError."""
+    applied = []
+    try:
+        for name, upgrade in _pending():
+            upgrade(config)
+            db.session.add(SchemaUpgrade(name=name, applied_at=time.time()))
+            applied.append(name)
+            logger.info(f"Applied schema upgrade: {name}")
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        # Another worker starting at the same time may have applied them first
+        if not _pending():
+            return []
+        raise SchemaUpgradeError(f"Could not upgrade the database schema: {str(e)}") from e
+    return applied
+
+
+def _pending():
+    done = set(db.session.scalars(select(SchemaUpgrade.name)))
+    return [(name, upgrade) for name, upgrade in UPGRADES if name not in done]
+
+
+def _existing_vehicle_tables(config):
+    # Partition tables are only created by the first partitioned import
+    names = set(inspect(db.engine).get_table_names())
+    return [table for table in get_partitioner(config).all_tables() if table.name in names]
+
+
+def _add_vehicle_dimension_ids(config) -> None:
+    """Add vehicles.make_id/model_id and fill them from the make/model names."""
+    columns = {column["name"] for column in inspect(db.engine).get_columns("vehicles")}
+    missing = [name for name in ("make_id", "model_id") if name not in columns]
+    if not missing:
+        return
+
+    for name in missing:
+        db.session.execute(text(f"ALTER TABLE vehicles ADD COLUMN {name} INTEGER"))
+    for index in Vehicle.__table__.indexes:
+        index.create(bind=db.session.connection(), checkfirst=True)
+
+    vehicles = Vehicle.__table__
+    writer = DimensionWriter(db.session)
+    pairs = db.session.execute(
+        select(vehicles.c.make, vehicles.c.model)
+        .where(vehicles.c.make.is_not(None), vehicles.c.model.is_not(None))
+        .distinct()
+    ).all()
+    for raw_make, raw_model in pairs:
+        # Stored like the importer stores new rows: normalized names plus their ids
+        make, make_id, model, model_id = writer.get_ids(raw_make, raw_model)
+        db.session.execute(
+            update(vehicles)
+            .where(vehicles.c.make == raw_make, vehicles.c.model == raw_model)
+            .values(make=make, make_id=make_id, model=model, model_id=model_id)
+        )
+    logger.info(f"Backfilled make/model ids for {len(pairs)} make/model pairs")
+
+
+def _normalize_vehicle_locations(config) -> None:
+    """Rewrite city and state the way the importer now stores them, then rebuild the aggregates."""
+    tables = _existing_vehicle_tables(config)
+    changed = 0
+    for table in tables:
+        pairs = db.session.execute(select(table.c.city, table.c.state).distinct()).all()
+        for city, state in pairs:
+            values = {"city": normalize_city(city), "state": normalize_state(state)}
+            if (city, state) == (values["city"], values["state"]):
+                continue
+            db.session.execute(
+                update(table).where(table.c.city == city, table.c.state == state).values(**values)
+            )
+            changed += 1
+    logger.info(f"Normalized {changed} city/state spellings")
+
+    if any(db.session.execute(select(table.c.id).limit(1)).first() for table in tables):
+        # Regional aggregates were keyed by lower-cased city names; a new data
+        # version also retires search summaries cached from the old spellings
+        AggregateBuilder(config).build()
+        publish_version(db.session, new_version())
+
+
+UPGRADES = (
+    ("vehicle_dimension_ids", _add_vehicle_dimension_ids),
+    ("normalized_vehicle_locations", _normalize_vehicle_locations),
+)
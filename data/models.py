@@ -3,19 +3,47 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 
+class Make(db.Model):
+    __tablename__ = "makes"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+
+class VehicleModel(db.Model):
+    __tablename__ = "models"
+    __table_args__ = (db.UniqueConstraint("make_id", "name", name="uq_models_make_name"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    make_id = db.Column(db.Integer, db.ForeignKey("makes.id"), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+
+    make_ref = db.relationship(Make, lazy="raise")
+
+
 class Vehicle(db.Model):
     __tablename__ = "vehicles"
+    __table_args__ = (
+        db.Index("ix_vehicles_year_make_model_state", "year", "make_id", "model_id", "state"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     vin = db.Column(db.String(64))
     year = db.Column(db.Integer)
+    # Normalized names, kept beside the ids for display, valuation training and
+    # ORM inserts; searches filter on make_id/model_id only
     make = db.Column(db.String(100))
     model = db.Column(db.String(100))
+    make_id = db.Column(db.Integer, db.ForeignKey("makes.id"))
+    model_id = db.Column(db.Integer, db.ForeignKey("models.id"))
     city = db.Column(db.String(100))
     state = db.Column(db.String(10))
     listing_price = db.Column(db.Float)
     listing_mileage = db.Column(db.Integer)
 
+    make_ref = db.relationship(Make, lazy="raise")
+    model_ref = db.relationship(VehicleModel, lazy="raise")
+
     def to_dict(self):
 
         return {
@@ -25,3 +53,178 @@ class Vehicle(db.Model):
             "mileage": self.listing_mileage,
             "location": f"{self.city}, {self.state}",
         }
+
+
+class ReplicationHeartbeat(db.Model):
+    __tablename__ = "replication_heartbeat"
+
+    id = db.Column(db.Integer, primary_key=True)
+    updated_at = db.Column(db.Float, nullable=False)
+
+
+class DataVersion(db.Model):
+    __tablename__ = "data_versions"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.String(32), nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)
+
+
+class SchemaUpgrade(db.Model):
+    """An in-place upgrade from data.migrations that has been applied."""
+
+    __tablename__ = "schema_upgrades"
+
+    name = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.Float, nullable=False)
+
+
+class ImportJob(db.Model):
+    __tablename__ = "import_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False, default="import")
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)
+    # Set while the job is queued or running; the unique constraint allows only
+    # one active import job at a time (NULLs do not collide).
+    active_key = db.Column(db.String(20), unique=True)
+    worker_id = db.Column(db.String(100))
+    created_at = db.Column(db.Float, nullable=False)
+    started_at = db.Column(db.Float)
+    heartbeat_at = db.Column(db.Float)
+    finished_at = db.Column(db.Float)
+    total_rows = db.Column(db.Integer)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    rows_imported = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+
+    def to_dict(self):
+
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "worker_id": self.worker_id,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "heartbeat_at": self.heartbeat_at,
+            "finished_at": self.finished_at,
+            "total_rows": self.total_rows,
+            "rows_processed": self.rows_processed,
+            "rows_imported": self.rows_imported,
+            "error_count": self.error_count,
+            "attempts": self.attempts,
+            "error": self.error,
+        }
+
+
+class RegionPriceAggregate(db.Model):
+    """Precomputed PriceStats per (year, make, model, state, city)."""
+
+    __tablename__ = "ymm_region_aggregates"
+
+    year = db.Column(db.Integer, primary_key=True)
+    make_id = db.Column(db.Integer, primary_key=True)
+    model_id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(10), primary_key=True)
+    city = db.Column(db.String(100), primary_key=True)
+    listing_count = db.Column(db.Integer, nullable=False, default=0)
+    price_count = db.Column(db.Integer, nullable=False, default=0)
+    price_sum = db.Column(db.Float, nullable=False, default=0)
+    reg_count = db.Column(db.Integer, nullable=False, default=0)
+    mileage_sum = db.Column(db.Float, nullable=False, default=0)
+    mileage_sq_sum = db.Column(db.Float, nullable=False, default=0)
+    reg_price_sum = db.Column(db.Float, nullable=False, default=0)
+    reg_price_sq_sum = db.Column(db.Float, nullable=False, default=0)
+    price_mileage_sum = db.Column(db.Float, nullable=False, default=0)
+
+
+class PriceGroupAggregate(db.Model):
+    """PriceStats rolled up for fallback estimates.
+
+    ``level`` is 'ymm' (one year of a make/model), 'make_model' (all years,
+    year 0) or 'make' (all models, year 0 and model_id 0).
+    """
+
+    __tablename__ = "price_group_aggregates"
+    __table_args__ = (
+        db.Index("ix_price_group_aggregates_make_level", "make_id", "level", "model_id", "year"),
+    )
+
+    level = db.Column(db.String(10), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    make_id = db.Column(db.Integer, primary_key=True)
+    model_id = db.Column(db.Integer, primary_key=True)
+    listing_count = db.Column(db.Integer, nullable=False, default=0)
+    price_count = db.Column(db.Integer, nullable=False, default=0)
+    price_sum = db.Column(db.Float, nullable=False, default=0)
+    reg_count = db.Column(db.Integer, nullable=False, default=0)
+    mileage_sum = db.Column(db.Float, nullable=False, default=0)
+    mileage_sq_sum = db.Column(db.Float, nullable=False, default=0)
+    reg_price_sum = db.Column(db.Float, nullable=False, default=0)
+    reg_price_sq_sum = db.Column(db.Float, nullable=False, default=0)
+    price_mileage_sum = db.Column(db.Float, nullable=False, default=0)
+
+
+class ImportSnapshot(db.Model):
+    __tablename__ = "import_snapshots"
+
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_date = db.Column(db.Date, nullable=False, unique=True)
+    source_url = db.Column(db.String(500))
+    imported_at = db.Column(db.Float, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    # JSON drop counts by reason, as written by the importer
+    quality_report = db.Column(db.Text)
+
+
+class YmmDailyPrice(db.Model):
+    """Append-only daily price rollup per (year, make, model); prices in whole dollars."""
+
+    __tablename__ = "ymm_daily_prices"
+
+    year = db.Column(db.Integer, primary_key=True)
+    make_id = db.Column(db.Integer, primary_key=True)
+    model_id = db.Column(db.Integer, primary_key=True)
+    snapshot_date = db.Column(db.Date, primary_key=True)
+    listing_count = db.Column(db.Integer, nullable=False)
+    price_count = db.Column(db.Integer, nullable=False)
+    avg_price = db.Column(db.Integer)
+    min_price = db.Column(db.Integer)
+    max_price = db.Column(db.Integer)
+    avg_mileage = db.Column(db.Integer)
+
+
+class YmmMileageHistogram(db.Model):
+    """Price distribution per (year, make, model, mileage bucket); prices in whole dollars."""
+
+    __tablename__ = "ymm_mileage_histograms"
+
+    year = db.Column(db.Integer, primary_key=True)
+    make_id = db.Column(db.Integer, primary_key=True)
+    model_id = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.SmallInteger, primary_key=True)
+    listing_count = db.Column(db.Integer, nullable=False)
+    min_price = db.Column(db.Integer, nullable=False)
+    max_price = db.Column(db.Integer, nullable=False)
+    p10 = db.Column(db.Integer, nullable=False)
+    p25 = db.Column(db.Integer, nullable=False)
+    p50 = db.Column(db.Integer, nullable=False)
+    p75 = db.Column(db.Integer, nullable=False)
+    p90 = db.Column(db.Integer, nullable=False)
+
+
+class YmmPriceSketch(db.Model):
+    """Serialized KLLSketch of listing prices per (year, make, model, state, city)."""
+
+    __tablename__ = "ymm_price_sketches"
+
+    year = db.Column(db.Integer, primary_key=True)
+    make_id = db.Column(db.Integer, primary_key=True)
+    model_id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(10), primary_key=True)
+    city = db.Column(db.String(100), primary_key=True)
+    listing_count = db.Column(db.Integer, nullable=False)
+    sketch = db.Column(db.LargeBinary, nullable=False)
@@ -0,0 +1,164 @@
+"""
+Year-range partitioning of the vehicles table.
+
+On MySQL the ``vehicles`` table itself is converted to native RANGE partitioning
+on ``year``, so routing is done by the server through partition pruning.  On
+SQLite, which has no native partitioning, each year range gets its own table
+(``vehicles_y<start>_<end>``) with the same columns and index, and reads and
+writes are routed to it here.
+"""
+import logging
+import threading
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import Column, Index, MetaData, Table, func, inspect, select, text
+from sqlalchemy.orm import aliased
+
+from data.models import Vehicle, db
+
+logger = logging.getLogger(__name__)
+
+
+class YearPartitioner:
+
+    def __init__(self, config):
+        self.enabled = config.get("VEHICLE_PARTITIONING", False)
+        self.span = max(1, config.get("PARTITION_YEAR_SPAN", 5))
+        self.min_year = config["MIN_YEAR"]
+        self.max_year = config["MAX_YEAR"]
+        self.metadata = MetaData()
+        self._tables: Dict[Tuple[int, int], Table] = {}
+        self._entities: Dict[Tuple[int, int], Any] = {}
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        start = self.min_year - (self.min_year % self.span)
+        result = []
+        while start <= self.max_year:
+            result.append((start, start + self.span - 1))
+            start += self.span
+        return result
+
+    def range_for_year(self, year: int) -> Tuple[int, int]:
+        # Out-of-range years land in the first or last partition
+        clamped = min(max(year, self.min_year), self.max_year)
+        start = clamped - (clamped % self.span)
+        return start, start + self.span - 1
+
+    def uses_partition_tables(self) -> bool:
+        return self.enabled and db.engine.dialect.name == "sqlite"
+
+    def table_for_year(self, year: int) -> Table:
+        if not self.uses_partition_tables():
+            return Vehicle.__table__
+        return self._partition_table(self.range_for_year(year))
+
+    def entity_for_year(self, year: int):
+        """ORM entity to query for ``year``: ``Vehicle`` or an alias over a partition table."""
+        if not self.uses_partition_tables():
+            return Vehicle
+        key = self.range_for_year(year)
+        entity = self._entities.get(key)
+        if entity is None:
+            entity = aliased(Vehicle, self._partition_table(key), adapt_on_names=True)
+            self._entities[key] = entity
+        return entity
+
+    def all_tables(self) -> List[Table]:
+        if not self.uses_partition_tables():
+            return [Vehicle.__table__]
+        return [self._partition_table(key) for key in self.ranges()]
+
+    def _partition_table(self, key: Tuple[int, int]) -> Table:
+        table = self._tables.get(key)
+        if table is None:
+            name = f"vehicles_y{key[0]}_{key[1]}"
+            columns = [
+                Column(c.name, c.type, primary_key=c.primary_key)
+                for c in Vehicle.__table__.columns
+            ]
+            table = Table(
+                name,
+                self.metadata,
+                *columns,
+                Index(f"ix_{name}_year_make_model_state", "year", "make_id", "model_id", "state"),
+            )
+            self._tables[key] = table
+        return table
+
+    def create_partitions(self) -> None:
+        if not self.enabled:
+            return
+        dialect = db.engine.dialect.name
+        if dialect == "sqlite":
+            self.metadata.create_all(db.engine, tables=self.all_tables())
+        elif dialect == "mysql":
+            self._apply_mysql_partitioning()
+        else:
+            logger.warning(f"Year partitioning is not supported on {dialect}; using one table")
+
+    def next_vehicle_id(self) -> int:
+        # Partition tables share one id space so ORM identities never collide
+        max_id = 0
+        for table in self.all_tables():
+            value = db.session.execute(select(func.max(table.c.id))).scalar()
+            max_id = max(max_id, value or 0)
+        return max_id + 1
+
+    def has_data(self) -> bool:
+        for table in self.all_tables():
+            if db.session.execute(select(table.c.id).limit(1)).first() is not None:
+                return True
+        return False
+
+    def mysql_partition_clause(self) -> str:
+        partitions = [
+            f"PARTITION p{start} VALUES LESS THAN ({end + 1})"
+            for start, end in self.ranges()
+        ]
+        partitions.append("PARTITION p_max VALUES LESS THAN MAXVALUE")
+        return "PARTITION BY RANGE (year) (\n  " + ",\n  ".join(partitions) + "\n)"
+
+    def _apply_mysql_partitioning(self) -> None:
+        with db.engine.begin() as conn:
+            partitioned = conn.execute(
+                text(
+                    "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'vehicles' "
+                    "AND PARTITION_NAME IS NOT NULL"
+                )
+            ).scalar()
+            if partitioned:
+                return
+
+            # InnoDB partitioned tables cannot carry foreign keys, and every
+            # unique key must include the partitioning column.
+            for fk in inspect(conn).get_foreign_keys("vehicles"):
+                conn.execute(text(f"ALTER TABLE vehicles DROP FOREIGN KEY `{fk['name']}`"))
+            conn.execute(text("ALTER TABLE vehicles MODIFY year INT NOT NULL DEFAULT 0"))
+            conn.execute(
+                text(
+                    "ALTER TABLE vehicles DROP PRIMARY KEY, "
+                    "ADD PRIMARY KEY (id, year)"
+                )
+            )
+            conn.execute(text(f"ALTER TABLE vehicles {self.mysql_partition_clause()}"))
+            logger.info("Applied RANGE partitioning on vehicles.year")
+
+
+_partitioners: Dict[Tuple, YearPartitioner] = {}
+_partitioners_lock = threading.Lock()
+
+
+def get_partitioner(config) -> YearPartitioner:
+    key = (
+        bool(config.get("VEHICLE_PARTITIONING", False)),
+        config.get("PARTITION_YEAR_SPAN", 5),
+        config["MIN_YEAR"],
+        config["MAX_YEAR"],
+    )
+    with _partitioners_lock:
+        partitioner = _partitioners.get(key)
+        if partitioner is None:
+            partitioner = YearPartitioner(config)
+            _partitioners[key] = partitioner
+        return partitioner
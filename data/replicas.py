@@ -0,0 +1,160 @@
+"""
+Read/write split between the primary database and read replicas.
+
+Read-only search queries are routed round-robin across the configured replicas;
+everything else, including all importer writes, uses the primary engine bound
+to ``db.session``.  Replicas are health-checked periodically, a replica whose
+heartbeat lags the primary by more than ``REPLICA_MAX_LAG_SECONDS`` is skipped,
+and when no replica is usable reads fail over to the primary.
+
+Lag is measured with a heartbeat row written to the primary after each import
+and replicated like any other data, so it works the same on MySQL replicas and
+on the SQLite files used to stand in for them in tests.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.engine import Engine, make_url
+
+from data.models import ReplicationHeartbeat, db
+
+logger = logging.getLogger(__name__)
+
+
+def touch_heartbeat(session) -> None:
+    """Record a write on the primary; call inside the importer's transaction."""
+    heartbeat = session.get(ReplicationHeartbeat, 1)
+    if heartbeat is None:
+        heartbeat = ReplicationHeartbeat(id=1)
+        session.add(heartbeat)
+    heartbeat.updated_at = time.time()
+
+
+def _read_heartbeat(engine: Engine) -> Optional[float]:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(ReplicationHeartbeat.updated_at).where(ReplicationHeartbeat.id == 1)
+        ).scalar()
+
+
+class Replica:
+
+    def __init__(self, uri: str):
+        self.uri = uri
+        self.name = make_url(uri).render_as_string(hide_password=True)
+        self.engine = create_engine(uri, pool_pre_ping=True)
+        self.healthy = True
+        self.lag: Optional[float] = 0.0
+        self.reads = 0
+        self.failures = 0
+
+
+class ReplicaRouter:
+
+    def __init__(self, uris: List[str], check_interval: float = 10.0, max_lag: float = 30.0):
+        self.replicas = [Replica(uri) for uri in uris]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.primary_reads = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._checked_at = float("-inf")
+
+    def read_engine(self) -> Optional[Engine]:
+        """Next usable replica engine, or None to read from the primary."""
+        if not self.replicas:
+            return None
+
+        self._maybe_check_health()
+
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[self._next]
+                self._next = (self._next + 1) % len(self.replicas)
+                if self._is_usable(replica):
+                    replica.reads += 1
+                    return replica.engine
+            self.primary_reads += 1
+            return None
+
+    def mark_failed(self, engine: Engine) -> None:
+        for replica in self.replicas:
+            if replica.engine is engine:
+                replica.healthy = False
+                replica.failures += 1
+                logger.warning(f"Replica {replica.name} marked unhealthy")
+
+    def _is_usable(self, replica: Replica) -> bool:
+        return replica.healthy and replica.lag is not None and replica.lag <= self.max_lag
+
+    def _maybe_check_health(self) -> None:
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        # Only one thread runs the checks; the others keep using the last state
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self.check_health()
+        finally:
+            self._check_lock.release()
+
+    def check_health(self) -> None:
+        try:
+            primary_beat = _read_heartbeat(db.engine)
+        except Exception as e:
+            logger.warning(f"Could not read primary heartbeat: {str(e)}")
+            primary_beat = None
+
+        for replica in self.replicas:
+            try:
+                replica_beat = _read_heartbeat(replica.engine)
+                replica.healthy = True
+                if primary_beat is None:
+                    replica.lag = 0.0
+                elif replica_beat is None:
+                    replica.lag = None
+                else:
+                    replica.lag = max(0.0, primary_beat - replica_beat)
+            except Exception as e:
+                replica.healthy = False
+                logger.warning(f"Replica {replica.name} failed health check: {str(e)}")
+
+        self._checked_at = time.monotonic()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag,
+                    "reads": replica.reads,
+                    "failures": replica.failures,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+_routers: Dict[Tuple, ReplicaRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_replica_router(config) -> ReplicaRouter:
+    uris = tuple(config.get("SQLALCHEMY_REPLICA_URIS") or ())
+    key = (
+        uris,
+        config.get("REPLICA_HEALTH_CHECK_INTERVAL", 10),
+        config.get("REPLICA_MAX_LAG_SECONDS", 30),
+    )
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = ReplicaRouter(list(uris), key[1], key[2])
+            _routers[key] = router
+        return router
@@ -0,0 +1,123 @@
+"""
+Version of the derived data (aggregate tables and cached search summaries).
+
+Cached entries are keyed by the current version, so publishing a new version
+switches workers from the old entries to the new ones. A rebuild publishes the
+version in the same transaction as the aggregate tables, and its entries are
+warmed before any request uses them, which gives double buffering: requests use
+the old generation until the new one is complete.
+
+Workers re-read the version at most every ``DATA_VERSION_CHECK_SECONDS``. With
+the shared file cache, the rebuild's warm entries are found by every worker.
+With the per-worker memory cache, each worker warms a new version itself and
+switches to it once that is done (see DataVersionTracker.prepare_with).
+"""
+import logging
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Callable, Optional
+
+from sqlalchemy import select
+
+from data.models import DataVersion, db
+
+logger = logging.getLogger(__name__)
+
+DERIVED_DATA = "derived"
+
+
+def new_version() -> str:
+    # Never reused, so entries warmed by a failed rebuild can't be served later
+    return uuid.uuid4().hex[:16]
+
+
+def publish_version(session, version: str, name: str = DERIVED_DATA) -> None:
+    """Make version current; call inside the transaction that built its data."""
+    row = session.get(DataVersion, name)
+    if row is None:
+        row = DataVersion(name=name)
+        session.add(row)
+    row.version = version
+    row.updated_at = time.time()
+
+
+class DataVersionTracker:
+    """The data version this worker serves.
+
+    With a per-worker cache, register a ``prepare_with`` callback: a newly
+    published version is then warmed in the background, and this worker keeps
+    serving the previous one until that finishes.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._version: Optional[str] = None
+        self._preparing: Optional[str] = None
+        self._prepare: Optional[Callable[[str], Any]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def prepare_with(self, prepare: Callable[[str], Any]) -> None:
+        self._prepare = prepare
+
+    def current(self) -> str:
+        """The version to serve, or "" before the first rebuild."""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.check_interval:
+                return self._version
+        try:
+            latest = db.session.scalar(
+                select(DataVersion.version).where(DataVersion.name == DERIVED_DATA)
+            ) or ""
+        except Exception as e:
+            # Keep serving the last known version, e.g. before create_all adds the table
+            logger.debug(f"Could not read data version: {str(e)}")
+            db.session.rollback()
+            latest = self._version or ""
+
+        with self._lock:
+            self._checked_at = now
+            if self._version is None or self._prepare is None or latest == self._version:
+                self._version = latest
+            elif self._preparing != latest:
+                self._preparing = latest
+                threading.Thread(
+                    target=self._switch_when_prepared, args=(latest,), name="data-version-warmup",
+                    daemon=True,
+                ).start()
+            return self._version
+
+    def _switch_when_prepared(self, version: str) -> None:
+        try:
+            self._prepare(version)
+        except Exception as e:
+            logger.warning(f"Could not prepare data version {version}: {str(e)}")
+        with self._lock:
+            if self._preparing != version:
+                return
+            self._version = version
+            self._preparing = None
+        logger.info(f"Switched to data version {version}")
+
+    def refresh(self) -> None:
+        """Re-read the published version on the next call."""
+        with self._lock:
+            self._checked_at = float("-inf")
+
+
+_trackers = weakref.WeakKeyDictionary()
+_trackers_lock = threading.Lock()
+
+
+def get_data_version_tracker(config) -> DataVersionTracker:
+    # One tracker per engine, like the dimension cache
+    engine = db.engine
+    with _trackers_lock:
+        tracker = _trackers.get(engine)
+        if tracker is None:
+            tracker = DataVersionTracker(config.get("DATA_VERSION_CHECK_SECONDS", 5))
+            _trackers[engine] = tracker
+        return tracker
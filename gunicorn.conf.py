@@ -0,0 +1,33 @@
+"""
+gunicorn settings:  gunicorn -c gunicorn.conf.py
+
+With GUNICORN_PRELOAD (the default) the app is created once in the master and
+shared copy-on-write by the workers; see utils.prefork.
+"""
+import multiprocessing
+import os
+
+wsgi_app = "app:app"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() == "true"
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before the first fork
+    if server.cfg.preload_app:
+        from app import app
+        from utils import prefork
+
+        prefork.preload(app)
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from app import app
+        from utils import prefork
+
+        prefork.after_fork(app)
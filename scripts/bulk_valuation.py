@@ -0,0 +1,380 @@
+"""
+Offline bulk valuation of a CSV of vehicles.
+
+    python -m scripts.bulk_valuation INPUT.csv OUTPUT.(csv|parquet) [--workers N]
+
+The input needs ``year``, ``make`` and ``model`` columns; ``mileage`` and
+``state`` are optional. Rows are grouped by (year, make, model, state). Each
+group's PriceStats are read from the precomputed aggregates in a few batched
+queries. Each group is fitted once with PriceEstimator, and its rows are scored
+across a process pool. The workers never touch the database.
+
+Output rows are written as groups finish, so they are not in input order; the
+``row`` column gives each row's position in the input (1-based).
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+
+from data.dimensions import get_dimension_cache, normalize_name
+from data.models import PriceGroupAggregate, RegionPriceAggregate, db
+from services.price_estimator import PriceEstimator
+from services.price_stats import PriceStats
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only needed for Parquet output
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_COLUMNS = (
+    "row", "year", "make", "model", "mileage", "state",
+    "estimated_price", "method", "vehicle_count", "fallback_level", "error",
+)
+
+# (year, make, model, state) with names normalized; state is "" for national
+GroupKey = Tuple[int, str, str, str]
+
+_worker_estimator: Optional[PriceEstimator] = None
+
+
+def _init_worker(config: Dict[str, Any]) -> None:
+    global _worker_estimator
+    _worker_estimator = PriceEstimator(config)
+
+
+def value_groups(groups: List[tuple], estimator: Optional[PriceEstimator] = None) -> List[tuple]:
+    """Score rows group by group; each group is (key, stats, parents, row_numbers, mileages)."""
+    estimator = estimator or _worker_estimator
+    results = []
+    for (year, make, model, state), stats_values, parents_values, row_numbers, mileages in groups:
+        stats = PriceStats(**stats_values) if stats_values is not None else None
+        parents = {
+            level: PriceStats(**values) for level, values in (parents_values or {}).items()
+        }
+        fit_cache: Dict[str, Any] = {}
+
+        # Rows of a group differ only by mileage, and many share one
+        by_mileage: Dict[Optional[int], tuple] = {}
+        for row_number, mileage in zip(row_numbers, mileages):
+            outcome = by_mileage.get(mileage)
+            if outcome is None:
+                estimate = estimator.estimate_group(
+                    stats, year, make, model, mileage, state or None, parents, fit_cache
+                )
+                if estimate is None:
+                    outcome = (None, "no_data", 0, None)
+                else:
+                    price, metadata = estimate
+                    outcome = (
+                        price, metadata["method"], metadata.get("vehicle_count", 0),
+                        metadata.get("fallback_level"),
+                    )
+                by_mileage[mileage] = outcome
+            results.append((row_number, *outcome))
+    return results
+
+
+class CsvOutput:
+
+    def __init__(self, path: str):
+        self._file = open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(OUTPUT_COLUMNS)
+
+    def write(self, rows: List[tuple]) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetOutput:
+
+    def __init__(self, path: str):
+        if pa is None:
+            raise RuntimeError("Parquet output needs pyarrow; install it or write CSV")
+        self.schema = pa.schema([
+            ("row", pa.int64()), ("year", pa.string()), ("make", pa.string()),
+            ("model", pa.string()), ("mileage", pa.string()), ("state", pa.string()),
+            ("estimated_price", pa.float64()), ("method", pa.string()),
+            ("vehicle_count", pa.int64()), ("fallback_level", pa.string()), ("error", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows: List[tuple]) -> None:
+        if rows:
+            columns = list(zip(*rows))
+            self._writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+                schema=self.schema,
+            ))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class Progress:
+
+    def __init__(self, total: int, stream=sys.stderr, interval: float = 0.5):
+        self.total = total
+        self.done = 0
+        self.stream = stream
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._shown = 0.0
+
+    def update(self, count: int) -> None:
+        self.done += count
+        now = time.perf_counter()
+        if self.stream is None or (now - self._shown < self.interval and self.done < self.total):
+            return
+        self._shown = now
+        width = 30
+        filled = int(width * self.done / self.total) if self.total else width
+        rate = self.done / max(now - self.started, 1e-9)
+        self.stream.write(
+            f"\r[{'#' * filled}{'.' * (width - filled)}] {self.done:,}/{self.total:,} rows"
+            f" ({rate:,.0f} rows/s)"
+        )
+        if self.done >= self.total:
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+class BulkValuer:
+
+    def __init__(self, config):
+        self.config = config
+        self.estimator = PriceEstimator(config)
+        self.min_year = config["MIN_YEAR"]
+        self.max_year = config["MAX_YEAR"]
+        self.group_rows = config.get("BULK_VALUATION_TASK_ROWS", 20000)
+
+    def read_input(self, path: str) -> Tuple[Dict[GroupKey, Tuple[list, list]], List[tuple], Dict]:
+        """Group valid rows by key; returns (groups, error rows, original values by row)."""
+        groups: Dict[GroupKey, Tuple[list, list]] = defaultdict(lambda: ([], []))
+        errors: List[tuple] = []
+        originals: Dict[int, tuple] = {}
+
+        # Inventories repeat the same few thousand YMMs and mileages; parse each once
+        keys: Dict[tuple, Tuple[Optional[GroupKey], Optional[str]]] = {}
+        parsed_mileages: Dict[str, Optional[int]] = {"": None}
+
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            header = [name.strip().lower() for name in next(reader, [])]
+            missing = {"year", "make", "model"} - set(header)
+            if missing:
+                raise ValueError(f"Input is missing columns: {', '.join(sorted(missing))}")
+            # Optional columns that are absent read the "" appended to every row
+            pick = itemgetter(*[
+                header.index(name) if name in header else -1
+                for name in ("year", "make", "model", "mileage", "state")
+            ])
+
+            for row_number, row in enumerate(reader, start=1):
+                row.append("")
+                try:
+                    year, make, model, mileage, state = pick(row)
+                except IndexError:
+                    errors.append((row_number, "", "", "", "", "", None, None, None, None, "malformed row"))
+                    continue
+                original = (year.strip(), make.strip(), model.strip(), mileage.strip(), state.strip().upper())
+                mileage = original[3]
+
+                raw_key = original[:3] + original[4:]
+                key, error = keys.get(raw_key, (None, None))
+                if key is None and error is None:
+                    key, error = keys[raw_key] = self._parse_key(*raw_key)
+
+                parsed_mileage = None
+                if error is None:
+                    if mileage in parsed_mileages:
+                        parsed_mileage = parsed_mileages[mileage]
+                    else:
+                        parsed_mileage = parsed_mileages[mileage] = self.estimator.validate_mileage(mileage)
+                    if parsed_mileage is None and mileage:
+                        error = "invalid mileage"
+
+                if error is not None:
+                    errors.append((row_number, *original, None, None, None, None, error))
+                    continue
+
+                row_numbers, mileages = groups[key]
+                row_numbers.append(row_number)
+                mileages.append(parsed_mileage)
+                originals[row_number] = original
+
+        return groups, errors, originals
+
+    def _parse_key(self, year: str, make: str, model: str,
+                   state: str) -> Tuple[Optional[GroupKey], Optional[str]]:
+        if not (year.isdigit() and make and model):
+            return None, "year, make and model are required"
+        if not self.min_year <= int(year) <= self.max_year:
+            return None, f"year must be between {self.min_year} and {self.max_year}"
+        return (int(year), normalize_name(make), normalize_name(model), state), None
+
+    def load_group_stats(self, keys: Iterable[GroupKey]) -> Dict[GroupKey, PriceStats]:
+        """PriceStats per key from the aggregate tables, in batched lookups."""
+        dimension_cache = get_dimension_cache()
+        by_ids: Dict[Tuple[int, int, int], List[GroupKey]] = defaultdict(list)
+        for key in keys:
+            ids = dimension_cache.resolve(key[1], key[2])
+            if ids is not None:
+                by_ids[(key[0], ids[0], ids[1])].append(key)
+
+        stats: Dict[GroupKey, PriceStats] = {}
+        id_keys = list(by_ids)
+        for start in range(0, len(id_keys), 500):
+            chunk = id_keys[start:start + 500]
+            national = db.session.scalars(
+                select(PriceGroupAggregate).where(
+                    PriceGroupAggregate.level == "ymm",
+                    tuple_(
+                        PriceGroupAggregate.year, PriceGroupAggregate.make_id,
+                        PriceGroupAggregate.model_id,
+                    ).in_(chunk),
+                )
+            )
+            for row in national:
+                for key in by_ids[(row.year, row.make_id, row.model_id)]:
+                    if not key[3]:
+                        stats[key] = PriceStats.from_row(row)
+
+            regional_ids = [ids for ids in chunk if any(key[3] for key in by_ids[ids])]
+            if not regional_ids:
+                continue
+            regional = db.session.scalars(
+                select(RegionPriceAggregate).where(
+                    tuple_(
+                        RegionPriceAggregate.year, RegionPriceAggregate.make_id,
+                        RegionPriceAggregate.model_id,
+                    ).in_(regional_ids),
+                )
+            )
+            for row in regional:
+                # Region rows are per city; sum them into the requested states
+                for key in by_ids[(row.year, row.make_id, row.model_id)]:
+                    if key[3] == row.state:
+                        stats.setdefault(key, PriceStats()).merge(PriceStats.from_row(row))
+        return stats
+
+    def prepare_tasks(self, groups: Dict[GroupKey, Tuple[list, list]]) -> List[List[tuple]]:
+        stats = self.load_group_stats(groups)
+        min_rows = self.estimator.min_vehicles_for_regression
+
+        tasks: List[List[tuple]] = [[]]
+        task_rows = 0
+        for key, (row_numbers, mileages) in groups.items():
+            group_stats = stats.get(key)
+            parents = None
+            if group_stats is None or group_stats.reg_count < min_rows:
+                # Sparse groups need their parents; load them here so workers stay off the database
+                parents = {
+                    level: parent.to_dict()
+                    for level, parent in self.estimator.load_parent_stats(*key[:3]).items()
+                }
+            if task_rows >= self.group_rows:
+                tasks.append([])
+                task_rows = 0
+            tasks[-1].append((
+                key, group_stats.to_dict() if group_stats is not None else None,
+                parents, row_numbers, mileages,
+            ))
+            task_rows += len(row_numbers)
+        return [task for task in tasks if task]
+
+    def run(self, input_path: str, output_path: str, workers: Optional[int] = None,
+            output_format: Optional[str] = None, progress_stream=sys.stderr) -> Dict[str, Any]:
+        """Value every row of input_path into output_path; call inside an app context."""
+        started = time.perf_counter()
+        groups, errors, originals = self.read_input(input_path)
+        tasks = self.prepare_tasks(groups)
+        prepared = time.perf_counter()
+
+        if output_format is None:
+            output_format = "parquet" if output_path.endswith(".parquet") else "csv"
+        output = ParquetOutput(output_path) if output_format == "parquet" else CsvOutput(output_path)
+
+        total = len(originals) + len(errors)
+        progress = Progress(total, progress_stream)
+        methods: Counter = Counter()
+        try:
+            output.write(errors)
+            progress.update(len(errors))
+            for results in self._run_tasks(tasks, workers):
+                rows = []
+                for row_number, price, method, vehicle_count, fallback_level in results:
+                    methods[method] += 1
+                    rows.append((row_number, *originals[row_number], price, method,
+                                 vehicle_count, fallback_level, None))
+                output.write(rows)
+                progress.update(len(rows))
+        finally:
+            output.close()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": total,
+            "groups": len(groups),
+            "errors": len(errors),
+            "methods": dict(methods),
+            "seconds": round(elapsed, 3),
+            "prepare_seconds": round(prepared - started, 3),
+            "rows_per_second": round(total / elapsed) if elapsed else None,
+        }
+
+    def _run_tasks(self, tasks: List[List[tuple]], workers: Optional[int]) -> Iterator[List[tuple]]:
+        if workers == 0 or len(tasks) <= 1:
+            for task in tasks:
+                yield value_groups(task, self.estimator)
+            return
+
+        worker_config = {
+            key: value for key, value in self.config.items()
+            if isinstance(value, (str, int, float, bool, type(None)))
+        }
+        # Workers get fitted-group inputs only; their own caches would never be reused
+        worker_config["SEARCH_CACHE_ENABLED"] = False
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(), initializer=_init_worker, initargs=(worker_config,)
+        ) as pool:
+            yield from pool.map(value_groups, tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Value a CSV of vehicles offline")
+    parser.add_argument("input", help="CSV with year, make, model and optional mileage, state")
+    parser.add_argument("output", help="output file (.csv or .parquet)")
+    parser.add_argument("--format", choices=("csv", "parquet"), help="default: from the output extension")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores; 0 runs inline)")
+    parser.add_argument("--quiet", action="store_true", help="no progress bar")
+    args = parser.parse_args()
+
+    from app import app
+
+    valuer = BulkValuer(app.config)
+    with app.app_context():
+        summary = valuer.run(
+            args.input, args.output, args.workers, args.format,
+            progress_stream=None if args.quiet else sys.stderr,
+        )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
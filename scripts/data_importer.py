@@ -1,24 +1,79 @@
+import json
 import logging
+import os
+import re
+import time
 import requests
 import csv
+from collections import Counter
+from datetime import date, datetime, timezone
+from contextlib import nullcontext
 from io import StringIO
-from typing import Optional, Dict, Any
-from data.models import db, Vehicle
+from typing import Optional, Dict, Any, List, Tuple
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, delete, insert, select
+from data.dimensions import DimensionWriter, get_dimension_cache
+from data.gazetteer import normalize_city, normalize_state
+from data.models import db, ImportSnapshot, Vehicle
+from data.partitioning import get_partitioner
+from data.replicas import touch_heartbeat
+from scripts.feed_parser import parse_columns, row_reject_reason
+from scripts.import_quality import QualityFilter, VinIndex, vin_hash
+from services.aggregate_builder import AggregateBuilder
+from services.import_jobs import LeaseLost
+
+VEHICLE_COLUMNS = [c.name for c in Vehicle.__table__.columns]
+SNAPSHOT_DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
 
 logger = logging.getLogger(__name__)
 
+class _ImportState:
+    """Running totals and pending insert batches for one import pass."""
+    
+    def __init__(self, next_id: int, dimensions: DimensionWriter):
+        self.next_id = next_id
+        self.dimensions = dimensions
+        # Accepted rows not yet written, in feed order, with their target table
+        self.pending: List[Tuple[Any, Dict[str, Any]]] = []
+        self.vin_index = VinIndex()
+        self.row_num = 0
+        self.processed_count = 0
+        self.error_count = 0
+        self.rejects: Counter = Counter()
+
+
 class DataImporter:    
     def __init__(self, config):
         self.config = config
         self.data_url = config["INVENTORY_DATA_URL"]
         self.timeout = config["DATA_IMPORT_TIMEOUT"]
+        self.batch_size = config.get("IMPORT_BATCH_SIZE", 1000)
+        self.partitioner = get_partitioner(config)
+        self.parse_mode = config.get("IMPORT_PARSE_MODE", "columnar")
+        self.reject_counts: Counter = Counter()
+        self.quality = QualityFilter(config)
+        self.dedup_vins = config.get("IMPORT_DEDUP_VINS", True)
+        self.report_dir = config.get("IMPORT_REPORT_DIR")
+        self.quality_report: Optional[Dict[str, Any]] = None
+        # table -> prepared INSERT and DELETE-by-ids statements, built once per import
+        self._insert_statements: Dict[Any, Any] = {}
+        self._delete_statements: Dict[Any, Any] = {}
+    
+    def _app_context(self, app):
+        # Reuse an active context for this app so callers share one session
+        if has_app_context() and current_app._get_current_object() is app:
+            return nullcontext()
+        return app.app_context()
     
     def import_inventory_data(self, app) -> bool:
         try:
             logger.info("Starting inventory data import")
             
-            with app.app_context():
-                if Vehicle.query.first():
+            with self._app_context(app):
+                db.create_all()
+                self.partitioner.create_partitions()
+                if self.partitioner.has_data():
                     logger.info("Data already exists, skipping import")
                     return True
                 
@@ -57,40 +112,324 @@ class DataImporter:
             logger.error(f"Unexpected error downloading data: {str(e)}")
             return None
     
-    def _process_and_store_data(self, data: str, app) -> bool:
+    def run_job(self, app, job, queue, worker_id: str) -> bool:
+        """Run an ImportJob claimed by worker_id, committing a progress checkpoint with every batch.
+        
+        Raises LeaseLost, after rolling back the current batch, if another worker
+        has taken the job over.
+        """
+        with self._app_context(app):
+            db.create_all()
+            self.partitioner.create_partitions()
+            
+            if job.kind == 'import' and job.rows_processed == 0 and self.partitioner.has_data():
+                logger.info("Data already exists, skipping import")
+                return True
+            
+            data = self._download_data()
+            if not data:
+                logger.error("Failed to download data")
+                return False
+            
+            total_rows = max(0, data.count('\n') - 1 + (0 if data.endswith('\n') else 1))
+            replace = job.kind == 'refresh' and job.rows_processed == 0
+            if replace:
+                # The delete, the reload and the aggregates commit as one transaction, so
+                # searches never see a partial table and a failure or lost lease leaves
+                # the old data. The job's lease keeps its heartbeat fresh meanwhile.
+                self._clear_vehicles()
+            
+            base_imported = job.rows_imported
+            base_errors = job.error_count
+            
+            def checkpoint(rows_processed, processed_count, error_count):
+                queue.checkpoint(
+                    job, worker_id, rows_processed, base_imported + processed_count,
+                    base_errors + error_count, total_rows=total_rows
+                )
+            
+            success = self._process_and_store_data(
+                data, app, start_row=job.rows_processed, on_checkpoint=checkpoint,
+                checkpoint_batches=not replace
+            )
+            if not success and job.total_rows is not None and job.rows_processed > 0:
+                # A restart after the final checkpoint has nothing left to import
+                success = job.rows_processed >= job.total_rows
+            return success
+    
+    def _clear_vehicles(self) -> None:
+        for table in self.partitioner.all_tables():
+            db.session.execute(delete(table))
+    
+    def _process_and_store_data(
+        self, data: str, app, start_row: int = 0, on_checkpoint=None, checkpoint_batches: bool = True
+    ) -> bool:
         try:
+            # Without batch checkpoints nothing is committed before the final one
+            batch_checkpoint = on_checkpoint if checkpoint_batches else None
             content = StringIO(data)
-            reader = csv.DictReader(content, delimiter='|')
             
-            with app.app_context():
+            with self._app_context(app):
                 db.create_all()
+                self.partitioner.create_partitions()
                 
-                processed_count = 0
-                error_count = 0
-                
-                for row_num, row in enumerate(reader, start=1):
-                    try:
-                        vehicle = self._create_vehicle_from_row(row)
-                        if vehicle:
-                            db.session.add(vehicle)
-                            processed_count += 1
-                        else:
-                            error_count += 1
-                            
-                    except Exception as e:
-                        logger.warning(f"Error processing row {row_num}: {str(e)}")
-                        error_count += 1
+                state = _ImportState(self.partitioner.next_vehicle_id(), DimensionWriter(db.session))
+                if self.dedup_vins and start_row > 0:
+                    # A resumed job must still replace listings written before the restart
+                    self._seed_vin_index(state.vin_index)
+                if self.parse_mode == 'columnar':
+                    self._store_columnar(content, state, start_row, batch_checkpoint)
+                else:
+                    self._store_rows(content, state, start_row, batch_checkpoint)
+                state.row_num = max(state.row_num, start_row)
+                error_count = state.error_count
+                self.reject_counts = state.rejects
                 
+                self._write_pending(state)
+                processed_count = state.processed_count
+                snapshot_date = self._snapshot_date()
+                self.quality_report = {
+                    'snapshot_date': snapshot_date.isoformat(),
+                    'source_url': self.data_url,
+                    'resumed_from_row': start_row,
+                    'rows_read': state.row_num - start_row,
+                    'rows_imported': processed_count,
+                    'dropped': dict(sorted(state.rejects.items())),
+                    'bounds': self.quality.bounds(),
+                }
+                self._record_snapshot(snapshot_date, processed_count, self.quality_report)
+                AggregateBuilder(self.config).build(snapshot_date)
+                if on_checkpoint is not None:
+                    # After the slow aggregate build, so the job row isn't locked while the
+                    # lease is renewed and the committed heartbeat is fresh
+                    on_checkpoint(state.row_num, processed_count, error_count)
+                touch_heartbeat(db.session)
                 db.session.commit()
+                get_dimension_cache().clear()
                 
                 logger.info(f"Data processing completed: {processed_count} vehicles imported, {error_count} errors")
+                if state.rejects:
+                    logger.info(f"Dropped rows by reason: {dict(state.rejects)}")
+                self._write_report(self.quality_report)
                 return processed_count > 0
                 
+        except LeaseLost:
+            db.session.rollback()
+            raise
         except Exception as e:
             logger.error(f"Error processing data: {str(e)}")
+            db.session.rollback()
             return False
     
-    def _create_vehicle_from_row(self, row: Dict[str, Any]) -> Optional[Vehicle]:
+    def _store_rows(self, content, state: "_ImportState", start_row: int, on_checkpoint) -> None:
+        reader = csv.DictReader(content, delimiter='|')
+        for row_num, row in enumerate(reader, start=1):
+            state.row_num = row_num
+            if row_num <= start_row:
+                continue
+            try:
+                vehicle = self._create_vehicle_from_row(row, state.dimensions)
+                if vehicle:
+                    reason = self.quality.reason(
+                        vehicle.year, vehicle.listing_price, vehicle.listing_mileage
+                    )
+                    if reason:
+                        state.error_count += 1
+                        state.rejects[reason] += 1
+                        continue
+                    values = {name: getattr(vehicle, name) for name in VEHICLE_COLUMNS}
+                    self._add_values(state, values)
+                    if len(state.pending) >= self.batch_size:
+                        self._flush(state, on_checkpoint)
+                else:
+                    state.error_count += 1
+                    state.rejects[row_reject_reason(row) or 'error'] += 1
+                    
+            except LeaseLost:
+                raise
+            except Exception as e:
+                logger.warning(f"Error processing row {row_num}: {str(e)}")
+                state.error_count += 1
+                state.rejects['error'] += 1
+    
+    def _store_columnar(self, content, state: "_ImportState", start_row: int, on_checkpoint) -> None:
+        reader = csv.reader(content, delimiter='|')
+        header = next(reader, None)
+        if header is None:
+            return
+        
+        chunk: List[List[str]] = []
+        # csv.DictReader skips blank lines without numbering them; so do we
+        for row in reader:
+            if not row:
+                continue
+            state.row_num += 1
+            if state.row_num <= start_row:
+                continue
+            chunk.append(row)
+            if len(chunk) >= self.batch_size:
+                self._store_chunk(header, chunk, state)
+                chunk = []
+                self._flush(state, on_checkpoint)
+        if chunk:
+            self._store_chunk(header, chunk, state)
+    
+    def _store_chunk(self, header: List[str], chunk: List[List[str]], state: "_ImportState") -> None:
+        columns, accepted, rejects = parse_columns(header, chunk)
+        state.error_count += len(chunk) - int(accepted.sum())
+        state.rejects.update(rejects)
+        
+        rows = np.flatnonzero(accepted)
+        plausible, drops = self.quality.mask(
+            columns['year'][rows],
+            columns['listing_price'][rows], columns['listing_price_valid'][rows],
+            columns['listing_mileage'][rows], columns['listing_mileage_valid'][rows],
+        )
+        rows = rows[plausible]
+        state.error_count += sum(drops.values())
+        state.rejects.update(drops)
+        
+        vins = columns['vin'][rows].tolist()
+        years = columns['year'][rows].tolist()
+        makes = columns['make'][rows].tolist()
+        models = columns['model'][rows].tolist()
+        cities = columns['dealer_city'][rows].tolist()
+        states = columns['dealer_state'][rows].tolist()
+        prices = columns['listing_price'][rows].tolist()
+        price_valid = columns['listing_price_valid'][rows].tolist()
+        mileages = columns['listing_mileage'][rows].tolist()
+        mileage_valid = columns['listing_mileage_valid'][rows].tolist()
+        
+        for i in range(len(rows)):
+            make, make_id, model, model_id = state.dimensions.get_ids(makes[i], models[i])
+            self._add_values(state, {
+                'vin': vins[i],
+                'year': years[i],
+                'make': make,
+                'model': model,
+                'make_id': make_id,
+                'model_id': model_id,
+                'city': normalize_city(cities[i]),
+                'state': normalize_state(states[i]),
+                'listing_price': prices[i] if price_valid[i] else None,
+                'listing_mileage': mileages[i] if mileage_valid[i] else None,
+            })
+    
+    def _add_values(self, state: "_ImportState", values: Dict[str, Any]) -> None:
+        values['id'] = state.next_id
+        state.next_id += 1
+        table = self.partitioner.table_for_year(values['year'])
+        state.pending.append((table, values))
+        state.processed_count += 1
+    
+    def _flush(self, state: "_ImportState", on_checkpoint) -> None:
+        self._write_pending(state)
+        if on_checkpoint is not None:
+            on_checkpoint(state.row_num, state.processed_count, state.error_count)
+            db.session.commit()
+    
+    def _write_pending(self, state: "_ImportState") -> None:
+        pending = state.pending
+        if self.dedup_vins and pending:
+            hashes = np.fromiter(
+                (vin_hash(values['vin']) for _, values in pending), dtype=np.int64, count=len(pending)
+            )
+            ids = np.fromiter((values['id'] for _, values in pending), dtype=np.int64, count=len(pending))
+            keep, replaced = state.vin_index.put_many(hashes, ids)
+            
+            if len(replaced):
+                self._delete_vehicles(replaced.tolist())
+            if len(keep) < len(pending):
+                pending = [pending[i] for i in keep.tolist()]
+            duplicates = len(state.pending) - len(keep) + len(replaced)
+            if duplicates:
+                state.processed_count -= duplicates
+                state.rejects['duplicate_vin'] += duplicates
+        
+        batches: Dict[Any, List[Dict[str, Any]]] = {}
+        for table, values in pending:
+            batches.setdefault(table, []).append(values)
+        self._write_batches(batches)
+        state.pending = []
+    
+    def _delete_vehicles(self, vehicle_ids: List[int]) -> None:
+        # Ids are unique across partitions, so the owning table need not be tracked
+        for start in range(0, len(vehicle_ids), 500):
+            chunk = vehicle_ids[start:start + 500]
+            for table in self.partitioner.all_tables():
+                statement = self._delete_statements.get(table)
+                if statement is None:
+                    statement = delete(table).where(table.c.id.in_(bindparam("ids", expanding=True)))
+                    self._delete_statements[table] = statement
+                db.session.execute(statement, {"ids": chunk})
+    
+    def _seed_vin_index(self, index: VinIndex) -> None:
+        for table in self.partitioner.all_tables():
+            result = db.session.execute(
+                select(table.c.vin, table.c.id)
+                .where(table.c.vin.isnot(None))
+                .execution_options(yield_per=10000)
+            )
+            for rows in result.partitions():
+                index.put_many(
+                    np.fromiter((vin_hash(vin) for vin, _ in rows), dtype=np.int64, count=len(rows)),
+                    np.fromiter((vehicle_id for _, vehicle_id in rows), dtype=np.int64, count=len(rows)),
+                )
+    
+    def _write_report(self, report: Dict[str, Any]) -> None:
+        if not self.report_dir:
+            return
+        try:
+            os.makedirs(self.report_dir, exist_ok=True)
+            path = os.path.join(
+                self.report_dir, f"import-{report['snapshot_date']}-{int(time.time())}.json"
+            )
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"Wrote import quality report to {path}")
+        except OSError as e:
+            logger.warning(f"Could not write import quality report: {str(e)}")
+    
+    def _snapshot_date(self) -> date:
+        # Explicit setting first, then the date embedded in feed names such as
+        # inventory-listing-2022-08-17_first1000.txt, then today
+        configured = self.config.get("SNAPSHOT_DATE")
+        if configured:
+            return date.fromisoformat(configured)
+        match = SNAPSHOT_DATE_RE.search(self.data_url or "")
+        if match:
+            try:
+                return date.fromisoformat(match.group(1))
+            except ValueError:
+                pass
+        return datetime.now(timezone.utc).date()
+    
+    def _record_snapshot(
+        self, snapshot_date: date, row_count: int, report: Optional[Dict[str, Any]] = None
+    ) -> None:
+        snapshot = db.session.scalars(
+            select(ImportSnapshot).where(ImportSnapshot.snapshot_date == snapshot_date)
+        ).first()
+        if snapshot is None:
+            snapshot = ImportSnapshot(snapshot_date=snapshot_date)
+            db.session.add(snapshot)
+        snapshot.source_url = self.data_url
+        snapshot.imported_at = time.time()
+        snapshot.row_count = row_count
+        snapshot.quality_report = json.dumps(report) if report is not None else None
+    
+    def _write_batches(self, batches: Dict[Any, List[Dict[str, Any]]]) -> None:
+        for table, rows in batches.items():
+            if rows:
+                statement = self._insert_statements.get(table)
+                if statement is None:
+                    statement = self._insert_statements[table] = insert(table)
+                db.session.execute(statement, rows)
+                rows.clear()
+    
+    def _create_vehicle_from_row(
+        self, row: Dict[str, Any], dimensions: Optional[DimensionWriter] = None
+    ) -> Optional[Vehicle]:
         try:
             vin = row.get('vin', '').strip()
             if not vin:
@@ -105,23 +444,37 @@ class DataImporter:
             except ValueError:
                 return None
             
-            make = row.get('make', '').strip().lower()
-            model = row.get('model', '').strip().lower()
+            raw_make = row.get('make', '')
+            raw_model = row.get('model', '')
             
-            if not make or not model:
+            if not raw_make.strip() or not raw_model.strip():
                 return None
             
+            make_id = model_id = None
+            if dimensions is not None:
+                make, make_id, model, model_id = dimensions.get_ids(raw_make, raw_model)
+            else:
+                make = raw_make.strip().lower()
+                model = raw_model.strip().lower()
+            
             price = self._parse_float(row.get('listing_price'))
             mileage = self._parse_int(row.get('listing_mileage'))
             
-            city = row.get('dealer_city', '').strip()
-            state = row.get('dealer_state', '').strip()
+            raw_city = row.get('dealer_city', '')
+            raw_state = row.get('dealer_state', '')
+            if raw_city is None or raw_state is None:
+                # Short row: csv.DictReader fills the missing fields with None
+                return None
+            city = normalize_city(raw_city)
+            state = normalize_state(raw_state)
             
             vehicle = Vehicle(
                 vin=vin,
                 year=year,
                 make=make,
                 model=model,
+                make_id=make_id,
+                model_id=model_id,
                 city=city,
                 state=state,
                 listing_price=price,
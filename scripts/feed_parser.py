@@ -0,0 +1,141 @@
+"""
+Columnar validation of inventory feed rows.
+
+``parse_columns`` applies the same acceptance rules as
+``DataImporter._create_vehicle_from_row`` to a whole chunk of rows at once with
+numpy masks, and reports rejects with the same reasons as ``row_reject_reason``.
+Numeric columns are converted in bulk; only chunks containing unparseable
+values fall back to converting those values one at a time, so results always
+match Python's ``int()``/``float()``. Integers too large for int64 are clamped
+to its range rather than rejected.
+"""
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TEXT_FIELDS = ("vin", "year", "make", "model", "dealer_city", "dealer_state")
+NUMERIC_FIELDS = ("listing_price", "listing_mileage")
+
+REJECT_REASONS = (
+    "malformed_row",
+    "missing_vin",
+    "missing_year",
+    "invalid_year",
+    "missing_make_model",
+)
+
+
+def row_reject_reason(row: Dict[str, Any]) -> Optional[str]:
+    """Why ``_create_vehicle_from_row`` rejects a csv.DictReader row, or None."""
+    # csv.DictReader fills fields missing from a short row with None
+    vin = row.get("vin", "")
+    if vin is None:
+        return "malformed_row"
+    if not vin.strip():
+        return "missing_vin"
+
+    year = row.get("year", "")
+    if year is None:
+        return "malformed_row"
+    if not year.strip():
+        return "missing_year"
+    try:
+        int(year.strip())
+    except ValueError:
+        return "invalid_year"
+
+    for name in ("make", "model"):
+        value = row.get(name, "")
+        if value is None:
+            return "malformed_row"
+        if not value.strip():
+            return "missing_make_model"
+
+    if row.get("dealer_city", "") is None or row.get("dealer_state", "") is None:
+        return "malformed_row"
+    return None
+
+
+def _column(rows: Sequence[List[str]], position: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Stripped text of one field and a mask of rows too short to have it."""
+    if position is None:
+        # A field absent from the header reads as "" for every row
+        return np.full(len(rows), "", dtype=str), np.zeros(len(rows), dtype=bool)
+    values = [row[position] if position < len(row) else None for row in rows]
+    short = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+    text = np.array([value or "" for value in values], dtype=str)
+    return np.strings.strip(text), short
+
+
+def _convert(text: np.ndarray, present: np.ndarray, dtype, convert) -> Tuple[np.ndarray, np.ndarray]:
+    values = np.zeros(len(text), dtype=dtype)
+    valid = present.copy()
+    try:
+        values[present] = text[present].astype(dtype)
+    except (ValueError, OverflowError):
+        for i in np.flatnonzero(present):
+            try:
+                value = convert(str(text[i]))
+            except ValueError:
+                valid[i] = False
+                continue
+            if np.issubdtype(dtype, np.integer):
+                # Python ints don't overflow; clamped, the value fails the same
+                # plausibility bound the per-row path rejects it with
+                limits = np.iinfo(dtype)
+                value = min(max(value, limits.min), limits.max)
+            values[i] = value
+    return values, valid
+
+
+def parse_columns(
+    header: Sequence[str], rows: Sequence[List[str]]
+) -> Tuple[Dict[str, np.ndarray], np.ndarray, Counter]:
+    """Parse a chunk of csv.reader rows into columns.
+
+    Returns the columns, a mask of accepted rows and reject counts by reason.
+    ``listing_price``/``listing_mileage`` come with ``*_valid`` masks; invalid or
+    empty values become NULL, as in the per-row path.
+    """
+    # Later duplicates win, as in csv.DictReader
+    positions = {name: position for position, name in enumerate(header)}
+
+    columns: Dict[str, np.ndarray] = {}
+    short: Dict[str, np.ndarray] = {}
+    for name in TEXT_FIELDS + NUMERIC_FIELDS:
+        columns[name], short[name] = _column(rows, positions.get(name))
+
+    present = {name: np.strings.str_len(columns[name]) > 0 for name in columns}
+    year, year_valid = _convert(columns["year"], present["year"], np.int64, int)
+
+    # Checked in the same order as the per-row path; a row counts under its first failure
+    checks = [
+        ("malformed_row", short["vin"]),
+        ("missing_vin", ~present["vin"]),
+        ("malformed_row", short["year"]),
+        ("missing_year", ~present["year"]),
+        ("invalid_year", ~year_valid),
+        ("malformed_row", short["make"]),
+        ("missing_make_model", ~present["make"]),
+        ("malformed_row", short["model"]),
+        ("missing_make_model", ~present["model"]),
+        ("malformed_row", short["dealer_city"] | short["dealer_state"]),
+    ]
+    rejected = np.zeros(len(rows), dtype=bool)
+    rejects: Counter = Counter()
+    for reason, mask in checks:
+        hit = mask & ~rejected
+        count = int(hit.sum())
+        if count:
+            rejects[reason] += count
+            rejected |= hit
+
+    columns["year"] = year
+    columns["listing_price"], columns["listing_price_valid"] = _convert(
+        columns["listing_price"], present["listing_price"], np.float64, float
+    )
+    columns["listing_mileage"], columns["listing_mileage_valid"] = _convert(
+        columns["listing_mileage"], present["listing_mileage"], np.int64, int
+    )
+    return columns, ~rejected, rejects
@@ -0,0 +1,121 @@
+"""
+Plausibility checks and VIN deduplication for the import stream.
+
+``VinIndex`` remembers every imported VIN as a 64-bit hash next to the id of the
+row that holds it, in a few sorted numpy runs (16 bytes per VIN instead of a
+Python dict entry), so the latest listing per VIN can be kept while the feed is
+streamed batch by batch.
+"""
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+QUALITY_REASONS = ("implausible_year", "implausible_price", "implausible_mileage", "duplicate_vin")
+
+
+def vin_hash(vin: str) -> int:
+    # Only compared within one process, so the (salted) builtin string hash is fine
+    return hash(vin.strip().upper())
+
+
+class QualityFilter:
+    """Plausibility bounds for accepted rows; missing price/mileage stay allowed."""
+
+    def __init__(self, config):
+        self.min_year = config.get("MIN_YEAR", 1920)
+        self.max_year = config.get("MAX_YEAR", 2025)
+        self.max_mileage = config.get("MAX_MILEAGE", 500000)
+        self.min_price = config.get("MIN_LISTING_PRICE", 500)
+        self.max_price = config.get("MAX_LISTING_PRICE", 500000)
+
+    def bounds(self) -> dict:
+        return {
+            "year": [self.min_year, self.max_year],
+            "price": [self.min_price, self.max_price],
+            "mileage": [0, self.max_mileage],
+        }
+
+    def reason(self, year: int, price: Optional[float], mileage: Optional[int]) -> Optional[str]:
+        if not self.min_year <= year <= self.max_year:
+            return "implausible_year"
+        if price is not None and not self.min_price <= price <= self.max_price:
+            return "implausible_price"
+        if mileage is not None and not 0 <= mileage <= self.max_mileage:
+            return "implausible_mileage"
+        return None
+
+    def mask(
+        self, years: np.ndarray, prices: np.ndarray, price_valid: np.ndarray,
+        mileages: np.ndarray, mileage_valid: np.ndarray,
+    ) -> Tuple[np.ndarray, Counter]:
+        """Vectorized ``reason``: a mask of plausible rows and drop counts."""
+        checks = [
+            ("implausible_year", (years < self.min_year) | (years > self.max_year)),
+            # Written as a negation so NaN prices are implausible, as in ``reason``
+            ("implausible_price", price_valid & ~((prices >= self.min_price) & (prices <= self.max_price))),
+            ("implausible_mileage", mileage_valid & ((mileages < 0) | (mileages > self.max_mileage))),
+        ]
+        dropped = np.zeros(len(years), dtype=bool)
+        counts: Counter = Counter()
+        for reason, mask in checks:
+            hit = mask & ~dropped
+            count = int(hit.sum())
+            if count:
+                counts[reason] += count
+                dropped |= hit
+        return ~dropped, counts
+
+
+class VinIndex:
+    """VIN hash -> vehicle id, kept as sorted runs that merge as they grow."""
+
+    def __init__(self):
+        self._runs: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys, _ in self._runs)
+
+    def put_many(self, hashes: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Record a batch in feed order.
+
+        Returns the positions in the batch to keep (the last occurrence of each
+        VIN) and the ids of previously recorded rows those VINs replace.
+        """
+        if not len(hashes):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        # Last occurrence wins within the batch
+        _, reversed_first = np.unique(hashes[::-1], return_index=True)
+        keep = np.sort(len(hashes) - 1 - reversed_first)
+        keys = hashes[keep]
+        new_ids = ids[keep]
+
+        replaced = []
+        unseen = np.ones(len(keys), dtype=bool)
+        for run_keys, run_ids in self._runs:
+            positions = np.searchsorted(run_keys, keys)
+            positions[positions == len(run_keys)] = 0
+            found = unseen & (run_keys[positions] == keys)
+            if found.any():
+                replaced.append(run_ids[positions[found]].copy())
+                run_ids[positions[found]] = new_ids[found]
+                unseen &= ~found
+
+        if unseen.any():
+            order = np.argsort(keys[unseen], kind="stable")
+            self._runs.append((keys[unseen][order], new_ids[unseen][order]))
+            self._compact()
+
+        replaced_ids = np.concatenate(replaced) if replaced else np.empty(0, dtype=np.int64)
+        return keep, replaced_ids
+
+    def _compact(self) -> None:
+        # Merge the newest runs while they are of similar size, keeping O(log n) runs
+        while len(self._runs) > 1 and len(self._runs[-2][0]) <= 2 * len(self._runs[-1][0]):
+            newer_keys, newer_ids = self._runs.pop()
+            older_keys, older_ids = self._runs.pop()
+            keys = np.concatenate([older_keys, newer_keys])
+            ids = np.concatenate([older_ids, newer_ids])
+            order = np.argsort(keys, kind="stable")
+            self._runs.append((keys[order], ids[order]))
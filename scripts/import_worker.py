@@ -0,0 +1,135 @@
+"""
+Import job worker and CLI.
+
+    python -m scripts.import_worker enqueue [--refresh | --rebuild]
+    python -m scripts.import_worker status [JOB_ID]
+    python -m scripts.import_worker work [--once] [--poll-interval SECONDS]
+
+Run ``work`` as its own process (not inside gunicorn); web workers only enqueue
+jobs and never run imports themselves. ``--rebuild`` queues an online rebuild
+of the aggregates, caches and index statistics without re-importing
+(see scripts.rebuild).
+"""
+import argparse
+import json
+import logging
+import time
+
+from scripts.data_importer import DataImporter
+from scripts.rebuild import DerivedDataRebuilder
+from services.import_jobs import ImportJobQueue, LeaseLost, default_worker_id
+from services.search_cache import SearchCache
+
+logger = logging.getLogger(__name__)
+
+
+class ImportWorker:
+
+    def __init__(self, app, worker_id=None):
+        self.app = app
+        self.worker_id = worker_id or default_worker_id()
+        self.queue = ImportJobQueue(app.config)
+        self.importer = DataImporter(app.config)
+        self.search_cache = SearchCache(app.config)
+        self.rebuilder = DerivedDataRebuilder(app.config, self.search_cache)
+
+    def run_once(self) -> bool:
+        """Claim and run at most one job; returns True if a job was run."""
+        success = False
+        with self.app.app_context():
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                return False
+
+            kind = job.kind
+            try:
+                error = None
+                with self.queue.lease(job, self.worker_id):
+                    if kind == "rebuild":
+                        success = self.rebuilder.run(
+                            self.app, on_checkpoint=lambda: self.queue.renew(job, self.worker_id)
+                        )
+                        # A published rebuild succeeded; problems after that are kept as notes
+                        error = "; ".join(self.rebuilder.warnings) or None
+                    else:
+                        success = self.importer.run_job(self.app, job, self.queue, self.worker_id)
+                if not success:
+                    error = f"{kind.capitalize()} failed"
+                if not self.queue.finish(job, self.worker_id, success, error):
+                    success = False
+            except LeaseLost as e:
+                # The new owner finishes the job; this worker must not touch it again
+                logger.warning(f"Abandoning job {job.id}: {str(e)}")
+                success = False
+            except Exception as e:
+                logger.error(f"Import job {job.id} crashed: {str(e)}")
+                self.queue.finish(job, self.worker_id, False, str(e))
+
+        if success and kind != "rebuild":
+            # Searches are warmed under a new data version before it is published, so
+            # with the shared file backend web workers switch to entries that are already warm
+            self.rebuilder.refresh_caches(self.app)
+        return True
+
+    def run_forever(self, poll_interval: float = 5.0) -> None:
+        logger.info(f"Import worker {self.worker_id} started")
+        while True:
+            try:
+                ran = self.run_once()
+            except Exception as e:
+                logger.error(f"Import worker error: {str(e)}")
+                ran = False
+            if not ran:
+                time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage inventory import jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="queue an import job")
+    kind = enqueue_parser.add_mutually_exclusive_group()
+    kind.add_argument(
+        "--refresh", action="store_true", help="replace existing listings with a fresh download"
+    )
+    kind.add_argument(
+        "--rebuild", action="store_true",
+        help="rebuild aggregates, caches and index statistics from the current listings"
+    )
+
+    status_parser = subparsers.add_parser("status", help="show job status")
+    status_parser.add_argument("job_id", nargs="?", type=int)
+
+    work_parser = subparsers.add_parser("work", help="run the import worker")
+    work_parser.add_argument("--once", action="store_true")
+    work_parser.add_argument("--poll-interval", type=float, default=5.0)
+
+    args = parser.parse_args()
+
+    from app import app
+
+    queue = ImportJobQueue(app.config)
+
+    if args.command == "enqueue":
+        with app.app_context():
+            job, created = queue.enqueue(
+                "refresh" if args.refresh else "rebuild" if args.rebuild else "import"
+            )
+            print(json.dumps({"created": created, "job": job.to_dict()}, indent=2))
+    elif args.command == "status":
+        with app.app_context():
+            if args.job_id is not None:
+                job = queue.get(args.job_id)
+                print(json.dumps(job.to_dict() if job else None, indent=2))
+            else:
+                print(json.dumps([job.to_dict() for job in queue.recent()], indent=2))
+    else:
+        worker = ImportWorker(app)
+        if args.once:
+            worker.run_once()
+        else:
+            worker.run_forever(args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Online rebuild of everything derived from the listings.
+
+Run by the import worker for ``rebuild`` jobs, queued with ``POST /admin/rebuild``
+or ``python -m scripts.import_worker enqueue --rebuild``. Web workers keep
+serving the current generation while the next one is built:
+
+1. with the shared file cache, the popular searches are summarized under a new
+   data version that no request uses yet; with per-worker memory caches each
+   web worker does this itself before it switches (see data.versions)
+2. the aggregate tables are rebuilt and the version is published in one
+   transaction, so readers see the old rows and entries until it commits
+3. index statistics are refreshed and the valuation model is retrained; the
+   model file is replaced atomically
+"""
+import logging
+import time
+from contextlib import nullcontext
+from typing import List, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import text
+
+from data.models import (
+    PriceGroupAggregate, RegionPriceAggregate, YmmMileageHistogram, YmmPriceSketch, db
+)
+from data.partitioning import get_partitioner
+from data.replicas import touch_heartbeat
+from data.versions import get_data_version_tracker, new_version, publish_version
+from scripts.train_valuation_model import ValuationModelTrainer
+from services.aggregate_builder import AggregateBuilder
+from services.import_jobs import LeaseLost
+from services.search_cache import SearchCache
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_TABLES = (
+    RegionPriceAggregate.__table__, PriceGroupAggregate.__table__,
+    YmmMileageHistogram.__table__, YmmPriceSketch.__table__,
+)
+
+
+class DerivedDataRebuilder:
+
+    def __init__(self, config, search_cache: Optional[SearchCache] = None):
+        self.config = config
+        self.search_cache = search_cache or SearchCache(config)
+        self.aggregates = AggregateBuilder(config)
+        self.partitioner = get_partitioner(config)
+        self.trainer = ValuationModelTrainer(config)
+        self.analyze_tables = config.get("REBUILD_ANALYZE_TABLES", True)
+        # Problems in the steps after publishing; they don't undo a published version
+        self.warnings: List[str] = []
+
+    def _app_context(self, app):
+        # Reuse an active context for this app so callers share one session
+        if has_app_context() and current_app._get_current_object() is app:
+            return nullcontext()
+        return app.app_context()
+
+    def run(self, app, on_checkpoint=None) -> bool:
+        """Rebuild aggregates, cached searches, index statistics and the valuation model.
+
+        Returns False only if the new version was not published; later failures
+        are listed in ``warnings``. ``on_checkpoint()`` runs in the publishing transaction just before it
+        commits; the import worker uses it to check it still holds the job.
+        """
+        start = time.perf_counter()
+        self.warnings = []
+        with self._app_context(app):
+            if not self._publish(app, rebuild_aggregates=True, on_checkpoint=on_checkpoint):
+                return False
+            if self.analyze_tables:
+                self.analyze()
+            if self.trainer.output_path and self.trainer.train() is None:
+                # The new version is already live; the previous model file stays in use
+                self.warnings.append("Valuation model retraining failed; kept the previous model")
+                logger.warning(self.warnings[-1])
+
+        logger.info(f"Rebuilt derived data in {time.perf_counter() - start:.1f}s")
+        return True
+
+    def refresh_caches(self, app) -> bool:
+        """Switch to a new, pre-warmed cache generation; for data that is already committed."""
+        with self._app_context(app):
+            return self._publish(app, rebuild_aggregates=False)
+
+    def _publish(self, app, rebuild_aggregates: bool, on_checkpoint=None) -> bool:
+        version = new_version()
+        try:
+            warmed = 0
+            if self.search_cache.cache.shared:
+                # Before the build: warmup rolls back the session if a search fails. Per-worker
+                # memory caches are warmed by each web worker instead (DataVersionTracker.prepare_with)
+                warmed = self.search_cache.warm_up(app, version=version)
+            if rebuild_aggregates:
+                self.aggregates.build()
+                touch_heartbeat(db.session)
+            publish_version(db.session, version)
+            if on_checkpoint is not None:
+                on_checkpoint()
+            db.session.commit()
+        except LeaseLost:
+            db.session.rollback()
+            raise
+        except Exception as e:
+            logger.error(f"Rebuild failed, keeping the current data version: {str(e)}")
+            db.session.rollback()
+            return False
+
+        get_data_version_tracker(self.config).refresh()
+        pruned = self.search_cache.cache.prune()
+        logger.info(
+            f"Published data version {version} ({warmed} searches warmed, "
+            f"{pruned} expired cache entries removed)"
+        )
+        return True
+
+    def analyze(self) -> None:
+        """Refresh the planner's index statistics for the vehicle and aggregate tables."""
+        dialect = db.engine.dialect
+        command = "ANALYZE TABLE" if dialect.name == "mysql" else "ANALYZE"
+        for table in list(self.partitioner.all_tables()) + list(AGGREGATE_TABLES):
+            try:
+                db.session.execute(text(f"{command} {dialect.identifier_preparer.quote(table.name)}"))
+                db.session.commit()
+            except Exception as e:
+                self.warnings.append(f"Could not analyze {table.name}: {str(e)}")
+                logger.warning(self.warnings[-1])
+                db.session.rollback()
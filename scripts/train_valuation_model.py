@@ -0,0 +1,128 @@
+"""
+Offline training for the multi-factor valuation model.
+
+    python -m scripts.train_valuation_model [--output PATH] [--alpha ALPHA]
+
+Streams every listing with a price and a mileage in batches, fits the ridge
+model in services.valuation_model from its normal equations and writes it to
+VALUATION_MODEL_PATH (or --output).
+Web workers pick up the new file on their next estimate.
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from data.dimensions import normalize_name
+from data.partitioning import get_partitioner
+from data.models import db
+from services.valuation_model import ValuationModel, ValuationModelFit, model_key
+
+logger = logging.getLogger(__name__)
+
+# Rows per streamed batch; training memory is bounded by this and the number of categories
+TRAINING_BATCH_ROWS = 10000
+
+
+class ValuationModelTrainer:
+
+    def __init__(self, config):
+        self.config = config
+        self.alpha = config.get("VALUATION_MODEL_ALPHA", 1.0)
+        self.output_path = config.get("VALUATION_MODEL_PATH")
+        self.partitioner = get_partitioner(config)
+
+    def iter_training_batches(self) -> Iterator[Tuple[np.ndarray, ...]]:
+        """Listings with a price and a mileage as parallel arrays, TRAINING_BATCH_ROWS at a time."""
+        for table in self.partitioner.all_tables():
+            result = db.session.execute(
+                select(
+                    table.c.year, table.c.make, table.c.model,
+                    func.coalesce(table.c.state, ""),
+                    table.c.listing_mileage, table.c.listing_price,
+                )
+                .where(
+                    table.c.year.isnot(None),
+                    table.c.make.isnot(None),
+                    table.c.model.isnot(None),
+                    table.c.listing_mileage.isnot(None),
+                    table.c.listing_price > 0,
+                )
+                .execution_options(yield_per=TRAINING_BATCH_ROWS)
+            )
+            for rows in result.partitions():
+                years, makes, models, states, mileages, prices = zip(*rows)
+                yield (
+                    np.array(years, dtype=np.int64),
+                    np.array([normalize_name(make) for make in makes], dtype=np.str_),
+                    np.array([model_key(make, model) for make, model in zip(makes, models)], dtype=np.str_),
+                    np.array([state.strip() for state in states], dtype=np.str_),
+                    np.maximum(np.array(mileages, dtype=np.float64), 0),
+                    np.array(prices, dtype=np.float64),
+                )
+
+    def train(self, output_path: Optional[str] = None) -> Optional[ValuationModel]:
+        output_path = output_path or self.output_path
+        start = time.perf_counter()
+        try:
+            # Two streaming passes: the normal equations, then the residuals of the solution
+            fit = ValuationModelFit(self.alpha)
+            for batch in self.iter_training_batches():
+                fit.add(*batch)
+            fit.solve()
+            solved = time.perf_counter()
+            for batch in self.iter_training_batches():
+                fit.add_residuals(*batch)
+            model = fit.model()
+            finished = time.perf_counter()
+        except Exception as e:
+            logger.error(f"Valuation model training failed: {str(e)}")
+            return None
+
+        logger.info(
+            f"Fitted valuation model on {model.row_count} listings "
+            f"(fit {solved - start:.1f}s, residuals {finished - solved:.1f}s, "
+            f"log-price RMSE {model.rmse:.3f})"
+        )
+        if output_path:
+            model.save(output_path)
+            logger.info(f"Wrote valuation model to {output_path}")
+        return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the multi-factor valuation model")
+    parser.add_argument("--output", help="model file (default: VALUATION_MODEL_PATH)")
+    parser.add_argument("--alpha", type=float, help="ridge penalty (default: VALUATION_MODEL_ALPHA)")
+    args = parser.parse_args()
+
+    from app import app
+
+    trainer = ValuationModelTrainer(app.config)
+    if args.alpha is not None:
+        trainer.alpha = args.alpha
+    output_path = args.output or trainer.output_path
+    if not output_path:
+        parser.error("set VALUATION_MODEL_PATH or pass --output")
+
+    with app.app_context():
+        model = trainer.train(output_path)
+    if model is None:
+        raise SystemExit(1)
+
+    print(json.dumps({
+        "output": output_path,
+        "rows": model.row_count,
+        "alpha": model.alpha,
+        "rmse_log_price": round(model.rmse, 4),
+        "makes": len(model.weights["make"]),
+        "models": len(model.weights["model"]),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import logging
+from datetime import date
+from itertools import groupby
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import Date, Integer, and_, case, cast, delete, func, insert, literal, select
+
+from data.models import (
+    PriceGroupAggregate, RegionPriceAggregate, YmmDailyPrice, YmmMileageHistogram,
+    YmmPriceSketch, db
+)
+from services.price_stats import STAT_FIELDS
+from data.partitioning import get_partitioner
+from utils.quantile_sketch import KLLSketch
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def compute_mileage_histograms(
+    columns: np.ndarray, bucket_size: int, bucket_count: int
+) -> List[Dict[str, Any]]:
+    """Histogram rows from an (n, 5) array of year, make_id, model_id, mileage, price."""
+    if not len(columns):
+        return []
+
+    year, make_id, model_id, mileage, price = columns.T
+    bucket = np.minimum(mileage // bucket_size, bucket_count - 1)
+    order = np.lexsort((price, bucket, model_id, make_id, year))
+    keys = np.stack((year, make_id, model_id, bucket), axis=1)[order]
+    price = price[order]
+
+    starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+    ends = np.r_[starts[1:], len(price)]
+
+    rows = []
+    for start, end in zip(starts, ends):
+        group = price[start:end]
+        percentiles = np.rint(np.percentile(group, HISTOGRAM_PERCENTILES)).astype(int)
+        row = {
+            "year": int(keys[start, 0]),
+            "make_id": int(keys[start, 1]),
+            "model_id": int(keys[start, 2]),
+            "bucket": int(keys[start, 3]),
+            "listing_count": int(end - start),
+            "min_price": int(round(group[0])),
+            "max_price": int(round(group[-1])),
+        }
+        for pct, value in zip(HISTOGRAM_PERCENTILES, percentiles):
+            row[f"p{pct}"] = int(value)
+        rows.append(row)
+    return rows
+
+
+class AggregateBuilder:
+    """Rebuilds the precomputed aggregate tables from the vehicles table(s)."""
+
+    def __init__(self, config):
+        self.config = config
+        self.partitioner = get_partitioner(config)
+
+    def build(self, snapshot_date: Optional[date] = None) -> None:
+        """Rebuild all aggregates inside the caller's transaction."""
+        self.build_region_aggregates()
+        self.build_group_aggregates()
+        self.build_mileage_histograms()
+        self.build_price_sketches()
+        if snapshot_date is not None:
+            self.build_daily_prices(snapshot_date)
+
+    def build_daily_prices(self, snapshot_date: date) -> None:
+        # History is append-only across dates; re-importing a date replaces its rows
+        db.session.execute(
+            delete(YmmDailyPrice).where(YmmDailyPrice.snapshot_date == snapshot_date)
+        )
+        for table in self.partitioner.all_tables():
+            price = table.c.listing_price
+            db.session.execute(
+                insert(YmmDailyPrice).from_select(
+                    [
+                        "year", "make_id", "model_id", "snapshot_date", "listing_count",
+                        "price_count", "avg_price", "min_price", "max_price", "avg_mileage",
+                    ],
+                    select(
+                        table.c.year,
+                        table.c.make_id,
+                        table.c.model_id,
+                        literal(snapshot_date, Date),
+                        func.count(),
+                        func.count(price),
+                        cast(func.round(func.avg(price)), Integer),
+                        cast(func.round(func.min(price)), Integer),
+                        cast(func.round(func.max(price)), Integer),
+                        cast(func.round(func.avg(table.c.listing_mileage)), Integer),
+                    )
+                    .where(
+                        table.c.year.isnot(None),
+                        table.c.make_id.isnot(None),
+                        table.c.model_id.isnot(None),
+                    )
+                    .group_by(table.c.year, table.c.make_id, table.c.model_id),
+                )
+            )
+        logger.info(f"Recorded daily price history for {snapshot_date.isoformat()}")
+
+    def build_mileage_histograms(self) -> None:
+        bucket_size = self.config.get("MILEAGE_BUCKET_SIZE", 25000)
+        bucket_count = self.config.get("MILEAGE_BUCKET_COUNT", 9)
+
+        db.session.execute(delete(YmmMileageHistogram))
+        # A (year, make, model) group never spans partitions, so each table is
+        # histogrammed on its own
+        for table in self.partitioner.all_tables():
+            result = db.session.execute(
+                select(
+                    table.c.year, table.c.make_id, table.c.model_id,
+                    table.c.listing_mileage, table.c.listing_price,
+                ).where(
+                    table.c.year.isnot(None),
+                    table.c.make_id.isnot(None),
+                    table.c.model_id.isnot(None),
+                    table.c.listing_mileage.isnot(None),
+                    table.c.listing_price.isnot(None),
+                )
+                # Served in index order, one (year, make, model) group after another
+                .order_by(table.c.year, table.c.make_id, table.c.model_id)
+                .execution_options(yield_per=5000)
+            )
+
+            # Only the current group's prices are held, not the whole table's;
+            # rows are inserted after the cursor is drained
+            rows = []
+            for _, group in groupby(result, key=lambda row: tuple(row[:3])):
+                columns = np.array(list(group), dtype=np.float64).reshape(-1, 5)
+                rows.extend(compute_mileage_histograms(columns, bucket_size, bucket_count))
+            if rows:
+                db.session.execute(insert(YmmMileageHistogram), rows)
+        logger.info("Rebuilt mileage price histograms")
+
+    def build_price_sketches(self) -> None:
+        k = self.config.get("QUANTILE_SKETCH_K", 200)
+
+        db.session.execute(delete(YmmPriceSketch))
+        for table in self.partitioner.all_tables():
+            state = func.coalesce(table.c.state, "")
+            city = func.coalesce(table.c.city, "")
+            result = db.session.execute(
+                select(
+                    table.c.year, table.c.make_id, table.c.model_id, state, city,
+                    table.c.listing_price,
+                )
+                .where(
+                    table.c.year.isnot(None),
+                    table.c.make_id.isnot(None),
+                    table.c.model_id.isnot(None),
+                )
+                .execution_options(yield_per=5000)
+            )
+
+            # Rows are streamed; memory is bounded by O(k) per group, not by group size
+            groups: Dict[tuple, list] = {}
+            for year, make_id, model_id, state_value, city_value, price in result:
+                key = (year, make_id, model_id, state_value, city_value)
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = [0, KLLSketch(k)]
+                group[0] += 1
+                if price is not None:
+                    group[1].update(price)
+
+            rows = [
+                {
+                    "year": key[0], "make_id": key[1], "model_id": key[2],
+                    "state": key[3], "city": key[4],
+                    "listing_count": listing_count, "sketch": sketch.to_bytes(),
+                }
+                for key, (listing_count, sketch) in groups.items()
+            ]
+            if rows:
+                db.session.execute(insert(YmmPriceSketch), rows)
+        logger.info("Rebuilt price quantile sketches")
+
+    def build_region_aggregates(self) -> None:
+        db.session.execute(delete(RegionPriceAggregate))
+        for table in self.partitioner.all_tables():
+            db.session.execute(
+                insert(RegionPriceAggregate).from_select(
+                    [
+                        "year", "make_id", "model_id", "state", "city",
+                        "listing_count", "price_count", "price_sum", "reg_count",
+                        "mileage_sum", "mileage_sq_sum", "reg_price_sum",
+                        "reg_price_sq_sum", "price_mileage_sum",
+                    ],
+                    self._region_select(table),
+                )
+            )
+        logger.info("Rebuilt regional price aggregates")
+
+    def build_group_aggregates(self) -> None:
+        """Roll the region aggregates up to ymm, make_model and make level."""
+        db.session.execute(delete(PriceGroupAggregate))
+        source = RegionPriceAggregate.__table__
+        sums = [func.sum(source.c[name]) for name in STAT_FIELDS]
+        zero = literal(0)
+        levels = (
+            ("ymm", [source.c.year, source.c.make_id, source.c.model_id]),
+            ("make_model", [source.c.make_id, source.c.model_id]),
+            ("make", [source.c.make_id]),
+        )
+        for level, group_by in levels:
+            year = source.c.year if level == "ymm" else zero
+            model_id = zero if level == "make" else source.c.model_id
+            db.session.execute(
+                insert(PriceGroupAggregate).from_select(
+                    ["level", "year", "make_id", "model_id", *STAT_FIELDS],
+                    select(literal(level), year, source.c.make_id, model_id, *sums)
+                    .group_by(*group_by),
+                )
+            )
+        logger.info("Rebuilt fallback group aggregates")
+
+    def _region_select(self, table):
+        price = table.c.listing_price
+        mileage = table.c.listing_mileage
+        has_price = price.isnot(None)
+        has_both = and_(has_price, mileage.isnot(None))
+        one = literal(1)
+
+        def reg(expr):
+            return func.coalesce(func.sum(case((has_both, expr), else_=None)), 0)
+
+        # City and state are normalized at import, so the keys match the listing search
+        state = func.coalesce(table.c.state, "")
+        city = func.coalesce(table.c.city, "")
+
+        return (
+            select(
+                table.c.year,
+                table.c.make_id,
+                table.c.model_id,
+                state,
+                city,
+                func.count(),
+                func.coalesce(func.sum(case((has_price, one), else_=0)), 0),
+                func.coalesce(func.sum(price), 0),
+                func.coalesce(func.sum(case((has_both, one), else_=0)), 0),
+                reg(mileage),
+                reg(mileage * mileage),
+                reg(price),
+                reg(price * price),
+                reg(price * mileage),
+            )
+            .where(
+                table.c.year.isnot(None),
+                table.c.make_id.isnot(None),
+                table.c.model_id.isnot(None),
+            )
+            .group_by(table.c.year, table.c.make_id, table.c.model_id, state, city)
+        )
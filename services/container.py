@@ -0,0 +1,39 @@
+"""
+One shared instance of each service per app.
+
+Services hold configuration, prepared statements and caches, but no
+per-request state, so one instance serves every request thread (gthread) or
+greenlet (gevent). Their caches are guarded by ``threading`` locks, which gevent
+monkey-patches into cooperative ones.
+"""
+import threading
+
+from services.import_jobs import ImportJobQueue
+from services.price_estimator import PriceEstimator
+from services.price_history import PriceHistoryService
+from services.search_cache import SearchCache
+from services.vehicle_service import VehicleService
+
+_create_lock = threading.Lock()
+
+
+class ServiceContainer:
+
+    def __init__(self, config):
+        self.config = config
+        self.vehicle_service = VehicleService(config)
+        self.price_estimator = PriceEstimator(config)
+        self.price_history = PriceHistoryService(config)
+        self.search_cache = SearchCache(config, self.vehicle_service)
+        self.import_jobs = ImportJobQueue(config)
+
+
+def get_services(app) -> ServiceContainer:
+    services = app.extensions.get("services")
+    if services is None:
+        with _create_lock:
+            services = app.extensions.get("services")
+            if services is None:
+                services = ServiceContainer(app.config)
+                app.extensions["services"] = services
+    return services
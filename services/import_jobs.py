@@ -0,0 +1,217 @@
+import logging
+import os
+import socket
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from data.models import ImportJob, db
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_KEY = "import"
+JOB_KINDS = ("import", "refresh", "rebuild")
+
+
+class LeaseLost(Exception):
+    """The job was taken over by another worker; the caller must stop writing to it."""
+
+
+class JobLease:
+    """Keeps a claimed job's heartbeat fresh from a background thread.
+
+    Checkpoints only move the heartbeat between batches. The lease also renews
+    it during long steps without any (the download, the aggregate build, a whole
+    rebuild), on its own connection so it commits while the job's transaction is
+    open. A live worker is then never mistaken for a dead one.
+    """
+
+    def __init__(self, engine, job_id: int, worker_id: str, interval: float):
+        self.engine = engine
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "JobLease":
+        self._thread = threading.Thread(
+            target=self._run, name=f"job-lease-{self.job_id}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def renew(self) -> bool:
+        """Move the heartbeat forward; returns False once the job belongs to another worker."""
+        try:
+            with self.engine.begin() as conn:
+                result = conn.execute(
+                    update(ImportJob)
+                    .where(
+                        ImportJob.id == self.job_id,
+                        ImportJob.worker_id == self.worker_id,
+                        ImportJob.status == "running",
+                    )
+                    .values(heartbeat_at=time.time())
+                )
+        except Exception as e:
+            # E.g. SQLite's write lock held by the job itself; retried next interval
+            logger.warning(f"Could not renew lease on job {self.job_id}: {str(e)}")
+            return True
+        if result.rowcount != 1:
+            self.lost = True
+            logger.warning(f"Lost lease on job {self.job_id} to another worker")
+        return not self.lost
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if not self.renew():
+                return
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ImportJobQueue:
+    """DB-backed queue of DataImporter jobs.
+
+    At most one import job can be queued or running at any time, enforced by a
+    unique ``active_key``.  A running job is claimed with a conditional UPDATE,
+    so only one worker ever runs it; if its worker stops sending heartbeats for
+    ``IMPORT_JOB_STALE_SECONDS`` another worker may take it over and resume from
+    the last checkpoint.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.stale_after = config.get("IMPORT_JOB_STALE_SECONDS", 300)
+
+    def enqueue(self, kind: str = "import") -> Tuple[ImportJob, bool]:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown import job kind: {kind}")
+
+        job = ImportJob(
+            kind=kind, status="queued", active_key=ACTIVE_KEY, created_at=time.time()
+        )
+        db.session.add(job)
+        try:
+            db.session.commit()
+            logger.info(f"Queued {kind} job {job.id}")
+            return job, True
+        except IntegrityError:
+            db.session.rollback()
+            active = self.active_job()
+            if active is None:
+                raise
+            logger.info(f"Import job {active.id} already {active.status}, not queueing another")
+            return active, False
+
+    def active_job(self) -> Optional[ImportJob]:
+        return db.session.scalars(
+            select(ImportJob).where(ImportJob.active_key == ACTIVE_KEY).limit(1)
+        ).first()
+
+    def get(self, job_id: int) -> Optional[ImportJob]:
+        return db.session.get(ImportJob, job_id)
+
+    def recent(self, limit: int = 20) -> List[ImportJob]:
+        return db.session.scalars(
+            select(ImportJob).order_by(ImportJob.id.desc()).limit(limit)
+        ).all()
+
+    def claim(self, worker_id: str) -> Optional[ImportJob]:
+        job = self.active_job()
+        if job is None:
+            return None
+
+        now = time.time()
+        result = db.session.execute(
+            update(ImportJob)
+            .where(
+                ImportJob.id == job.id,
+                or_(
+                    ImportJob.status == "queued",
+                    (ImportJob.status == "running")
+                    & (ImportJob.heartbeat_at < now - self.stale_after),
+                ),
+            )
+            .values(
+                status="running",
+                worker_id=worker_id,
+                started_at=now,
+                heartbeat_at=now,
+                attempts=ImportJob.attempts + 1,
+            )
+        )
+        db.session.commit()
+
+        if result.rowcount != 1:
+            return None
+
+        db.session.refresh(job)
+        logger.info(
+            f"Worker {worker_id} claimed job {job.id} (attempt {job.attempts}, "
+            f"resuming at row {job.rows_processed})"
+        )
+        return job
+
+    def checkpoint(
+        self, job: ImportJob, worker_id: str, rows_processed: int, rows_imported: int,
+        error_count: int, total_rows: Optional[int] = None
+    ) -> None:
+        # Not committed here: the importer commits it together with the batch
+        # it describes, so a resumed job never re-imports or skips rows.
+        values = dict(
+            rows_processed=rows_processed,
+            rows_imported=rows_imported,
+            error_count=error_count,
+            heartbeat_at=time.time(),
+        )
+        if total_rows is not None:
+            values["total_rows"] = total_rows
+        self._update_owned(job, worker_id, **values)
+
+    def renew(self, job: ImportJob, worker_id: str) -> None:
+        """Refresh the heartbeat in the current transaction; raises LeaseLost if the job was taken over."""
+        self._update_owned(job, worker_id, heartbeat_at=time.time())
+
+    def lease(self, job: ImportJob, worker_id: str) -> JobLease:
+        """Background heartbeat for the duration of a run: ``with queue.lease(job, me): ...``"""
+        return JobLease(db.engine, job.id, worker_id, max(self.stale_after / 3, 0.05))
+
+    def finish(
+        self, job: ImportJob, worker_id: str, success: bool, error: Optional[str] = None
+    ) -> bool:
+        """Record the outcome; returns False if another worker has taken the job over."""
+        status = "succeeded" if success else "failed"
+        try:
+            self._update_owned(
+                job, worker_id, status=status, active_key=None, finished_at=time.time(), error=error
+            )
+        except LeaseLost as e:
+            db.session.rollback()
+            logger.warning(f"Not recording {status} for job {job.id}: {str(e)}")
+            return False
+        db.session.commit()
+        logger.info(f"Import job {job.id} {status}")
+        return True
+
+    def _update_owned(self, job: ImportJob, worker_id: str, **values) -> None:
+        # Only the worker that holds the job may write to it; after a stale
+        # takeover the previous owner's updates match no row.
+        result = db.session.execute(
+            update(ImportJob)
+            .where(ImportJob.id == job.id, ImportJob.worker_id == worker_id)
+            .values(**values)
+        )
+        if result.rowcount != 1:
+            raise LeaseLost(f"Job {job.id} is no longer held by worker {worker_id}")
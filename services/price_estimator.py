@@ -2,10 +2,25 @@ import logging
 import re
 from typing import List, Tuple, Dict, Any, Optional
 from scipy.stats import linregress
-from data.models import Vehicle
+from sqlalchemy import and_, bindparam, lambda_stmt, or_, select, tuple_
+from data.dimensions import get_dimension_cache, normalize_name
+from data.gazetteer import RegionFilter
+from data.versions import get_data_version_tracker
+from data.models import (
+    Make, PriceGroupAggregate, RegionPriceAggregate, Vehicle, YmmMileageHistogram, db
+)
+from services.price_stats import PriceStats
+from services.valuation_model import get_valuation_model
+from utils.cache import get_cache
 
 logger = logging.getLogger(__name__)
 
+# Parent groups tried in order when a group is too sparse; 'valuation_model' is
+# the offline model, which knows more about an unseen model than its make average
+FALLBACK_LEVELS = ("year_1", "year_2", "make_model", "valuation_model", "make")
+
+_MILEAGE_SEPARATORS = re.compile(r'[,\s]')
+
 
 class PriceEstimator:
 
@@ -14,6 +29,13 @@ class PriceEstimator:
         self.min_vehicles_for_regression = config["MIN_VEHICLES_FOR_REGRESSION"]
         self.price_rounding_factor = config["PRICE_ROUNDING_FACTOR"]
         self.max_mileage = config["MAX_MILEAGE"]
+        self.mileage_bucket_size = config.get("MILEAGE_BUCKET_SIZE", 25000)
+        self.mileage_bucket_count = config.get("MILEAGE_BUCKET_COUNT", 9)
+        self.valuation_model_path = config.get("VALUATION_MODEL_PATH")
+        # Load at startup so the first request doesn't pay for it
+        get_valuation_model(self.valuation_model_path)
+        self.cache_enabled = config.get("SEARCH_CACHE_ENABLED", True)
+        self.cache = get_cache(config)
 
     def estimate_price(
         self, vehicles: List[Vehicle], mileage: Optional[int] = None
@@ -34,14 +56,10 @@ class PriceEstimator:
                 'vehicle_count': len(valid_vehicles),
                 'base_price': base_price
             }
-        
-        print("base_price", base_price)
 
         adjusted_price, metadata = self._apply_mileage_adjustment(
             valid_vehicles, base_price, mileage
         )
-        print("adjusted_price", adjusted_price)
-
 
         rounded_price = self._round_to_nearest(adjusted_price, self.price_rounding_factor)
         metadata['vehicle_count'] = len(valid_vehicles)
@@ -57,7 +75,6 @@ class PriceEstimator:
             v for v in vehicles
             if v.listing_mileage is not None and v.listing_price is not None
         ]
-        print("len(regression_vehicles)", len(regression_vehicles))
 
         if len(regression_vehicles) < self.min_vehicles_for_regression:
 
@@ -96,11 +113,379 @@ class PriceEstimator:
                 'error': str(e)
             }
 
+    def estimate_from_stats(
+        self, stats: PriceStats, mileage: Optional[int] = None
+    ) -> Tuple[float, Dict[str, Any]]:
+        """Same estimate as estimate_price, computed from precomputed PriceStats."""
+        return self.apply_fit(self.fit_stats(stats, with_regression=mileage is not None), mileage)
+
+    def fit_stats(self, stats: PriceStats, with_regression: bool = True) -> Dict[str, Any]:
+        """Everything about a group's estimate that does not depend on the mileage.
+
+        Fit once per group, then apply_fit for each mileage.
+        """
+        fitted = {
+            'listing_count': stats.listing_count,
+            'price_count': stats.price_count,
+            'reg_count': stats.reg_count,
+            'base_price': stats.base_price,
+            'regression': None,
+        }
+        if (not with_regression or fitted['base_price'] is None
+                or stats.reg_count < self.min_vehicles_for_regression):
+            return fitted
+        try:
+            fitted['regression'] = stats.regression()
+        except Exception as e:
+            logger.warning(f"Regression failed: {str(e)}")
+            fitted['error'] = str(e)
+        return fitted
+
+    def apply_fit(
+        self, fitted: Dict[str, Any], mileage: Optional[int] = None
+    ) -> Tuple[float, Dict[str, Any]]:
+        if not fitted['listing_count']:
+            return 0.0, {'method': 'no_data', 'vehicle_count': 0}
+
+        base_price = fitted['base_price']
+        if base_price is None:
+            return 0.0, {'method': 'no_valid_prices', 'vehicle_count': 0}
+
+        if mileage is None:
+            return self._round_to_nearest(base_price, self.price_rounding_factor), {
+                'method': 'average',
+                'vehicle_count': fitted['price_count'],
+                'base_price': base_price
+            }
+
+        fit = fitted['regression']
+        if fit is not None:
+            adjusted_price = max(0, fit['slope'] * mileage + fit['intercept'])
+            metadata = {
+                'method': 'regression',
+                'slope': fit['slope'],
+                'intercept': fit['intercept'],
+                'r_squared': fit['r_value'] ** 2,
+                'p_value': fit['p_value'],
+                'std_err': fit['std_err'],
+                'target_mileage': mileage,
+                'regression_vehicles': fitted['reg_count']
+            }
+        elif 'error' in fitted:
+            adjusted_price, metadata = base_price, {
+                'method': 'average',
+                'regression': 'failed',
+                'error': fitted['error']
+            }
+        else:
+            adjusted_price, metadata = base_price, {
+                'method': 'average',
+                'regression': 'insufficient_data',
+                'regression_vehicles': fitted['reg_count']
+            }
+
+        metadata['vehicle_count'] = fitted['price_count']
+        metadata['base_price'] = base_price
+        return self._round_to_nearest(adjusted_price, self.price_rounding_factor), metadata
+
+    def estimate_from_model(
+        self, year: int, make: str, model: str, mileage: Optional[int] = None,
+        state: Optional[str] = None
+    ) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Estimate from the offline valuation model; None without a model or a known make."""
+        valuation_model = get_valuation_model(self.valuation_model_path)
+        if valuation_model is None or not valuation_model.knows(make, model):
+            return None
+
+        try:
+            predicted_price = valuation_model.predict(year, make, model, mileage, state)
+        except Exception as e:
+            logger.warning(f"Valuation model prediction failed: {str(e)}")
+            return None
+        return self._round_to_nearest(predicted_price, self.price_rounding_factor), {
+            'method': 'model',
+            'predicted_price': predicted_price,
+            'target_mileage': mileage,
+            'model_training_rows': valuation_model.row_count,
+        }
+
+    def estimate_group(
+        self, stats: Optional[PriceStats], year: int, make: str, model: str,
+        mileage: Optional[int] = None, state: Optional[str] = None,
+        parents: Optional[Dict[str, PriceStats]] = None, fit_cache: Optional[Dict[str, Any]] = None
+    ) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Estimate from a group's PriceStats, borrowing from parent groups when it is too sparse.
+
+        Parents are tried in FALLBACK_LEVELS order. When estimating many mileages
+        for one group, pass its ``parents`` (from load_parent_stats) and one
+        ``fit_cache`` dict so the group and each parent are fitted only once.
+        Returns None when nothing matches at any level.
+        """
+        estimate = None
+        if stats is not None and stats.listing_count:
+            fitted = fit_cache.get('group') if fit_cache is not None else None
+            if fitted is None:
+                fitted = self.fit_stats(stats, with_regression=fit_cache is not None or mileage is not None)
+                if fit_cache is not None:
+                    fit_cache['group'] = fitted
+            estimate = self.apply_fit(fitted, mileage)
+            reason = estimate[1].get('regression', estimate[1]['method'])
+            if reason not in ('insufficient_data', 'no_valid_prices'):
+                return estimate
+        else:
+            reason = 'no_data'
+
+        fallback = self._estimate_from_parents(
+            stats, year, make, model, mileage, state, parents, fit_cache
+        )
+        if fallback is None:
+            return estimate
+
+        estimated_price, metadata = fallback
+        metadata['fallback_reason'] = reason
+        metadata['vehicle_count'] = stats.price_count if stats is not None else 0
+        return estimated_price, metadata
+
+    def _estimate_from_parents(
+        self, stats: Optional[PriceStats], year: int, make: str, model: str,
+        mileage: Optional[int], state: Optional[str],
+        parents: Optional[Dict[str, PriceStats]] = None, fit_cache: Optional[Dict[str, Any]] = None
+    ) -> Optional[Tuple[float, Dict[str, Any]]]:
+        for level in FALLBACK_LEVELS:
+            if level == 'valuation_model':
+                estimate = self.estimate_from_model(year, make, model, mileage, state)
+            else:
+                if parents is None:
+                    parents = self.load_parent_stats(year, make, model)
+                parent = parents.get(level)
+                estimate = None
+                if parent is not None:
+                    estimate = self._estimate_from_parent(stats, parent, level, mileage, fit_cache)
+            if estimate is not None:
+                estimate[1]['fallback_level'] = level
+                return estimate
+        return None
+
+    def _estimate_from_parent(
+        self, stats: Optional[PriceStats], parent: PriceStats, level: str,
+        mileage: Optional[int], fit_cache: Optional[Dict[str, Any]] = None
+    ) -> Optional[Tuple[float, Dict[str, Any]]]:
+        if mileage is None:
+            base_price = parent.base_price
+            if base_price is None:
+                return None
+            return self._round_to_nearest(base_price, self.price_rounding_factor), {
+                'method': 'average',
+                'base_price': base_price,
+                'parent_vehicle_count': parent.price_count,
+            }
+
+        if parent.reg_count < self.min_vehicles_for_regression:
+            return None
+        if fit_cache is not None and level in fit_cache:
+            fit = fit_cache[level]
+        else:
+            try:
+                fit = parent.regression()
+            except ValueError:
+                fit = None
+            if fit_cache is not None:
+                fit_cache[level] = fit
+        if fit is None:
+            return None
+
+        if stats is not None and stats.reg_count:
+            # Keep the group's own price level and borrow only the mileage slope
+            own_mileage = stats.mileage_sum / stats.reg_count
+            own_price = stats.reg_price_sum / stats.reg_count
+            predicted_price = own_price + fit['slope'] * (mileage - own_mileage)
+            method = 'borrowed_slope'
+        else:
+            predicted_price = fit['slope'] * mileage + fit['intercept']
+            method = 'regression'
+
+        return self._round_to_nearest(max(0, predicted_price), self.price_rounding_factor), {
+            'method': method,
+            'slope': fit['slope'],
+            'intercept': fit['intercept'],
+            'r_squared': fit['r_value'] ** 2,
+            'target_mileage': mileage,
+            'parent_vehicle_count': parent.reg_count,
+        }
+
+    def load_parent_stats(self, year: int, make: str, model: str) -> Dict[str, PriceStats]:
+        """PriceStats for the fallback levels of a group, from one indexed lookup (cached)."""
+        try:
+            ids = get_dimension_cache().resolve(make, model)
+            if ids is not None:
+                make_id, model_id = ids
+            else:
+                # An unseen model still has a make to fall back to
+                make_id = db.session.scalar(select(Make.id).where(Make.name == normalize_name(make)))
+                if make_id is None:
+                    return {}
+                model_id = None
+
+            version = get_data_version_tracker(self.config).current()
+            key = repr(("parent_stats", str(db.engine.url), version, year, make_id, model_id))
+            if self.cache_enabled:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return {level: PriceStats(**values) for level, values in cached.items()}
+
+            statement = lambda_stmt(lambda: select(PriceGroupAggregate).where(
+                PriceGroupAggregate.make_id == make_id
+            ))
+            if model_id is None:
+                statement += lambda s: s.where(
+                    PriceGroupAggregate.level == 'make', PriceGroupAggregate.model_id == 0
+                )
+            else:
+                model_ids, low, high = [0, model_id], year - 2, year + 2
+                statement += lambda s: s.where(
+                    PriceGroupAggregate.model_id.in_(model_ids),
+                    or_(
+                        PriceGroupAggregate.level.in_(('make', 'make_model')),
+                        and_(
+                            PriceGroupAggregate.level == 'ymm',
+                            PriceGroupAggregate.year.between(low, high),
+                        ),
+                    ),
+                )
+            rows = db.session.scalars(statement).all()
+
+            parents: Dict[str, PriceStats] = {}
+            for row in rows:
+                if row.level != 'ymm':
+                    parents[row.level] = PriceStats.from_row(row)
+                    continue
+                span = abs(row.year - year)
+                for level, max_span in (('year_1', 1), ('year_2', 2)):
+                    if span <= max_span:
+                        parents.setdefault(level, PriceStats()).merge(PriceStats.from_row(row))
+
+            if self.cache_enabled:
+                self.cache.set(key, {level: stats.to_dict() for level, stats in parents.items()})
+            return parents
+
+        except Exception as e:
+            logger.error(f"Error loading fallback statistics: {str(e)}")
+            return {}
+
+    def load_group_stats(
+        self, year: int, make: str, model: str, region: Optional[RegionFilter] = None
+    ) -> PriceStats:
+        """The group's PriceStats from the aggregate tables, without reading listings."""
+        if region is not None:
+            return self.load_region_stats(year, make, model, region)
+        ids = get_dimension_cache().resolve(make, model)
+        if ids is None:
+            return PriceStats()
+
+        make_id, model_id = ids
+        row = db.session.scalars(lambda_stmt(lambda: select(PriceGroupAggregate).where(
+            PriceGroupAggregate.level == 'ymm',
+            PriceGroupAggregate.year == year,
+            PriceGroupAggregate.make_id == make_id,
+            PriceGroupAggregate.model_id == model_id,
+        ))).first()
+        return PriceStats.from_row(row) if row is not None else PriceStats()
+
+    def load_region_stats(
+        self, year: int, make: str, model: str, region: RegionFilter
+    ) -> PriceStats:
+        stats = PriceStats()
+        ids = get_dimension_cache().resolve(make, model)
+        if ids is None:
+            return stats
+
+        make_id, model_id = ids
+        statement = lambda_stmt(lambda: select(RegionPriceAggregate).where(
+            RegionPriceAggregate.year == year,
+            RegionPriceAggregate.make_id == make_id,
+            RegionPriceAggregate.model_id == model_id,
+        ))
+        params = None
+        if region.state is not None:
+            state = region.state
+            statement += lambda s: s.where(RegionPriceAggregate.state == state)
+        else:
+            # Tuple lists cannot be lambda closure values; bind them explicitly
+            states, params = region.states, {"places": sorted(region.places)}
+            statement += lambda s: s.where(
+                RegionPriceAggregate.state.in_(states),
+                tuple_(RegionPriceAggregate.city, RegionPriceAggregate.state).in_(
+                    bindparam("places", expanding=True)
+                ),
+            )
+
+        for row in db.session.scalars(statement, params):
+            stats.merge(PriceStats.from_row(row))
+        return stats
+
+    def estimate_regional_price(
+        self, year: int, make: str, model: str, region: RegionFilter,
+        mileage: Optional[int] = None
+    ) -> Tuple[float, Dict[str, Any]]:
+        stats = self.load_region_stats(year, make, model, region)
+        estimated_price, metadata = self.estimate_from_stats(stats, mileage)
+        metadata['region'] = region.label
+        return estimated_price, metadata
+
+    def get_price_distribution(
+        self, year: int, make: str, model: str, mileage: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Precomputed price range per mileage bucket; the bucket holding ``mileage`` is selected."""
+        try:
+            ids = get_dimension_cache().resolve(make, model)
+            if ids is None:
+                return []
+
+            make_id, model_id = ids
+            rows = db.session.scalars(lambda_stmt(
+                lambda: select(YmmMileageHistogram)
+                .where(
+                    YmmMileageHistogram.year == year,
+                    YmmMileageHistogram.make_id == make_id,
+                    YmmMileageHistogram.model_id == model_id,
+                )
+                .order_by(YmmMileageHistogram.bucket)
+            )).all()
+
+            selected_bucket = None
+            if mileage is not None:
+                selected_bucket = min(mileage // self.mileage_bucket_size, self.mileage_bucket_count - 1)
+
+            distribution = []
+            for row in rows:
+                mileage_min = row.bucket * self.mileage_bucket_size
+                mileage_max = None
+                if row.bucket < self.mileage_bucket_count - 1:
+                    mileage_max = mileage_min + self.mileage_bucket_size
+                distribution.append({
+                    'mileage_min': mileage_min,
+                    'mileage_max': mileage_max,
+                    'count': row.listing_count,
+                    'min_price': row.min_price,
+                    'max_price': row.max_price,
+                    'p10': row.p10,
+                    'p25': row.p25,
+                    'p50': row.p50,
+                    'p75': row.p75,
+                    'p90': row.p90,
+                    'selected': row.bucket == selected_bucket,
+                })
+            return distribution
+
+        except Exception as e:
+            logger.error(f"Error loading price distribution: {str(e)}")
+            return []
+
     def validate_mileage(self, mileage_str: str) -> Optional[int]:
         if not mileage_str or not mileage_str.strip():
             return None
 
-        cleaned = re.sub(r'[,\s]', '', mileage_str.strip())
+        cleaned = _MILEAGE_SEPARATORS.sub('', mileage_str.strip())
 
         try:
             mileage = int(cleaned)
@@ -0,0 +1,74 @@
+import logging
+from datetime import date
+from typing import Any, Dict, Optional
+
+from sqlalchemy import lambda_stmt, select
+
+from data.dimensions import get_dimension_cache
+from data.models import YmmDailyPrice, db
+
+logger = logging.getLogger(__name__)
+
+TREND_COLUMNS = ("date", "listing_count", "avg_price", "min_price", "max_price", "avg_mileage")
+
+
+class PriceHistoryService:
+    """Price trends read from the per-snapshot daily rollups, never from listings."""
+
+    def __init__(self, config):
+        self.config = config
+
+    def parse_date(self, value: str) -> Optional[date]:
+        try:
+            return date.fromisoformat(value.strip())
+        except (AttributeError, ValueError):
+            return None
+
+    def get_trend(
+        self,
+        year: int,
+        make: str,
+        model: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Return the daily series for a YMM as parallel columns, or None if unknown."""
+        try:
+            ids = get_dimension_cache().resolve(make, model)
+            if ids is None:
+                return None
+
+            make_id, model_id = ids
+            stmt = lambda_stmt(
+                lambda: select(
+                    YmmDailyPrice.snapshot_date,
+                    YmmDailyPrice.listing_count,
+                    YmmDailyPrice.avg_price,
+                    YmmDailyPrice.min_price,
+                    YmmDailyPrice.max_price,
+                    YmmDailyPrice.avg_mileage,
+                )
+                .where(
+                    YmmDailyPrice.year == year,
+                    YmmDailyPrice.make_id == make_id,
+                    YmmDailyPrice.model_id == model_id,
+                )
+                .order_by(YmmDailyPrice.snapshot_date)
+            )
+            if start is not None:
+                stmt += lambda s: s.where(YmmDailyPrice.snapshot_date >= start)
+            if end is not None:
+                stmt += lambda s: s.where(YmmDailyPrice.snapshot_date <= end)
+
+            rows = db.session.execute(stmt).all()
+            series = {name: [] for name in TREND_COLUMNS}
+            for row in rows:
+                series["date"].append(row[0].isoformat())
+                for name, value in zip(TREND_COLUMNS[1:], row[1:]):
+                    series[name].append(value)
+            series["count"] = len(rows)
+            return series
+
+        except Exception as e:
+            logger.error(f"Error loading price trend: {str(e)}")
+            return None
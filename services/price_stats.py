@@ -0,0 +1,109 @@
+import math
+from typing import Any, Dict, Optional
+
+from scipy.stats import t as t_dist
+
+# Columns shared by every table that stores PriceStats
+STAT_FIELDS = (
+    "listing_count",
+    "price_count",
+    "price_sum",
+    "reg_count",
+    "mileage_sum",
+    "mileage_sq_sum",
+    "reg_price_sum",
+    "reg_price_sq_sum",
+    "price_mileage_sum",
+)
+
+
+class PriceStats:
+    """Mergeable sufficient statistics for the price estimate of a group of listings.
+
+    Holds enough sums to reproduce the average price and the same least-squares
+    fit that ``scipy.stats.linregress`` computes over (mileage, price), without
+    keeping the listings.  ``reg_*`` sums only cover listings with both a price
+    and a mileage, matching the rows PriceEstimator regresses on.
+    """
+
+    __slots__ = STAT_FIELDS
+
+    def __init__(self, **values):
+        for name in STAT_FIELDS:
+            setattr(self, name, values.get(name) or 0)
+
+    @classmethod
+    def from_row(cls, row) -> "PriceStats":
+        return cls(**{name: getattr(row, name) for name in STAT_FIELDS})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in STAT_FIELDS}
+
+    def add(self, price: Optional[float], mileage: Optional[int]) -> None:
+        self.listing_count += 1
+        if price is None:
+            return
+        self.price_count += 1
+        self.price_sum += price
+        if mileage is None:
+            return
+        self.reg_count += 1
+        self.mileage_sum += mileage
+        self.mileage_sq_sum += mileage * mileage
+        self.reg_price_sum += price
+        self.reg_price_sq_sum += price * price
+        self.price_mileage_sum += price * mileage
+
+    def merge(self, other: "PriceStats") -> "PriceStats":
+        for name in STAT_FIELDS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    @property
+    def base_price(self) -> Optional[float]:
+        if not self.price_count:
+            return None
+        return self.price_sum / self.price_count
+
+    def regression(self) -> Dict[str, float]:
+        """Least-squares fit of price on mileage, equivalent to ``linregress``."""
+        n = self.reg_count
+        if n < 2:
+            raise ValueError("Inputs must not be empty.")
+
+        x_mean = self.mileage_sum / n
+        y_mean = self.reg_price_sum / n
+        ssxm = self.mileage_sq_sum / n - x_mean * x_mean
+        ssym = self.reg_price_sq_sum / n - y_mean * y_mean
+        ssxym = self.price_mileage_sum / n - x_mean * y_mean
+
+        if ssxm <= 0:
+            raise ValueError(
+                "Cannot calculate a linear regression if all x values are identical"
+            )
+        ssym = max(ssym, 0.0)
+
+        if ssym == 0:
+            r = 0.0
+        else:
+            r = max(-1.0, min(1.0, ssxym / math.sqrt(ssxm * ssym)))
+
+        slope = ssxym / ssxm
+        intercept = y_mean - slope * x_mean
+
+        if n == 2:
+            p_value = 1.0 if ssym == 0 else 0.0
+            std_err = 0.0
+        else:
+            df = n - 2
+            t_stat = r * math.sqrt(df / ((1.0 - r) * (1.0 + r) + 1e-20))
+            p_value = float(2 * t_dist.sf(abs(t_stat), df))
+            std_err = math.sqrt(max(0.0, (1 - r * r) * ssym / ssxm / df))
+
+        return {
+            "slope": slope,
+            "intercept": intercept,
+            "r_value": r,
+            "p_value": p_value,
+            "std_err": std_err,
+        }
@@ -0,0 +1,138 @@
+import logging
+from contextlib import nullcontext
+from typing import Any, Dict, Optional
+
+from flask import current_app, has_app_context
+
+from data.gazetteer import RegionFilter
+from data.models import db
+from data.versions import get_data_version_tracker
+from services.vehicle_service import VehicleService
+from utils import metrics
+from utils.cache import get_cache
+from utils.query_log import get_query_log, normalize_query
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_single_flight = SingleFlight("search.single_flight")
+
+
+class SearchCache:
+    """Caches what a search needs besides the mileage: PriceStats and sample listings.
+
+    A cached summary answers both the HTML and JSON searches for any mileage
+    without touching the database.
+    """
+
+    def __init__(self, config, vehicle_service: Optional[VehicleService] = None):
+        self.config = config
+        self.enabled = config.get("SEARCH_CACHE_ENABLED", True)
+        self.cache = get_cache(config)
+        self.query_log = get_query_log(config)
+        self.vehicle_service = vehicle_service or VehicleService(config)
+        self.coalesce = config.get("SINGLE_FLIGHT_ENABLED", True)
+        self.cross_process = config.get("SINGLE_FLIGHT_CROSS_PROCESS", False)
+        self.coalesce_timeout = config.get("SINGLE_FLIGHT_TIMEOUT_SECONDS", 30)
+
+    def _key(self, year: int, make: str, model: str, region: Optional[RegionFilter],
+             version: Optional[str] = None) -> str:
+        # Namespaced by database so apps sharing a process never see each other's rows,
+        # and by data version so a rebuild switches every worker to its entries at once
+        if version is None:
+            version = get_data_version_tracker(self.config).current()
+        region_key = region.cache_key() if region is not None else None
+        return repr((
+            str(db.engine.url), version, year, make.strip().lower(), model.strip().lower(), region_key
+        ))
+
+    def cached_summary(
+        self, year: int, make: str, model: str, region: Optional[RegionFilter] = None
+    ) -> Optional[Dict[str, Any]]:
+        """The cached summary for a search, or None; never runs the search."""
+        if not self.enabled:
+            return None
+        summary = self.cache.get(self._key(year, make, model, region))
+        if summary is not None:
+            metrics.increment("search.cache.hits")
+        return summary
+
+    def get_summary(
+        self, year: int, make: str, model: str, region: Optional[RegionFilter] = None,
+        version: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return {'vehicle_count', 'stats', 'listings'} for a search, or None if nothing matches.
+
+        ``version`` fills the entries of a data version before it is published.
+        """
+        key = self._key(year, make, model, region, version)
+        if self.enabled:
+            summary = self.cache.get(key)
+            if summary is not None:
+                metrics.increment("search.cache.hits")
+                return summary
+            metrics.increment("search.cache.misses")
+
+        if not self.coalesce:
+            return self._compute(key, year, make, model, region)
+        # Concurrent identical searches share one query and one set of statistics
+        return _single_flight.do(
+            key, lambda: self._compute_once(key, year, make, model, region), self.coalesce_timeout
+        )
+
+    def _compute_once(self, key, year, make, model, region) -> Optional[Dict[str, Any]]:
+        if not (self.cross_process and self.enabled):
+            return self._compute(key, year, make, model, region)
+
+        with self.cache.lock(key, self.coalesce_timeout) as locked:
+            if locked:
+                # Another process may have filled the entry while we waited for the lock
+                summary = self.cache.get(key)
+                if summary is not None:
+                    metrics.increment("search.single_flight.cross_process_hits")
+                    return summary
+            return self._compute(key, year, make, model, region)
+
+    def _compute(self, key, year, make, model, region) -> Optional[Dict[str, Any]]:
+        summary = self.vehicle_service.summarize_vehicles(year, make, model, region)
+        if summary is None:
+            return None
+        if self.enabled:
+            self.cache.set(key, summary)
+        return summary
+
+    def record_query(self, year: int, make: str, model: str,
+                     state: str = "", near: str = "", radius: str = "") -> None:
+        try:
+            self.query_log.record(normalize_query(year, make, model, state, near, radius))
+        except Exception as e:
+            logger.warning(f"Could not record search query: {str(e)}")
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def warm_up(self, app, top_n: Optional[int] = None, version: Optional[str] = None) -> int:
+        """Precompute the summaries of the top-N logged searches; returns how many were loaded."""
+        if not self.enabled:
+            return 0
+        if top_n is None:
+            top_n = self.config.get("CACHE_WARMUP_TOP_N", 50)
+        if top_n <= 0:
+            return 0
+
+        loaded = 0
+        reuse_context = has_app_context() and current_app._get_current_object() is app
+        with nullcontext() if reuse_context else app.app_context():
+            for (year, make, model, state, near, radius), _ in self.query_log.top(top_n):
+                try:
+                    region, error = self.vehicle_service.parse_region(state, near, radius)
+                    if error:
+                        continue
+                    if self.get_summary(year, make, model, region, version) is not None:
+                        loaded += 1
+                except Exception as e:
+                    logger.warning(f"Cache warmup failed for {year} {make} {model}: {str(e)}")
+                    db.session.rollback()
+
+        logger.info(f"Warmed search cache with {loaded} of the top {top_n} searches")
+        return loaded
@@ -0,0 +1,316 @@
+"""
+Ridge regression of log price over all listings at once.
+
+Features are one-hot year, make, make+model and state, plus standardized year
+and log-mileage. ``ValuationModelFit`` accumulates the ridge normal equations
+batch by batch and solves them with a sparse solver. The result is exported as
+a small ``.npz`` holding the category names and their float32 weights. Scoring
+a listing takes a few dict lookups.
+
+Unknown categories contribute nothing: an unseen model is priced from its
+make, year, state and mileage, and a missing state gets the national level.
+"""
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve
+
+from data.dimensions import normalize_name
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("year", "make", "model", "state")
+
+
+def model_key(make: str, model: str) -> str:
+    return f"{normalize_name(make)}|{normalize_name(model)}"
+
+
+class ValuationModel:
+
+    def __init__(self, intercept: float, year_mean: float, year_scale: float, year_weight: float,
+                 mileage_mean: float, mileage_scale: float, mileage_weight: float,
+                 smearing: float, weights: Dict[str, Dict[str, float]],
+                 row_count: int = 0, trained_at: float = 0.0, alpha: float = 0.0, rmse: float = 0.0):
+        self.intercept = intercept
+        self.year_mean = year_mean
+        self.year_scale = year_scale
+        self.year_weight = year_weight
+        self.mileage_mean = mileage_mean
+        self.mileage_scale = mileage_scale
+        self.mileage_weight = mileage_weight
+        # Duan's smearing factor: turns exp(predicted log price) into a mean price
+        self.smearing = smearing
+        self.weights = weights
+        self.row_count = row_count
+        self.trained_at = trained_at
+        self.alpha = alpha
+        self.rmse = rmse
+
+    def knows(self, make: str, model: Optional[str] = None) -> bool:
+        if model is not None and model_key(make, model) in self.weights["model"]:
+            return True
+        return normalize_name(make) in self.weights["make"]
+
+    def predict(self, year: int, make: str, model: str, mileage: Optional[int] = None,
+                state: Optional[str] = None) -> float:
+        weights = self.weights
+        log_price = (
+            self.intercept
+            + self.year_weight * (year - self.year_mean) / self.year_scale
+            + weights["year"].get(str(year), 0.0)
+            + weights["make"].get(normalize_name(make), 0.0)
+            + weights["model"].get(model_key(make, model), 0.0)
+        )
+        if state:
+            log_price += weights["state"].get(state.strip().upper(), 0.0)
+        if mileage is not None:
+            log_price += self.mileage_weight * (math.log1p(mileage) - self.mileage_mean) / self.mileage_scale
+        return math.exp(log_price) * self.smearing
+
+    def save(self, path: str) -> None:
+        arrays = {
+            "scalars": np.array([
+                self.intercept, self.year_mean, self.year_scale, self.year_weight,
+                self.mileage_mean, self.mileage_scale, self.mileage_weight, self.smearing,
+                self.row_count, self.trained_at, self.alpha, self.rmse,
+            ], dtype=np.float64),
+        }
+        for category in CATEGORIES:
+            names = list(self.weights[category])
+            arrays[f"{category}_names"] = np.array(names, dtype=np.str_)
+            arrays[f"{category}_weights"] = np.array(
+                [self.weights[category][name] for name in names], dtype=np.float32
+            )
+
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        # Workers reloading the model see the old or the new file, never half of one
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ValuationModel":
+        with np.load(path, allow_pickle=False) as data:
+            scalars = data["scalars"].tolist()
+            weights = {
+                category: dict(zip(
+                    data[f"{category}_names"].tolist(),
+                    data[f"{category}_weights"].astype(np.float64).tolist(),
+                ))
+                for category in CATEGORIES
+            }
+        (intercept, year_mean, year_scale, year_weight, mileage_mean, mileage_scale,
+         mileage_weight, smearing, row_count, trained_at, alpha, rmse) = scalars
+        return cls(intercept, year_mean, year_scale, year_weight, mileage_mean, mileage_scale,
+                   mileage_weight, smearing, weights, int(row_count), trained_at, alpha, rmse)
+
+
+class ValuationModelFit:
+    """Ridge fit accumulated batch by batch from the normal equations.
+
+    Only the Gram matrix X'X and X'y are kept, so memory grows with the number
+    of categories rather than the number of listings. The error statistics need
+    the fitted coefficients, so the data is read twice: ``add`` every batch,
+    ``solve``, then ``add_residuals`` every batch, then ``model``. Batches are
+    parallel arrays as for fit_valuation_model.
+    """
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        # category -> name -> feature column; columns 0-2 are intercept, year and log-mileage
+        self._columns: Dict[str, Dict[str, int]] = {category: {} for category in CATEGORIES}
+        self._width = 3
+        self._gram = sp.csr_matrix((3, 3))
+        self._xty = np.zeros(3)
+        # Year and log-mileage are accumulated relative to their first value, which keeps the
+        # variances computed from the sums accurate
+        self._origin: Optional[Tuple[float, float]] = None
+        self._coefficients: Optional[np.ndarray] = None
+        self._scaling: Tuple[float, float, float, float] = (0.0, 1.0, 0.0, 1.0)
+        self._residual_count = 0
+        self._residual_sq_sum = 0.0
+        self._residual_exp_sum = 0.0
+
+    def _category_columns(self, category: str, values: np.ndarray, add: bool) -> np.ndarray:
+        names, codes = np.unique(np.asarray(values, dtype=np.str_), return_inverse=True)
+        columns = self._columns[category]
+        lookup = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names.tolist()):
+            column = columns.get(name)
+            if column is None:
+                if not add:
+                    # Unknown categories contribute nothing, as in ValuationModel.predict
+                    column = -1
+                else:
+                    column = columns[name] = self._width
+                    self._width += 1
+            lookup[i] = column
+        return lookup[codes]
+
+    def _numeric(self, years, mileages) -> Tuple[np.ndarray, np.ndarray]:
+        years = np.asarray(years, dtype=np.float64)
+        log_mileage = np.log1p(np.asarray(mileages, dtype=np.float64))
+        return years, log_mileage
+
+    def add(self, years, makes, models, states, mileages, prices) -> None:
+        n = len(prices)
+        if not n:
+            return
+        years, log_mileage = self._numeric(years, mileages)
+        if self._origin is None:
+            self._origin = (float(years[0]), float(log_mileage[0]))
+        year_origin, mileage_origin = self._origin
+
+        blocks = [
+            self._category_columns(category, values, add=True)
+            for category, values in zip(
+                CATEGORIES, (years.astype(np.int64).astype(str), makes, models, states)
+            )
+        ]
+        nnz_per_row = 3 + len(blocks)
+        indices = np.column_stack([
+            np.zeros(n, dtype=np.int64), np.ones(n, dtype=np.int64), np.full(n, 2, dtype=np.int64),
+            *blocks,
+        ]).ravel()
+        data = np.column_stack([
+            np.ones(n), years - year_origin, log_mileage - mileage_origin,
+            *[np.ones(n)] * len(blocks),
+        ]).ravel()
+        indptr = np.arange(0, n * nnz_per_row + 1, nnz_per_row)
+        features = sp.csr_matrix((data, indices, indptr), shape=(n, self._width))
+
+        self._gram.resize((self._width, self._width))
+        self._gram = self._gram + (features.T @ features).tocsr()
+        self._xty = np.concatenate([self._xty, np.zeros(self._width - len(self._xty))])
+        self._xty += features.T @ np.log(np.asarray(prices, dtype=np.float64))
+
+    @property
+    def row_count(self) -> int:
+        return int(round(self._gram[0, 0]))
+
+    def solve(self) -> None:
+        n = self.row_count
+        if n < 2:
+            raise ValueError("Need at least two listings to fit a valuation model")
+
+        gram = self._gram
+        year_shift = gram[0, 1] / n
+        mileage_shift = gram[0, 2] / n
+        year_scale = math.sqrt(max(gram[1, 1] / n - year_shift ** 2, 0.0)) or 1.0
+        mileage_scale = math.sqrt(max(gram[2, 2] / n - mileage_shift ** 2, 0.0)) or 1.0
+        year_origin, mileage_origin = self._origin
+        self._scaling = (
+            year_origin + year_shift, year_scale, mileage_origin + mileage_shift, mileage_scale
+        )
+
+        # Standardized features are X @ transform: year and log-mileage centered and scaled
+        transform = sp.lil_matrix((self._width, self._width))
+        transform.setdiag(1.0)
+        transform[0, 1] = -year_shift / year_scale
+        transform[1, 1] = 1.0 / year_scale
+        transform[0, 2] = -mileage_shift / mileage_scale
+        transform[2, 2] = 1.0 / mileage_scale
+        transform = transform.tocsr()
+
+        # Ridge normal equations; the intercept is not penalized
+        penalty = np.full(self._width, float(self.alpha))
+        penalty[0] = 0.0
+        standardized = (transform.T @ gram @ transform + sp.diags(penalty)).tocsc()
+        self._coefficients = spsolve(standardized, transform.T @ self._xty)
+
+    def add_residuals(self, years, makes, models, states, mileages, prices) -> None:
+        if self._coefficients is None:
+            raise RuntimeError("solve() must run before add_residuals()")
+        if not len(prices):
+            return
+        years, log_mileage = self._numeric(years, mileages)
+        coefficients = np.append(self._coefficients, 0.0)
+        year_mean, year_scale, mileage_mean, mileage_scale = self._scaling
+
+        predicted = (
+            coefficients[0]
+            + coefficients[1] * (years - year_mean) / year_scale
+            + coefficients[2] * (log_mileage - mileage_mean) / mileage_scale
+        )
+        for category, values in zip(
+            CATEGORIES, (years.astype(np.int64).astype(str), makes, models, states)
+        ):
+            # Column -1 picks the appended zero
+            predicted += coefficients[self._category_columns(category, values, add=False)]
+
+        residuals = np.log(np.asarray(prices, dtype=np.float64)) - predicted
+        self._residual_count += len(residuals)
+        self._residual_sq_sum += float(np.sum(residuals ** 2))
+        self._residual_exp_sum += float(np.sum(np.exp(residuals)))
+
+    def model(self) -> ValuationModel:
+        coefficients = self._coefficients
+        if coefficients is None or not self._residual_count:
+            raise RuntimeError("solve() and add_residuals() must run before model()")
+        year_mean, year_scale, mileage_mean, mileage_scale = self._scaling
+        weights = {
+            category: {name: float(coefficients[column]) for name, column in sorted(columns.items())}
+            for category, columns in self._columns.items()
+        }
+
+        return ValuationModel(
+            intercept=float(coefficients[0]),
+            year_mean=float(year_mean), year_scale=float(year_scale), year_weight=float(coefficients[1]),
+            mileage_mean=float(mileage_mean), mileage_scale=float(mileage_scale),
+            mileage_weight=float(coefficients[2]),
+            smearing=self._residual_exp_sum / self._residual_count,
+            weights=weights,
+            row_count=self.row_count,
+            trained_at=time.time(),
+            alpha=float(self.alpha),
+            rmse=math.sqrt(self._residual_sq_sum / self._residual_count),
+        )
+
+
+def fit_valuation_model(years: np.ndarray, makes: np.ndarray, models: np.ndarray,
+                        states: np.ndarray, mileages: np.ndarray, prices: np.ndarray,
+                        alpha: float = 1.0) -> ValuationModel:
+    """Fit on parallel arrays; makes/models/states must already be normalized (see model_key)."""
+    columns = (years, makes, models, states, mileages, prices)
+    fit = ValuationModelFit(alpha)
+    fit.add(*columns)
+    fit.solve()
+    fit.add_residuals(*columns)
+    return fit.model()
+
+
+_models: Dict[str, Tuple[float, Optional[ValuationModel]]] = {}
+_models_lock = threading.Lock()
+
+
+def get_valuation_model(path: Optional[str]) -> Optional[ValuationModel]:
+    """The model stored at path, reloaded when the file changes; None if there is none."""
+    if not path:
+        return None
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+
+    with _models_lock:
+        cached = _models.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            model = ValuationModel.load(path)
+            logger.info(f"Loaded valuation model from {path} ({model.row_count} training rows)")
+        except Exception as e:
+            logger.error(f"Could not load valuation model from {path}: {str(e)}")
+            model = None
+        _models[path] = (mtime, model)
+        return model
@@ -1,25 +1,77 @@
 import logging
-from typing import List, Optional
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from data.models import Vehicle, db
+from sqlalchemy import bindparam, select, tuple_
+
+from data.dimensions import get_dimension_cache
+from data.gazetteer import RegionFilter, US_STATES, get_gazetteer
+from data.models import Vehicle, YmmPriceSketch, db
+from data.partitioning import get_partitioner
+from data.replicas import get_replica_router
+from services.price_stats import PriceStats
+from utils.quantile_sketch import KLLSketch
 
 logger = logging.getLogger(__name__)
 
+STATISTIC_QUANTILES = {"p10": 0.1, "p25": 0.25, "p50": 0.5, "p75": 0.75, "p90": 0.9}
+
 
 class VehicleService:
 
     def __init__(self, config):
         self.config = config
         self.max_listings = config["MAX_LISTINGS_DISPLAY"]
+        self.partitioner = get_partitioner(config)
+        self.replica_router = get_replica_router(config)
+        self.default_radius = config.get("REGION_DEFAULT_RADIUS_MILES", 50)
+        self.max_radius = config.get("REGION_MAX_RADIUS_MILES", 500)
+        self.gazetteer_path = config.get("GAZETTEER_PATH") or None
+        self.yield_per = config.get("STREAM_YIELD_PER", 500)
+        # (entity, region filter shape, limited) -> search statement with bound parameters
+        self._search_statements: Dict[Tuple[type, Optional[str], bool], object] = {}
+        self._statements_lock = threading.Lock()
+
+    def _search_statement(self, source, region_shape: Optional[str], limited: bool = False):
+        """The search select for one partition entity, built once and reused.
 
-    def search_vehicles(self, year: int, make: str, model: str) -> List[Vehicle]:
+        Values travel as bound parameters, so every search against a partition
+        shares one statement and one entry in SQLAlchemy's compiled cache. A
+        limited statement takes its row limit as the ``limit`` parameter.
+        """
+        key = (source, region_shape, limited)
+        statement = self._search_statements.get(key)
+        if statement is None:
+            statement = select(source).where(
+                source.year == bindparam("year"),
+                source.make_id == bindparam("make_id"),
+                source.model_id == bindparam("model_id"),
+            )
+            if region_shape is not None:
+                statement = statement.where(source.state.in_(bindparam("states", expanding=True)))
+            if region_shape == "places":
+                statement = statement.where(
+                    tuple_(source.city, source.state).in_(
+                        bindparam("places", expanding=True)
+                    )
+                )
+            if limited:
+                statement = statement.limit(bindparam("limit"))
+            with self._statements_lock:
+                statement = self._search_statements.setdefault(key, statement)
+        return statement
+
+    def search_vehicles(
+        self, year: int, make: str, model: str, region: Optional[RegionFilter] = None
+    ) -> List[Vehicle]:
         try:
-            normalized_make = make.lower().strip()
-            normalized_model = model.lower().strip()
+            ids = get_dimension_cache().resolve(make, model)
+            if ids is None:
+                logger.info(f"Found 0 vehicles for {year} {make} {model}")
+                return []
 
-            vehicles = Vehicle.query.filter_by(
-                year=year, make=normalized_make, model=normalized_model
-            ).all()
+            statement, params = self._search_params(year, ids, region)
+            vehicles = self._execute_read(statement, params)
 
             logger.info(f"Found {len(vehicles)} vehicles for {year} {make} {model}")
             return vehicles
@@ -28,6 +80,122 @@ class VehicleService:
             logger.error(f"Error searching vehicles: {str(e)}")
             return []
 
+    def iter_vehicles(
+        self, year: int, make: str, model: str,
+        region: Optional[RegionFilter] = None, limit: Optional[int] = None
+    ) -> Iterator[Vehicle]:
+        """Yield matching listings, fetched STREAM_YIELD_PER rows at a time.
+
+        Only the current batch is held in memory. ``limit`` is applied in the
+        query itself: an unbuffered MySQL cursor reads every remaining row when
+        it is closed, so stopping the loop early would not save the database
+        from sending the rest of the group.
+        """
+        try:
+            ids = get_dimension_cache().resolve(make, model)
+            if ids is None:
+                return
+
+            statement, params = self._search_params(year, ids, region, limit)
+            yield from self._stream_read(statement, params)
+
+        except Exception as e:
+            logger.error(f"Error streaming vehicles: {str(e)}")
+
+    def summarize_vehicles(
+        self, year: int, make: str, model: str, region: Optional[RegionFilter] = None
+    ) -> Optional[Dict[str, Any]]:
+        """{'vehicle_count', 'stats', 'listings'} for a search in one pass, or None if nothing matches.
+
+        Rows feed a running PriceStats as they stream in; only the first
+        MAX_LISTINGS_DISPLAY are kept as sample listings, so memory stays flat
+        however large the group is.
+        """
+        try:
+            ids = get_dimension_cache().resolve(make, model)
+            if ids is None:
+                logger.info(f"Found 0 vehicles for {year} {make} {model}")
+                return None
+
+            statement, params = self._search_params(year, ids, region)
+            stats = PriceStats()
+            listings = []
+            for vehicle in self._stream_read(statement, params):
+                stats.add(vehicle.listing_price, vehicle.listing_mileage)
+                if len(listings) < self.max_listings:
+                    listings.append(vehicle.to_dict())
+
+            logger.info(f"Found {stats.listing_count} vehicles for {year} {make} {model}")
+            if not stats.listing_count:
+                return None
+            return {
+                'vehicle_count': stats.listing_count,
+                'stats': stats.to_dict(),
+                'listings': listings,
+            }
+
+        except Exception as e:
+            logger.error(f"Error summarizing vehicles: {str(e)}")
+            return None
+
+    def _search_params(
+        self, year: int, ids: Tuple[int, int], region: Optional[RegionFilter],
+        limit: Optional[int] = None
+    ):
+        make_id, model_id = ids
+        params = {"year": year, "make_id": make_id, "model_id": model_id}
+        if limit is not None:
+            params["limit"] = limit
+        region_shape = None
+        if region is not None:
+            region_shape = "states"
+            params["states"] = list(region.states)
+            if region.places is not None:
+                region_shape = "places"
+                params["places"] = sorted(region.places)
+        statement = self._search_statement(
+            self.partitioner.entity_for_year(year), region_shape, limit is not None
+        )
+        return statement, params
+
+    def _stream_read(self, statement, params: dict) -> Iterator[Vehicle]:
+        # Replica failures are retried on the primary only before the first row
+        options = {"yield_per": self.yield_per}
+        result = None
+        engine = self.replica_router.read_engine()
+        if engine is not None:
+            try:
+                result = db.session.scalars(
+                    statement, params, execution_options=options, bind_arguments={"bind": engine}
+                )
+            except Exception as e:
+                logger.warning(f"Replica read failed, falling back to primary: {str(e)}")
+                self.replica_router.mark_failed(engine)
+                db.session.rollback()
+        if result is None:
+            result = db.session.scalars(statement, params, execution_options=options)
+        try:
+            yield from result
+        finally:
+            result.close()
+
+    def _execute_read(self, statement, params: Optional[dict] = None) -> list:
+        return self._read(lambda **options: db.session.scalars(statement, params, **options).all())
+
+    def _execute_read_rows(self, statement, params: Optional[dict] = None) -> list:
+        return self._read(lambda **options: db.session.execute(statement, params, **options).all())
+
+    def _read(self, run) -> list:
+        engine = self.replica_router.read_engine()
+        if engine is not None:
+            try:
+                return run(bind_arguments={"bind": engine})
+            except Exception as e:
+                logger.warning(f"Replica read failed, falling back to primary: {str(e)}")
+                self.replica_router.mark_failed(engine)
+                db.session.rollback()
+        return run()
+
     def get_sample_listings(self, vehicles: List[Vehicle]) -> List[dict]:
 
         try:
@@ -67,41 +235,91 @@ class VehicleService:
 
         return True, None
 
-    def get_vehicle_statistics(self, vehicles: List[Vehicle]) -> dict:
-        if not vehicles:
-            return {
-                "total_vehicles": 0,
-                "vehicles_with_prices": 0,
-                "vehicles_with_mileage": 0,
-                "price_range": None,
-                "mileage_range": None,
-            }
+    def parse_region(
+        self, state: str, near: str, radius: str
+    ) -> tuple[Optional[RegionFilter], Optional[str]]:
+        state = (state or "").strip().upper()
+        near = (near or "").strip()
+        radius = (radius or "").strip()
 
-        vehicles_with_prices = [v for v in vehicles if v.listing_price is not None]
-        vehicles_with_mileage = [v for v in vehicles if v.listing_mileage is not None]
+        if state and near:
+            return None, "Enter either a state or a location, not both"
 
-        price_range = None
-        if vehicles_with_prices:
-            prices = [v.listing_price for v in vehicles_with_prices]
-            price_range = {
-                "min": min(prices),
-                "max": max(prices),
-                "avg": sum(prices) / len(prices),
-            }
+        if state:
+            if state not in US_STATES:
+                return None, "State must be a valid two-letter US state code"
+            return RegionFilter(f"in {state}", state=state), None
+
+        if not near:
+            return None, None
+
+        gazetteer = get_gazetteer(self.gazetteer_path)
+        place = gazetteer.resolve(near)
+        if place is None:
+            return None, f"Unknown location: {near}"
+
+        radius_miles = self.default_radius
+        if radius:
+            try:
+                radius_miles = float(radius)
+            except ValueError:
+                return None, "Radius must be a number of miles"
+            if radius_miles <= 0 or radius_miles > self.max_radius:
+                return None, f"Radius must be between 0 and {self.max_radius} miles"
 
-        mileage_range = None
-        if vehicles_with_mileage:
-            mileages = [v.listing_mileage for v in vehicles_with_mileage]
-            mileage_range = {
-                "min": min(mileages),
-                "max": max(mileages),
-                "avg": sum(mileages) / len(mileages),
+        return gazetteer.radius_region(place, radius_miles), None
+
+    def get_vehicle_statistics(
+        self, year: int, make: str, model: str,
+        region: Optional[RegionFilter] = None, end_year: Optional[int] = None
+    ) -> dict:
+        """Price statistics with approximate percentiles, merged from the stored sketches.
+
+        Reads one small row per (year, state, city) instead of the listings;
+        ``end_year`` widens the query to the years ``year``..``end_year``.
+        """
+        empty = {"total_vehicles": 0, "vehicles_with_prices": 0, "price_range": None}
+        try:
+            ids = get_dimension_cache().resolve(make, model)
+            if ids is None:
+                return empty
+
+            statement = select(
+                YmmPriceSketch.listing_count, YmmPriceSketch.sketch
+            ).where(
+                YmmPriceSketch.year.between(year, end_year if end_year is not None else year),
+                YmmPriceSketch.make_id == ids[0],
+                YmmPriceSketch.model_id == ids[1],
+            )
+            if region is not None:
+                statement = statement.where(YmmPriceSketch.state.in_(region.states))
+                if region.places is not None:
+                    statement = statement.where(
+                        tuple_(YmmPriceSketch.city, YmmPriceSketch.state).in_(sorted(region.places))
+                    )
+
+            total = 0
+            merged = None
+            for listing_count, data in self._execute_read_rows(statement):
+                total += listing_count
+                sketch = KLLSketch.from_bytes(data)
+                merged = sketch if merged is None else merged.merge(sketch)
+
+            if not total:
+                return empty
+
+            price_range = None
+            if merged.count:
+                price_range = {"min": merged.min, "max": merged.max, "avg": merged.mean}
+                for name, q in STATISTIC_QUANTILES.items():
+                    price_range[name] = merged.quantile(q)
+
+            return {
+                "total_vehicles": total,
+                "vehicles_with_prices": merged.count,
+                "price_range": price_range,
             }
 
-        return {
-            "total_vehicles": len(vehicles),
-            "vehicles_with_prices": len(vehicles_with_prices),
-            "vehicles_with_mileage": len(vehicles_with_mileage),
-            "price_range": price_range,
-            "mileage_range": mileage_range,
-        }
+        except Exception as e:
+            logger.error(f"Error loading vehicle statistics: {str(e)}")
+            return empty
@@ -1,11 +1,12 @@
 import pytest
 import tempfile
 import os
-from flask import Flask, request, render_template, flash
+from flask import Flask
+from app import register_routes
 from data.models import db, Vehicle
 from config import TestingConfig
-from services.vehicle_service import VehicleService
-from services.price_estimator import PriceEstimator
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
 
 
 def create_mock_config():
@@ -24,12 +25,19 @@ def create_mock_config():
 
 
 @pytest.fixture
-def app():
+def app_config():
+    """Settings applied on top of TestingConfig; override the fixture to change them."""
+    return create_mock_config()
+
+
+@pytest.fixture
+def app(app_config):
     # Create a temporary file to isolate the database for each test
     db_fd, db_path = tempfile.mkstemp()
     
-    app = Flask(__name__)
+    app = Flask(__name__, template_folder=TEMPLATE_DIR)
     app.config.from_object(TestingConfig)
+    app.config.update(app_config)
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
     app.config['TESTING'] = True
     app.config['WTF_CSRF_ENABLED'] = False
@@ -37,58 +45,8 @@ def app():
     # Initialize the database
     db.init_app(app)
     
-    # Register routes for testing
-    @app.route("/", methods=["GET", "POST"])
-    def index():
-        """Main search route for testing."""
-        if request.method == "POST":
-            # Extract form data
-            year = request.form.get("year", "").strip()
-            make = request.form.get("make", "").strip()
-            model = request.form.get("model", "").strip()
-            mileage = request.form.get("mileage", "").strip()
-            
-            # Basic validation
-            if not (year and make and model):
-                flash("Year, Make, and Model are required fields.")
-                return f"Search Page - Error: Year, Make, and Model are required fields. Year: {year}, Make: {make}, Model: {model}, Mileage: {mileage}"
-            
-            # Validate year format
-            try:
-                year_int = int(year)
-            except ValueError:
-                flash("Year must be a valid number.")
-                return f"Search Page - Error: Year must be a valid number. Year: {year}, Make: {make}, Model: {model}, Mileage: {mileage}"
-            
-            # Validate year range
-            mock_config = create_mock_config()
-            if year_int < mock_config["MIN_YEAR"] or year_int > mock_config["MAX_YEAR"]:
-                flash(f"Year must be between {mock_config["MIN_YEAR"]} and {mock_config["MAX_YEAR"]}.")
-                return f"Search Page - Error: Year must be between {mock_config["MIN_YEAR"]} and {mock_config["MAX_YEAR"]}. Year: {year}, Make: {make}, Model: {model}, Mileage: {mileage}"
-            
-            # Search for vehicles
-            vehicle_service = VehicleService(create_mock_config())
-            vehicles = vehicle_service.search_vehicles(year_int, make, model)
-            
-            if not vehicles:
-                flash(f"No vehicles found for {year} {make} {model}")
-                return f"Search Page - Error: No vehicles found for {year} {make} {model}. Year: {year}, Make: {make}, Model: {model}, Mileage: {mileage}"
-            
-            # Estimate price
-            price_estimator = PriceEstimator(create_mock_config())
-            parsed_mileage = None
-            if mileage:
-                parsed_mileage = price_estimator.validate_mileage(mileage)
-                if parsed_mileage is None:
-                    flash("Invalid mileage format. Please enter a valid number.")
-                    return f"Search Page - Error: Invalid mileage format. Year: {year}, Make: {make}, Model: {model}, Mileage: {mileage}"
-            
-            estimated_price, _ = price_estimator.estimate_price(vehicles, parsed_mileage)
-            listings = vehicle_service.get_sample_listings(vehicles)
-            
-            return f"Results Page - Vehicle: {year} {make} {model}, Mileage: {mileage}, Price: ${estimated_price}, Listings: {len(listings)}"
-        
-        return "Search Page - Year: , Make: , Model: , Mileage: "
+    # The production routes, wired through the app's ServiceContainer
+    register_routes(app)
     
     with app.app_context():
         db.create_all()
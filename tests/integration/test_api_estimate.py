@@ -0,0 +1,80 @@
+import json
+import pytest
+from controllers.search_controller import SearchController
+
+
+class TestApiEstimate:
+    
+    def _get(self, app, mock_config, query):
+        controller = SearchController(mock_config)
+        with app.test_request_context(f'/api/estimate?{query}'):
+            return controller.handle_api_request()
+    
+    def test_full_format(self, populated_db, mock_config):
+        response = self._get(populated_db, mock_config, 'year=2015&make=Toyota&model=Camry')
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'application/json'
+        payload = json.loads(response.get_data())
+        assert payload['ymm'] == '2015 Toyota Camry'
+        assert payload['metadata']['method'] == 'average'
+        assert len(payload['listings']) == 5
+        assert payload['listings'][0]['vehicle'] == '2015 toyota camry'
+        assert payload['distribution_scope'] == 'national'
+    
+    def test_compact_format(self, populated_db, mock_config):
+        response = self._get(
+            populated_db, mock_config,
+            'year=2015&make=Toyota&model=Camry&mileage=100000&format=compact'
+        )
+        
+        assert response.status_code == 200
+        payload = json.loads(response.get_data())
+        assert payload['method'] == 'regression'
+        assert payload['vehicle_count'] == 5
+        assert payload['listings']['count'] == 5
+        assert len(payload['listings']['price']) == 5
+        assert 'metadata' not in payload
+    
+    def test_compact_is_smaller(self, populated_db, mock_config):
+        full = self._get(populated_db, mock_config, 'year=2015&make=Toyota&model=Camry')
+        compact = self._get(
+            populated_db, mock_config, 'year=2015&make=Toyota&model=Camry&format=compact'
+        )
+        
+        assert len(compact.get_data()) < len(full.get_data())
+    
+    def test_invalid_input(self, populated_db, mock_config):
+        response = self._get(populated_db, mock_config, 'year=abc&make=Toyota&model=Camry')
+        
+        assert response.status_code == 400
+        assert json.loads(response.get_data())['error'] == 'Year must be a valid number'
+    
+    def test_invalid_format(self, populated_db, mock_config):
+        response = self._get(
+            populated_db, mock_config, 'year=2015&make=Toyota&model=Camry&format=xml'
+        )
+        
+        assert response.status_code == 400
+    
+    def test_not_found(self, populated_db, mock_config):
+        response = self._get(populated_db, mock_config, 'year=2020&make=Tesla&model=Model S')
+        
+        assert response.status_code == 404
+    
+    def test_state_filter(self, populated_db, mock_config):
+        response = self._get(
+            populated_db, mock_config, 'year=2015&make=Toyota&model=Camry&state=TX'
+        )
+        
+        assert response.status_code == 200
+        payload = json.loads(response.get_data())
+        assert payload['region'] == 'in TX'
+        assert [listing['location'] for listing in payload['listings']] == ['Dallas, TX']
+    
+    def test_unknown_location(self, populated_db, mock_config):
+        response = self._get(
+            populated_db, mock_config, 'year=2015&make=Toyota&model=Camry&near=Atlantis'
+        )
+        
+        assert response.status_code == 400
@@ -1,5 +1,11 @@
+from unittest.mock import patch
+
 import pytest
 from flask import url_for
+from data.models import db
+from services.aggregate_builder import AggregateBuilder
+from services.vehicle_service import VehicleService
+from tests.conftest import create_mock_config
 
 
 class TestSearchFlow:
@@ -8,11 +14,11 @@ class TestSearchFlow:
         response = client.get('/')
         
         assert response.status_code == 200
-        assert b'Search Page' in response.data
-        assert b'Year:' in response.data
-        assert b'Make:' in response.data
-        assert b'Model:' in response.data
-        assert b'Mileage:' in response.data
+        assert b'Search for Car Price' in response.data
+        assert b'name="year"' in response.data
+        assert b'name="make"' in response.data
+        assert b'name="model"' in response.data
+        assert b'name="mileage"' in response.data
     
     def test_search_with_valid_data(self, client, populated_db):
         response = client.post('/', data={
@@ -23,10 +29,10 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Results Page' in response.data
+        assert b'Estimated Market Price' in response.data
         assert b'2015 Toyota Camry' in response.data
-        assert b'$13' in response.data  # Estimated price
-        assert b'Listings: 5' in response.data
+        assert b'Estimated Price:</strong> $13' in response.data
+        assert b'Sample Listings (5)' in response.data
     
     def test_search_without_mileage(self, client, populated_db):
         response = client.post('/', data={
@@ -36,9 +42,10 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Results Page' in response.data
+        assert b'Estimated Market Price' in response.data
         assert b'2015 Toyota Camry' in response.data
-        assert b'Listings: 5' in response.data
+        assert b'Mileage (user input)' not in response.data
+        assert b'Sample Listings (5)' in response.data
     
     def test_search_missing_required_fields(self, client):
         response = client.post('/', data={
@@ -47,7 +54,7 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Year, Make, and Model are required fields' in response.data
+        assert b'Year is required' in response.data
         
         response = client.post('/', data={
             'year': '2015',
@@ -55,7 +62,7 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Year, Make, and Model are required fields' in response.data
+        assert b'Make is required' in response.data
         
         response = client.post('/', data={
             'year': '2015',
@@ -63,7 +70,7 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Year, Make, and Model are required fields' in response.data
+        assert b'Model is required' in response.data
     
     def test_search_invalid_year(self, client):
         response = client.post('/', data={
@@ -145,9 +152,11 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Results Page' in response.data
+        assert b'Estimated Market Price' in response.data
         assert b'2015 Toyota Camry' in response.data
-        assert b'Listings: 5' in response.data
+        assert b'Sample Listings (5)' in response.data
+        assert response.data.count(b'<td>2015 toyota camry</td>') == 5
+        assert b'<td>Seattle, WA</td>' in response.data
     
     def test_search_with_mileage_adjustment(self, client, populated_db):
         response = client.post('/', data={
@@ -158,8 +167,8 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Results Page' in response.data
-        assert b'100000' in response.data  # User input mileage
+        assert b'Estimated Market Price' in response.data
+        assert b'Mileage (user input):</strong> 100000' in response.data
     
     def test_search_form_persistence(self, client):
         response = client.post('/', data={
@@ -170,10 +179,10 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Year: 2015' in response.data
-        assert b'Make: Toyota' in response.data
-        assert b'Model: Camry' in response.data
-        assert b'Mileage: abc' in response.data
+        assert b'value="2015"' in response.data
+        assert b'value="Toyota"' in response.data
+        assert b'value="Camry"' in response.data
+        assert b'value="abc"' in response.data
     
     def test_new_search_link(self, client, populated_db):
         response = client.post('/', data={
@@ -183,12 +192,12 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Results Page' in response.data
+        assert b'<a href="/">' in response.data
         
         response = client.get('/')
         
         assert response.status_code == 200
-        assert b'Search Page' in response.data
+        assert b'Search for Car Price' in response.data
     
     def test_search_case_insensitive(self, client, populated_db):
         response = client.post('/', data={
@@ -198,7 +207,7 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Results Page' in response.data
+        assert b'Sample Listings (5)' in response.data
         assert b'2015 TOYOTA CAMRY' in response.data
     
     def test_search_whitespace_handling(self, client, populated_db):
@@ -209,7 +218,7 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Results Page' in response.data
+        assert b'Sample Listings (5)' in response.data
         assert b'2015 Toyota Camry' in response.data
     
     def test_mileage_format_handling(self, client, populated_db):
@@ -221,8 +230,8 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Results Page' in response.data
-        assert b'150,000' in response.data
+        assert b'Estimated Market Price' in response.data
+        assert b'Mileage (user input):</strong> 150,000' in response.data
     
     def test_price_rounding(self, client, populated_db):
         response = client.post('/', data={
@@ -233,7 +242,7 @@ class TestSearchFlow:
         
         assert response.status_code == 200
         
-        assert b'$' in response.data
+        assert b'Estimated Price:</strong> $14600' in response.data
     
     def test_error_handling(self, client):
         response = client.post('/', data={
@@ -243,4 +252,94 @@ class TestSearchFlow:
         })
         
         assert response.status_code == 200
-        assert b'Year, Make, and Model are required fields' in response.data 
\ No newline at end of file
+        assert b'Year is required' in response.data 
+
+
+class TestRegionSearch:
+    
+    def test_search_by_state(self, client, populated_db):
+        response = client.post('/', data={
+            'year': '2015', 'make': 'Toyota', 'model': 'Camry', 'state': 'wa'
+        })
+        
+        assert response.status_code == 200
+        assert b'Region:</strong> in WA' in response.data
+        assert b'Sample Listings (1)' in response.data
+        assert b'<td>Seattle, WA</td>' in response.data
+    
+    def test_search_near_location(self, client, populated_db):
+        response = client.post('/', data={
+            'year': '2015', 'make': 'Toyota', 'model': 'Camry', 'near': '98101', 'radius': '25'
+        })
+        
+        assert response.status_code == 200
+        assert b'Region:</strong> within 25 mi of Seattle, WA' in response.data
+        assert b'other towns are not matched' in response.data
+        assert b'Sample Listings (1)' in response.data
+    
+    def test_invalid_region_input(self, client, populated_db):
+        cases = [
+            ({'state': 'XX'}, b'State must be a valid two-letter US state code'),
+            ({'state': 'WA', 'near': '98101'}, b'Enter either a state or a location, not both'),
+            ({'near': 'Atlantis'}, b'Unknown location: Atlantis'),
+            ({'near': '98101', 'radius': 'far'}, b'Radius must be a number of miles'),
+        ]
+        for region, message in cases:
+            response = client.post('/', data=dict(year='2015', make='Toyota', model='Camry', **region))
+            
+            assert response.status_code == 200
+            assert message in response.data
+            assert b'Search for Car Price' in response.data
+    
+    def test_no_vehicles_in_region(self, client, populated_db):
+        response = client.post('/', data={
+            'year': '2015', 'make': 'Toyota', 'model': 'Camry', 'state': 'OR'
+        })
+        
+        assert response.status_code == 200
+        assert b'No vehicles found for 2015 Toyota Camry in OR' in response.data
+
+
+def _spy_on_streaming():
+    # Only the streamed page reads its listings through iter_vehicles
+    return patch.object(VehicleService, 'iter_vehicles', autospec=True,
+                        side_effect=VehicleService.iter_vehicles)
+
+
+class TestStreamingSearch:
+    
+    @pytest.fixture
+    def app_config(self):
+        return dict(create_mock_config(), STREAM_RESULTS_MIN_LISTINGS=5, STREAM_YIELD_PER=2,
+                    SEARCH_CACHE_ENABLED=False)
+    
+    def test_large_group_is_streamed(self, client, populated_db, app_config):
+        with populated_db.app_context():
+            AggregateBuilder(app_config).build()
+            db.session.commit()
+        
+        with _spy_on_streaming() as iter_vehicles:
+            response = client.post('/', data={
+                'year': '2015', 'make': 'Toyota', 'model': 'Camry', 'mileage': '125000'
+            })
+            body = response.get_data(as_text=True)
+        
+        assert response.status_code == 200
+        iter_vehicles.assert_called_once()
+        assert 'Estimated Price:</strong> $13' in body
+        assert '5 listings shown' in body
+        assert body.count('<td>2015 toyota camry</td>') == 5
+        assert body.rstrip().endswith('</html>')
+    
+    def test_small_region_is_not_streamed(self, client, populated_db, app_config):
+        with populated_db.app_context():
+            AggregateBuilder(app_config).build()
+            db.session.commit()
+        
+        with _spy_on_streaming() as iter_vehicles:
+            response = client.post('/', data={
+                'year': '2015', 'make': 'Toyota', 'model': 'Camry', 'state': 'TX'
+            })
+        
+        iter_vehicles.assert_not_called()
+        assert b'Sample Listings (1)' in response.data
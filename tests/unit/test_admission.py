@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+from utils import metrics
+from utils.admission import ConcurrencyLimiter, TokenBucketLimiter, register_admission_control
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _make_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    release = threading.Event()
+
+    @app.route('/api/estimate')
+    def api_estimate():
+        release.wait(5)
+        return 'ok'
+
+    @app.route('/jobs')
+    def job_list():
+        return 'jobs'
+
+    register_admission_control(app)
+    return app, release
+
+
+class TestTokenBucket:
+
+    def test_burst_then_refill(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+        limiter = TokenBucketLimiter(rate=2, burst=3)
+
+        assert [limiter.acquire('a')[0] for _ in range(4)] == [True, True, True, False]
+        assert limiter.acquire('a')[1] == pytest.approx(0.5)
+        assert limiter.acquire('b')[0]
+
+        now[0] += 0.5
+        assert limiter.acquire('a')[0]
+        assert not limiter.acquire('a')[0]
+
+    def test_forgets_least_recent_clients(self):
+        limiter = TokenBucketLimiter(rate=1, burst=1, max_clients=2)
+        for client in ('a', 'b', 'c'):
+            limiter.acquire(client)
+
+        assert len(limiter) == 2
+        assert limiter.acquire('a')[0]
+
+
+class TestConcurrencyLimiter:
+
+    def test_queue_is_bounded(self):
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, queue_timeout=5)
+        assert limiter.acquire()
+
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(limiter.acquire()))
+        waiter.start()
+        while not limiter.waiting:
+            time.sleep(0.01)
+
+        assert not limiter.acquire()
+        limiter.release()
+        waiter.join()
+        assert results == [True]
+        assert limiter.active == 1
+
+    def test_waiter_times_out(self):
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=5, queue_timeout=0.05)
+        assert limiter.acquire()
+        assert not limiter.acquire()
+        assert limiter.waiting == 0
+
+
+class TestAdmissionMiddleware:
+
+    def test_rate_limited_client_gets_429(self):
+        app, release = _make_app(RATE_LIMIT_PER_SECOND=0.1, RATE_LIMIT_BURST=2)
+        release.set()
+        client = app.test_client()
+
+        statuses = [client.get('/api/estimate').status_code for _ in range(3)]
+        response = client.get('/api/estimate')
+
+        assert statuses == [200, 200, 429]
+        assert int(response.headers['Retry-After']) >= 1
+        assert client.get('/jobs').status_code == 200
+        assert client.get('/api/estimate', environ_base={'REMOTE_ADDR': '10.0.0.9'}).status_code == 200
+        assert metrics.snapshot()['admission.rate_limited'] == 2
+
+    def test_overload_is_shed_with_503(self):
+        app, release = _make_app(
+            RATE_LIMIT_PER_SECOND=0, MAX_CONCURRENT_SEARCHES=1,
+            ADMISSION_QUEUE_SIZE=0, ADMISSION_RETRY_AFTER_SECONDS=3,
+        )
+        busy = threading.Thread(target=lambda: app.test_client().get('/api/estimate'))
+        busy.start()
+        while not app.extensions['admission'].active:
+            time.sleep(0.01)
+
+        response = app.test_client().get('/api/estimate')
+        release.set()
+        busy.join()
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
+        assert app.extensions['admission'].active == 0
+        assert app.test_client().get('/api/estimate').status_code == 200
+        assert metrics.snapshot()['admission.shed'] == 1
+
+    def test_rate_limiting_is_off_by_default(self):
+        app, release = _make_app()
+        release.set()
+        client = app.test_client()
+
+        assert {client.get('/api/estimate').status_code for _ in range(30)} == {200}
+
+    def test_forwarded_requests_without_trusted_proxy_warn(self, caplog):
+        app, release = _make_app(RATE_LIMIT_PER_SECOND=100, RATE_LIMIT_BURST=100)
+        release.set()
+        client = app.test_client()
+
+        with caplog.at_level('WARNING', logger='utils.admission'):
+            for forwarded in ('203.0.113.1', '203.0.113.2'):
+                client.get('/api/estimate', headers={'X-Forwarded-For': forwarded})
+
+        assert len([r for r in caplog.records if 'RATE_LIMIT_TRUST_PROXY' in r.getMessage()]) == 1
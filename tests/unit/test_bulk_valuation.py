@@ -0,0 +1,91 @@
+import csv
+import io
+
+import pytest
+from data.models import Vehicle, db
+from scripts.bulk_valuation import BulkValuer
+from services.aggregate_builder import AggregateBuilder
+from services.price_estimator import PriceEstimator
+from services.price_stats import PriceStats
+
+INPUT_ROWS = [
+    ('2015', 'Toyota', 'Camry', '100,000', ''),
+    ('2015', 'toyota', 'camry', '', ''),
+    ('2015', 'Toyota', 'Camry', '60000', 'wa'),
+    ('2016', 'Toyota', 'Camry', '90000', ''),
+    ('2015', 'Tesla', 'Model S', '10000', ''),
+    ('1850', 'Toyota', 'Camry', '10000', ''),
+    ('2015', 'Toyota', 'Camry', 'lots', ''),
+    ('2015', 'Toyota', 'Camry', '100000', ''),
+]
+
+
+@pytest.fixture
+def bulk_db(populated_db, mock_config):
+    with populated_db.app_context():
+        db.session.add(Vehicle(vin='X1', year=2017, make='toyota', model='camry', city='Dallas',
+                               state='TX', listing_price=19000.0, listing_mileage=40000))
+        db.session.commit()
+        AggregateBuilder(mock_config).build()
+        db.session.commit()
+    return populated_db
+
+
+@pytest.fixture
+def input_csv(tmp_path):
+    path = tmp_path / 'inventory.csv'
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['year', 'make', 'model', 'mileage', 'state'])
+        writer.writerows(INPUT_ROWS)
+    return str(path)
+
+
+def _read_output(path):
+    with open(path, newline='') as f:
+        return {int(row['row']): row for row in csv.DictReader(f)}
+
+
+class TestBulkValuation:
+
+    @pytest.mark.parametrize('workers', [0, 2])
+    def test_matches_estimator(self, bulk_db, mock_config, input_csv, tmp_path, workers):
+        config = dict(mock_config, BULK_VALUATION_TASK_ROWS=1)
+        output_path = str(tmp_path / 'values.csv')
+        progress = io.StringIO()
+
+        with bulk_db.app_context():
+            summary = BulkValuer(config).run(input_csv, output_path, workers, progress_stream=progress)
+            estimator = PriceEstimator(mock_config)
+            stats = PriceStats()
+            for vehicle in Vehicle.query.filter_by(year=2015).all():
+                stats.add(vehicle.listing_price, vehicle.listing_mileage)
+            expected_100k = estimator.estimate_group(stats, 2015, 'toyota', 'camry', 100000)
+            expected_2016 = estimator.estimate_group(None, 2016, 'toyota', 'camry', 90000)
+
+        rows = _read_output(output_path)
+        assert sorted(rows) == list(range(1, 9))
+        assert float(rows[1]['estimated_price']) == expected_100k[0]
+        assert rows[1]['estimated_price'] == rows[8]['estimated_price']
+        assert rows[1]['method'] == 'regression'
+        assert rows[2]['method'] == 'average'
+        # Only the Seattle listing is in WA: too sparse, so it borrows a slope
+        assert rows[3]['state'] == 'WA'
+        assert rows[3]['method'] == 'borrowed_slope'
+        assert float(rows[4]['estimated_price']) == expected_2016[0]
+        assert rows[4]['fallback_level'] == 'year_1'
+        assert rows[5]['method'] == 'no_data' and rows[5]['estimated_price'] == ''
+        assert rows[6]['error'].startswith('year must be')
+        assert rows[7]['error'] == 'invalid mileage'
+
+        assert summary['rows'] == 8
+        assert summary['errors'] == 2
+        assert summary['methods'] == {'regression': 3, 'average': 1, 'borrowed_slope': 1, 'no_data': 1}
+        assert '8/8 rows' in progress.getvalue()
+
+    def test_requires_columns(self, bulk_db, mock_config, tmp_path):
+        path = tmp_path / 'bad.csv'
+        path.write_text('year,make\n2015,toyota\n')
+
+        with pytest.raises(ValueError, match='model'):
+            BulkValuer(mock_config).read_input(str(path))
@@ -0,0 +1,75 @@
+import gzip
+import pytest
+from flask import Flask
+from utils.compression import register_compression
+
+
+@pytest.fixture
+def compressed_app():
+    app = Flask(__name__)
+    app.config['COMPRESSION_ENABLED'] = True
+    app.config['COMPRESSION_MIN_SIZE'] = 100
+    app.config['COMPRESSION_LEVEL'] = 6
+
+    @app.route('/big')
+    def big():
+        return "<p>listing</p>" * 200
+
+    @app.route('/small')
+    def small():
+        return "ok"
+
+    @app.route('/binary')
+    def binary():
+        return app.response_class(b"x" * 1000, mimetype='application/octet-stream')
+
+    register_compression(app)
+    return app
+
+
+class TestCompression:
+    
+    def test_gzip_when_accepted(self, compressed_app):
+        client = compressed_app.test_client()
+        
+        response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+        
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.data) == b"<p>listing</p>" * 200
+    
+    def test_no_compression_without_accept_encoding(self, compressed_app):
+        client = compressed_app.test_client()
+        
+        response = client.get('/big')
+        
+        assert 'Content-Encoding' not in response.headers
+        assert response.data == b"<p>listing</p>" * 200
+    
+    def test_small_response_not_compressed(self, compressed_app):
+        client = compressed_app.test_client()
+        
+        response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        
+        assert 'Content-Encoding' not in response.headers
+        assert response.data == b"ok"
+    
+    def test_non_text_mimetype_not_compressed(self, compressed_app):
+        client = compressed_app.test_client()
+        
+        response = client.get('/binary', headers={'Accept-Encoding': 'gzip'})
+        
+        assert 'Content-Encoding' not in response.headers
+    
+    def test_disabled_by_config(self):
+        app = Flask(__name__)
+        app.config['COMPRESSION_ENABLED'] = False
+
+        @app.route('/big')
+        def big():
+            return "<p>listing</p>" * 200
+
+        register_compression(app)
+        response = app.test_client().get('/big', headers={'Accept-Encoding': 'gzip'})
+        
+        assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,63 @@
+import threading
+
+from flask import Flask
+
+from controllers.job_controller import JobController
+from controllers.search_controller import SearchController
+from data.gazetteer import RegionFilter
+from services.container import ServiceContainer, get_services
+
+
+class TestServiceContainer:
+    
+    def test_get_services_creates_one_container_per_app(self, app):
+        containers = []
+        threads = [
+            threading.Thread(target=lambda: containers.append(get_services(app)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len({id(container) for container in containers}) == 1
+        assert app.extensions['services'] is containers[0]
+        
+        other = Flask(__name__)
+        other.config.update(app.config)
+        assert get_services(other) is not containers[0]
+    
+    def test_controllers_share_container_services(self, mock_config):
+        services = ServiceContainer(mock_config)
+        search = SearchController(mock_config, services)
+        jobs = JobController(mock_config, services)
+        
+        assert search.vehicle_service is services.vehicle_service
+        assert search.search_cache.vehicle_service is services.vehicle_service
+        assert search.price_estimator is services.price_estimator
+        assert jobs.queue is services.import_jobs
+
+
+class TestPreparedSearch:
+    
+    def test_search_statement_is_reused_across_searches(self, populated_db, mock_config):
+        with populated_db.app_context():
+            service = ServiceContainer(mock_config).vehicle_service
+            
+            assert len(service.search_vehicles(2015, 'Toyota', 'Camry')) == 5
+            assert service.search_vehicles(2016, 'Toyota', 'Camry') == []
+            assert len(service._search_statements) == 1
+            
+            texas = RegionFilter('in TX', state='TX')
+            assert [v.city for v in service.search_vehicles(2015, 'toyota', 'camry', texas)] == ['Dallas']
+            nearby, _ = service.parse_region('', 'Seattle, WA', '50')
+            assert [v.city for v in service.search_vehicles(2015, 'Toyota', 'Camry', nearby)] == ['Seattle']
+            assert len(service._search_statements) == 3
+    
+    def test_validate_mileage_strips_separators(self, mock_config):
+        estimator = ServiceContainer(mock_config).price_estimator
+        
+        assert estimator.validate_mileage('45,000') == 45000
+        assert estimator.validate_mileage(' 12 500 ') == 12500
+        assert estimator.validate_mileage('12a') is None
@@ -1,7 +1,8 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from scripts.data_importer import DataImporter
-from data.models import Vehicle, db
+from data.models import RegionPriceAggregate, Vehicle, db
+from services.vehicle_service import VehicleService
 
 
 class TestDataImporter:
@@ -36,6 +37,30 @@ class TestDataImporter:
                 assert vehicle1.state == 'WA'
                 assert vehicle1.listing_price == 13500.0
                 assert vehicle1.listing_mileage == 125000
+                assert vehicle1.make_id is not None
+                assert vehicles[1].model_id == vehicle1.model_id
+                
+                aggregates = RegionPriceAggregate.query.all()
+                assert sorted((a.state, a.city) for a in aggregates) == [
+                    ('TX', 'Dallas'), ('WA', 'Seattle')
+                ]
+    
+    def test_locations_normalized_at_import(self, app, mock_config):
+        importer = DataImporter(mock_config)
+        feed = """vin|year|make|model|dealer_city|dealer_state|listing_price|listing_mileage
+VIN1|2015|toyota|camry|seattle|wa|13500|125000
+VIN2|2015|toyota|camry| SEATTLE | Wa |14200|98000
+VIN3|2015|toyota|camry|Fort  worth|TX|14000|90000"""
+        
+        with app.app_context():
+            assert importer._process_and_store_data(feed, app)
+            service = VehicleService(mock_config)
+            region, _ = service.parse_region('wa', '', '')
+            
+            assert {(v.city, v.state) for v in Vehicle.query} == {('Seattle', 'WA'), ('Fort Worth', 'TX')}
+            assert len(service.search_vehicles(2015, 'Toyota', 'Camry', region)) == 2
+            aggregate = RegionPriceAggregate.query.filter_by(state='WA').one()
+            assert (aggregate.city, aggregate.listing_count) == ('Seattle', 2)
     
     def test_import_inventory_data_download_failure(self, app, mock_config):
         importer = DataImporter(mock_config)
@@ -0,0 +1,54 @@
+import pytest
+from data.dimensions import DimensionWriter, get_dimension_cache, normalize_name
+from data.models import Make, Vehicle, VehicleModel, db
+
+
+class TestDimensions:
+    
+    def test_normalize_name(self):
+        assert normalize_name("  Toyota ") == "toyota"
+        assert normalize_name(None) == ""
+    
+    def test_orm_insert_assigns_dimension_ids(self, populated_db):
+        with populated_db.app_context():
+            vehicles = Vehicle.query.all()
+            
+            assert len(vehicles) == 5
+            assert all(v.make_id is not None and v.model_id is not None for v in vehicles)
+            assert len({v.model_id for v in vehicles}) == 1
+            assert Make.query.count() == 1
+            assert VehicleModel.query.count() == 1
+    
+    def test_cache_resolve(self, populated_db):
+        with populated_db.app_context():
+            cache = get_dimension_cache()
+            vehicle = Vehicle.query.first()
+            
+            assert cache.resolve("  TOYOTA ", "Camry") == (vehicle.make_id, vehicle.model_id)
+            assert cache.resolve("tesla", "model s") is None
+    
+    def test_cache_is_per_engine(self, populated_db):
+        with populated_db.app_context():
+            assert get_dimension_cache() is get_dimension_cache()
+    
+    def test_writer_reuses_existing_ids(self, populated_db):
+        with populated_db.app_context():
+            existing = Vehicle.query.first()
+            writer = DimensionWriter(db.session)
+            
+            make, make_id, model, model_id = writer.get_ids("Toyota", " CAMRY")
+            
+            assert (make, model) == ("toyota", "camry")
+            assert (make_id, model_id) == (existing.make_id, existing.model_id)
+    
+    def test_writer_creates_new_dimensions(self, app):
+        with app.app_context():
+            writer = DimensionWriter(db.session)
+            
+            first = writer.get_ids("Honda", "Civic")
+            second = writer.get_ids("honda", "Accord")
+            
+            assert first[1] == second[1]
+            assert first[3] != second[3]
+            assert Make.query.count() == 1
+            assert VehicleModel.query.count() == 2
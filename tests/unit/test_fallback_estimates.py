@@ -0,0 +1,105 @@
+import json
+
+import pytest
+from controllers.search_controller import SearchController
+from data.models import PriceGroupAggregate, Vehicle, db
+from services.aggregate_builder import AggregateBuilder
+from services.price_estimator import PriceEstimator
+from services.price_stats import PriceStats
+
+EXTRA_LISTINGS = [
+    (2014, 'camry', 12000.0, 110000), (2014, 'camry', 13000.0, 90000), (2014, 'camry', 11000.0, 130000),
+    (2017, 'camry', 19000.0, 40000), (2017, 'camry', 18000.0, 55000),
+    (2015, 'corolla', 11000.0, 80000),
+]
+
+
+@pytest.fixture
+def fallback_db(populated_db, mock_config):
+    with populated_db.app_context():
+        for i, (year, model, price, mileage) in enumerate(EXTRA_LISTINGS):
+            db.session.add(Vehicle(vin=f'F{i}', year=year, make='toyota', model=model,
+                                   city='Dallas', state='TX', listing_price=price,
+                                   listing_mileage=mileage))
+        db.session.commit()
+        AggregateBuilder(mock_config).build()
+        db.session.commit()
+    return populated_db
+
+
+class TestGroupAggregates:
+
+    def test_levels_roll_up(self, fallback_db):
+        with fallback_db.app_context():
+            counts = sorted(
+                (r.level, r.year, r.listing_count) for r in PriceGroupAggregate.query.all()
+            )
+
+        assert counts == [
+            ('make', 0, 11), ('make_model', 0, 1), ('make_model', 0, 10),
+            ('ymm', 2014, 3), ('ymm', 2015, 1), ('ymm', 2015, 5), ('ymm', 2017, 2),
+        ]
+
+
+class TestHierarchicalFallback:
+
+    def test_neighbouring_years(self, fallback_db, mock_config):
+        estimator = PriceEstimator(mock_config)
+        with fallback_db.app_context():
+            price, metadata = estimator.estimate_group(None, 2016, 'Toyota', 'Camry', 90000)
+
+        assert metadata['fallback_level'] == 'year_1'
+        assert metadata['fallback_reason'] == 'no_data'
+        assert metadata['parent_vehicle_count'] == 7
+        assert 10000 < price < 20000
+
+    def test_wider_years(self, fallback_db, mock_config):
+        estimator = PriceEstimator(mock_config)
+        with fallback_db.app_context():
+            _, metadata = estimator.estimate_group(None, 2012, 'Toyota', 'Camry', 90000)
+
+        assert metadata['fallback_level'] == 'year_2'
+        assert metadata['parent_vehicle_count'] == 3
+
+    def test_sparse_model_borrows_make_slope(self, fallback_db, mock_config):
+        estimator = PriceEstimator(mock_config)
+        stats = PriceStats()
+        stats.add(11000.0, 80000)
+
+        with fallback_db.app_context():
+            parents = estimator.load_parent_stats(2015, 'toyota', 'corolla')
+            price, metadata = estimator.estimate_group(stats, 2015, 'toyota', 'corolla', 100000)
+
+        slope = parents['make'].regression()['slope']
+        assert metadata['method'] == 'borrowed_slope'
+        assert metadata['fallback_level'] == 'make'
+        assert metadata['fallback_reason'] == 'insufficient_data'
+        assert metadata['vehicle_count'] == 1
+        assert price == round((11000 + slope * 20000) / 100) * 100
+        assert price < 11000
+
+    def test_parent_stats_are_cached(self, fallback_db, mock_config):
+        estimator = PriceEstimator(mock_config)
+        with fallback_db.app_context():
+            first = estimator.load_parent_stats(2016, 'toyota', 'camry')
+            db.session.query(PriceGroupAggregate).delete()
+            db.session.commit()
+            second = estimator.load_parent_stats(2016, 'toyota', 'camry')
+
+        assert set(first) == {'year_1', 'year_2', 'make_model', 'make'}
+        assert {k: v.to_dict() for k, v in second.items()} == {k: v.to_dict() for k, v in first.items()}
+
+    def test_unknown_make_has_no_estimate(self, fallback_db, mock_config):
+        estimator = PriceEstimator(mock_config)
+        with fallback_db.app_context():
+            assert estimator.estimate_group(None, 2015, 'Tesla', 'Model S', 50000) is None
+
+    def test_api_answers_missing_year(self, fallback_db, mock_config):
+        controller = SearchController(mock_config)
+        with fallback_db.test_request_context('/api/estimate?year=2016&make=Toyota&model=Camry&mileage=50000'):
+            response = controller.handle_api_request()
+
+        payload = json.loads(response.data)
+        assert response.status_code == 200
+        assert payload['metadata']['fallback_level'] == 'year_1'
+        assert payload['listings'] == []
@@ -0,0 +1,113 @@
+import csv
+from io import StringIO
+
+import pytest
+from data.models import Vehicle, db
+from scripts.data_importer import DataImporter
+from scripts.feed_parser import parse_columns, row_reject_reason
+
+FEED = """vin|year|make|model|dealer_city|dealer_state|listing_price|listing_mileage
+VIN1|2015|Toyota|Camry|Seattle|WA|13500|125000
+|2015|toyota|camry|Dallas|TX|14200|98000
+VIN3||toyota|camry|Dallas|TX|14200|98000
+VIN4|20x5|toyota|camry|Dallas|TX|14200|98000
+VIN5|2015| |camry|Dallas|TX|14200|98000
+VIN6|2015|toyota||Dallas|TX|14200|98000
+VIN7|2015|toyota|camry
+
+VIN8| 2016 |honda|civic|Newark|NJ|abc|12.5
+VIN9|+2017|honda|civic|Newark|NJ| 1_000 |1_000
+VIN10|2015|toyota|camry|Miami|FL||
+VIN11|2015|toyota|camry|Miami|FL|nan|-5
+VIN12|2015
+"""
+
+
+def _import(app, config, mode, feed=FEED):
+    importer = DataImporter(dict(config, IMPORT_PARSE_MODE=mode, IMPORT_BATCH_SIZE=3))
+    with app.app_context():
+        importer._process_and_store_data(feed, app)
+        rows = [
+            (v.vin, v.year, v.make, v.model, v.city, v.state, v.listing_price, v.listing_mileage)
+            for v in Vehicle.query.order_by(Vehicle.id)
+        ]
+        db.session.rollback()
+    return rows, importer.reject_counts
+
+
+class TestParseColumns:
+
+    def test_reasons_match_row_logic(self):
+        reader = csv.reader(StringIO(FEED), delimiter='|')
+        header = next(reader)
+        rows = [row for row in reader if row]
+        dict_rows = list(csv.DictReader(StringIO(FEED), delimiter='|'))
+
+        columns, accepted, rejects = parse_columns(header, rows)
+
+        expected = [row_reject_reason(row) for row in dict_rows]
+        assert accepted.tolist() == [reason is None for reason in expected]
+        for reason in set(expected) - {None}:
+            assert rejects[reason] == expected.count(reason)
+        assert rejects == {
+            'missing_vin': 1, 'missing_year': 1, 'invalid_year': 1,
+            'missing_make_model': 2, 'malformed_row': 2,
+        }
+
+    def test_numeric_columns(self):
+        columns, accepted, _ = parse_columns(
+            ['vin', 'year', 'listing_price', 'listing_mileage'],
+            [['A', '2015', '1e3', '12.5'], ['B', '2015', 'x', '7']],
+        )
+
+        assert columns['listing_price_valid'].tolist() == [True, False]
+        assert columns['listing_price'][0] == 1000.0
+        assert columns['listing_mileage_valid'].tolist() == [False, True]
+        assert columns['listing_mileage'][1] == 7
+        # make/model columns are absent from the header
+        assert accepted.tolist() == [False, False]
+
+
+class TestColumnarImport:
+
+    def test_matches_row_mode(self, app, mock_config):
+        columnar, columnar_rejects = _import(app, mock_config, 'columnar')
+        with app.app_context():
+            for table in DataImporter(mock_config).partitioner.all_tables():
+                db.session.execute(table.delete())
+            db.session.commit()
+        rows, row_rejects = _import(app, mock_config, 'rows')
+
+        # VIN11 parses but its NaN price is dropped as implausible
+        assert len(rows) == 4
+        assert [r[:6] for r in columnar] == [r[:6] for r in rows]
+        for left, right in zip(columnar, rows):
+            for a, b in zip(left[6:], right[6:]):
+                assert a == b or (a != a and b != b)
+        assert columnar_rejects == row_rejects
+        assert row_rejects['implausible_price'] == 1
+        assert rows[1][6:] == (None, None)
+        assert rows[2][6:] == (1000.0, 1000)
+
+    def test_out_of_range_integers_are_implausible_in_both_modes(self, app, mock_config):
+        feed = (
+            "vin|year|make|model|dealer_city|dealer_state|listing_price|listing_mileage\n"
+            "VIN1|2015|toyota|camry|Miami|FL|13500|50000\n"
+            "VIN2|99999999999999999999|toyota|camry|Miami|FL|13500|50000\n"
+            "VIN3|2015|toyota|camry|Miami|FL|13500|99999999999999999999\n"
+        )
+        columnar, columnar_rejects = _import(app, mock_config, 'columnar', feed)
+        with app.app_context():
+            for table in DataImporter(mock_config).partitioner.all_tables():
+                db.session.execute(table.delete())
+            db.session.commit()
+        rows, row_rejects = _import(app, mock_config, 'rows', feed)
+
+        assert [r[0] for r in columnar] == [r[0] for r in rows] == ['VIN1']
+        assert columnar_rejects == row_rejects == {'implausible_year': 1, 'implausible_mileage': 1}
+
+    def test_resume_skips_processed_rows(self, app, mock_config):
+        importer = DataImporter(dict(mock_config, IMPORT_PARSE_MODE='columnar'))
+        with app.app_context():
+            assert importer._process_and_store_data(FEED, app, start_row=8)
+            assert [v.vin for v in Vehicle.query.order_by(Vehicle.id)] == ['VIN9', 'VIN10']
@@ -0,0 +1,335 @@
+import json
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from controllers.job_controller import JobController
+from data.models import ImportJob, Vehicle, db
+from scripts.data_importer import DataImporter
+from scripts.import_worker import ImportWorker
+from services.import_jobs import ImportJobQueue, LeaseLost
+
+
+CSV_DATA = """vin|year|make|model|dealer_city|dealer_state|listing_price|listing_mileage
+VIN1|2015|toyota|camry|Seattle|WA|13500|125000
+VIN2|2015|toyota|camry|Dallas|TX|14200|98000
+VIN3|2016|toyota|camry|Newark|NJ|15800|75000
+VIN4||toyota|camry|Miami|FL|24500|15000
+VIN5|2021|honda|civic|Miami|FL|21500|18000"""
+
+
+@pytest.fixture
+def job_config(app, mock_config):
+    mock_config['IMPORT_BATCH_SIZE'] = 2
+    mock_config['IMPORT_JOB_STALE_SECONDS'] = 60
+    return mock_config
+
+
+def _claim_in_background(app, config, results):
+    # Another worker polling for work while the first one is busy
+    def claim():
+        with app.app_context():
+            job = ImportJobQueue(config).claim('worker-b')
+            results.append(None if job is None else job.worker_id)
+    thread = threading.Thread(target=claim)
+    thread.start()
+    return thread
+
+
+def _mock_download(text=CSV_DATA):
+    mock_response = MagicMock()
+    mock_response.text = text
+    return patch('scripts.data_importer.requests.get', return_value=mock_response)
+
+
+class TestImportJobQueue:
+    
+    def test_enqueue_deduplicates_active_job(self, app, job_config):
+        queue = ImportJobQueue(job_config)
+        
+        with app.app_context():
+            first, created = queue.enqueue('import')
+            second, created_again = queue.enqueue('refresh')
+            
+            assert created is True
+            assert created_again is False
+            assert second.id == first.id
+            assert ImportJob.query.count() == 1
+    
+    def test_enqueue_rejects_unknown_kind(self, app, job_config):
+        with app.app_context():
+            with pytest.raises(ValueError):
+                ImportJobQueue(job_config).enqueue('delete')
+    
+    def test_claim_is_single_runner(self, app, job_config):
+        queue = ImportJobQueue(job_config)
+        
+        with app.app_context():
+            queue.enqueue('import')
+            
+            job = queue.claim('worker-a')
+            assert job is not None
+            assert job.status == 'running'
+            assert job.worker_id == 'worker-a'
+            assert queue.claim('worker-b') is None
+    
+    def test_stale_job_can_be_reclaimed(self, app, job_config):
+        queue = ImportJobQueue(job_config)
+        
+        with app.app_context():
+            queue.enqueue('import')
+            job = queue.claim('worker-a')
+            job.heartbeat_at = time.time() - 120
+            db.session.commit()
+            
+            reclaimed = queue.claim('worker-b')
+            
+            assert reclaimed is not None
+            assert reclaimed.worker_id == 'worker-b'
+            assert reclaimed.attempts == 2
+    
+    def test_finish_releases_active_slot(self, app, job_config):
+        queue = ImportJobQueue(job_config)
+        
+        with app.app_context():
+            job, _ = queue.enqueue('import')
+            queue.finish(job, None, True)
+            
+            next_job, created = queue.enqueue('refresh')
+            
+            assert created is True
+            assert next_job.id != job.id
+
+
+    def test_previous_owner_cannot_write_after_takeover(self, app, job_config):
+        queue = ImportJobQueue(job_config)
+        
+        with app.app_context():
+            queue.enqueue('import')
+            job = queue.claim('worker-a')
+            job.heartbeat_at = time.time() - 120
+            db.session.commit()
+            assert queue.claim('worker-b') is not None
+            
+            with pytest.raises(LeaseLost):
+                queue.checkpoint(job, 'worker-a', 10, 10, 0)
+            db.session.rollback()
+            assert queue.finish(job, 'worker-a', False, 'stale') is False
+            
+            job = db.session.get(ImportJob, job.id)
+            assert job.status == 'running'
+            assert job.worker_id == 'worker-b'
+            assert job.rows_processed == 0
+            assert queue.finish(job, 'worker-b', True) is True
+            assert job.status == 'succeeded'
+
+
+class TestImportWorker:
+    
+    def test_worker_runs_job_with_checkpoints(self, app, job_config):
+        worker = ImportWorker(app, worker_id='test-worker')
+        worker.queue = ImportJobQueue(job_config)
+        worker.importer = DataImporter(job_config)
+        
+        with app.app_context():
+            job, _ = worker.queue.enqueue('import')
+            job_id = job.id
+        
+        with _mock_download():
+            assert worker.run_once() is True
+        
+        with app.app_context():
+            job = db.session.get(ImportJob, job_id)
+            assert job.status == 'succeeded'
+            assert job.total_rows == 5
+            assert job.rows_processed == 5
+            assert job.rows_imported == 4
+            assert job.error_count == 1
+            assert Vehicle.query.count() == 4
+        
+        assert worker.run_once() is False
+    
+    def test_slow_final_step_keeps_the_lease(self, app, job_config):
+        job_config['IMPORT_JOB_STALE_SECONDS'] = 0.3
+        worker = ImportWorker(app, worker_id='worker-a')
+        worker.queue = ImportJobQueue(job_config)
+        worker.importer = DataImporter(job_config)
+        claims, threads = [], []
+        
+        def slow_build(snapshot_date=None):
+            time.sleep(0.6)
+            threads.append(_claim_in_background(app, job_config, claims))
+            time.sleep(0.6)
+        
+        with app.app_context():
+            job_id = worker.queue.enqueue('import')[0].id
+        
+        with _mock_download(), patch('scripts.data_importer.AggregateBuilder') as builder:
+            builder.return_value.build.side_effect = slow_build
+            assert worker.run_once() is True
+        threads[0].join()
+        
+        assert claims == [None]
+        with app.app_context():
+            job = db.session.get(ImportJob, job_id)
+            assert job.status == 'succeeded'
+            assert job.worker_id == 'worker-a'
+    
+    def test_slow_rebuild_keeps_the_lease(self, populated_db, job_config):
+        job_config['IMPORT_JOB_STALE_SECONDS'] = 0.3
+        worker = ImportWorker(populated_db, worker_id='worker-a')
+        worker.queue = ImportJobQueue(job_config)
+        claims, threads = [], []
+        
+        def slow_analyze():
+            # Longer than IMPORT_JOB_STALE_SECONDS with no checkpoint at all
+            time.sleep(1.0)
+            threads.append(_claim_in_background(populated_db, job_config, claims))
+            threads[0].join()
+        
+        with populated_db.app_context():
+            job_id = worker.queue.enqueue('rebuild')[0].id
+        
+        with patch.object(worker.rebuilder, 'analyze', side_effect=slow_analyze):
+            assert worker.run_once() is True
+        
+        assert claims == [None]
+        with populated_db.app_context():
+            job = db.session.get(ImportJob, job_id)
+            assert job.status == 'succeeded'
+            assert job.worker_id == 'worker-a'
+    
+    def test_resume_from_checkpoint(self, app, job_config):
+        queue = ImportJobQueue(job_config)
+        importer = DataImporter(job_config)
+        
+        with app.app_context():
+            queue.enqueue('import')
+            job = queue.claim('worker-a')
+            # Simulate a crash after the first committed batch (rows 1-2)
+            with _mock_download("\n".join(CSV_DATA.split("\n")[:3])):
+                importer.run_job(app, job, queue, 'worker-a')
+            assert Vehicle.query.count() == 2
+            job.heartbeat_at = time.time() - 120
+            db.session.commit()
+            
+            resumed = queue.claim('worker-b')
+            assert resumed.rows_processed == 2
+            with _mock_download():
+                assert importer.run_job(app, resumed, queue, 'worker-b') is True
+            
+            assert sorted(v.vin for v in Vehicle.query.all()) == ['VIN1', 'VIN2', 'VIN3', 'VIN5']
+            assert resumed.rows_imported == 4
+    
+    def test_run_stops_when_job_is_taken_over(self, app, job_config):
+        queue = ImportJobQueue(job_config)
+        importer = DataImporter(job_config)
+        
+        with app.app_context():
+            queue.enqueue('import')
+            job = queue.claim('worker-a')
+            # Another worker takes the job over before the first batch is committed
+            db.session.execute(
+                ImportJob.__table__.update().values(worker_id='worker-b')
+            )
+            db.session.commit()
+            
+            with _mock_download(), pytest.raises(LeaseLost):
+                importer.run_job(app, job, queue, 'worker-a')
+            
+            assert Vehicle.query.count() == 0
+            assert db.session.get(ImportJob, job.id).rows_processed == 0
+    
+    def test_refresh_replaces_existing_data(self, populated_db, job_config):
+        queue = ImportJobQueue(job_config)
+        importer = DataImporter(job_config)
+        
+        with populated_db.app_context():
+            queue.enqueue('refresh')
+            job = queue.claim('worker-a')
+            
+            with _mock_download():
+                assert importer.run_job(populated_db, job, queue, 'worker-a') is True
+            
+            assert Vehicle.query.count() == 4
+            assert Vehicle.query.filter_by(vin='1HGBH41JXMN109186').first() is None
+    
+    def test_failed_refresh_keeps_existing_data(self, populated_db, job_config):
+        queue = ImportJobQueue(job_config)
+        importer = DataImporter(job_config)
+        
+        with populated_db.app_context():
+            queue.enqueue('refresh')
+            job = queue.claim('worker-a')
+            
+            # The refresh fails after several batches have been written
+            with _mock_download(), patch(
+                'scripts.data_importer.AggregateBuilder.build', side_effect=RuntimeError('disk full')
+            ), patch.object(queue, 'checkpoint', wraps=queue.checkpoint) as checkpoint:
+                assert importer.run_job(populated_db, job, queue, 'worker-a') is False
+            
+            checkpoint.assert_not_called()
+            assert Vehicle.query.count() == 5
+            assert Vehicle.query.filter_by(vin='1HGBH41JXMN109186').first() is not None
+            assert db.session.get(ImportJob, job.id).rows_processed == 0
+    
+    def test_import_job_skips_when_data_exists(self, populated_db, job_config):
+        queue = ImportJobQueue(job_config)
+        importer = DataImporter(job_config)
+        
+        with populated_db.app_context():
+            queue.enqueue('import')
+            job = queue.claim('worker-a')
+            
+            with _mock_download() as mock_get:
+                assert importer.run_job(populated_db, job, queue, 'worker-a') is True
+                mock_get.assert_not_called()
+            
+            assert Vehicle.query.count() == 5
+
+
+class TestJobController:
+    
+    def test_job_status(self, app, job_config):
+        controller = JobController(job_config)
+        
+        with app.app_context():
+            job, _ = controller.queue.enqueue('import')
+            job.total_rows = 10
+            job.rows_processed = 5
+            db.session.commit()
+            
+            with app.test_request_context(f'/jobs/{job.id}'):
+                response = controller.handle_job_status(job.id)
+                payload = json.loads(response.get_data())
+                
+                assert response.status_code == 200
+                assert payload['status'] == 'queued'
+                assert payload['progress'] == 0.5
+                
+                listing = json.loads(controller.handle_job_list().get_data())
+                assert [j['id'] for j in listing['jobs']] == [job.id]
+    
+    def test_job_error_is_only_shown_to_admins(self, app, job_config):
+        job_config['ADMIN_TOKEN'] = 'secret'
+        controller = JobController(job_config)
+        
+        with app.app_context():
+            job, _ = controller.queue.enqueue('import')
+            job.status = 'failed'
+            job.error = 'connect to db-primary.internal:3306 failed'
+            db.session.commit()
+            
+            with app.test_request_context('/jobs'):
+                assert 'error' not in json.loads(controller.handle_job_status(job.id).get_data())
+                assert 'error' not in json.loads(controller.handle_job_list().get_data())['jobs'][0]
+            
+            with app.test_request_context('/jobs', headers={'X-Admin-Token': 'secret'}):
+                payload = json.loads(controller.handle_job_status(job.id).get_data())
+                assert payload['error'] == 'connect to db-primary.internal:3306 failed'
+    
+    def test_job_status_not_found(self, app, job_config):
+        controller = JobController(job_config)
+        
+        with app.app_context():
+            assert controller.handle_job_status(999).status_code == 404
@@ -0,0 +1,122 @@
+import json
+
+import numpy as np
+import pytest
+from data.models import ImportSnapshot, Vehicle, db
+from scripts.data_importer import DataImporter
+from scripts.import_quality import QualityFilter, VinIndex
+
+HEADER = "vin|year|make|model|dealer_city|dealer_state|listing_price|listing_mileage"
+
+FEED = "\n".join([
+    HEADER,
+    "DUP1|2015|toyota|camry|Seattle|WA|13500|125000",
+    "OK1|2015|toyota|camry|Dallas|TX|14200|98000",
+    "OLD1|1850|toyota|camry|Dallas|TX|14200|98000",
+    "CHEAP1|2015|toyota|camry|Dallas|TX|1|98000",
+    "FAR1|2015|toyota|camry|Dallas|TX|14200|900000",
+    "dup1|2016|toyota|camry|Miami|FL|15500|40000",
+    "OK2|2015|toyota|camry|Miami|FL||",
+    "OK1|2015|toyota|camry|Chicago|IL|14900|97000",
+])
+
+
+def _run(app, config, mode, **kwargs):
+    importer = DataImporter(dict(config, IMPORT_PARSE_MODE=mode, IMPORT_BATCH_SIZE=2, **kwargs))
+    with app.app_context():
+        assert importer._process_and_store_data(FEED, app)
+        vehicles = {v.vin: (v.year, v.city) for v in Vehicle.query.all()}
+    return importer, vehicles
+
+
+class TestVinIndex:
+
+    def test_keeps_last_occurrence(self):
+        index = VinIndex()
+
+        keep, replaced = index.put_many(np.array([1, 2, 1]), np.array([10, 11, 12]))
+        assert keep.tolist() == [1, 2]
+        assert replaced.tolist() == []
+
+        keep, replaced = index.put_many(np.array([3, 1]), np.array([13, 14]))
+        assert keep.tolist() == [0, 1]
+        assert replaced.tolist() == [12]
+
+        _, replaced = index.put_many(np.array([1]), np.array([15]))
+        assert replaced.tolist() == [14]
+        assert len(index) == 3
+
+    def test_many_batches(self):
+        rng = np.random.default_rng(5)
+        index = VinIndex()
+        latest = {}
+        for batch in range(200):
+            hashes = rng.integers(0, 5000, 100)
+            ids = np.arange(batch * 100, batch * 100 + 100)
+            keep, replaced = index.put_many(hashes, ids)
+            expected_replaced = sorted(latest[h] for h in set(hashes.tolist()) if h in latest)
+            assert sorted(replaced.tolist()) == expected_replaced
+            for h, i in zip(hashes[keep].tolist(), ids[keep].tolist()):
+                latest[h] = i
+        assert len(index) == len(latest)
+        assert len(index._runs) < 15
+
+
+class TestQualityFilter:
+
+    def test_reason_and_mask_agree(self, mock_config):
+        quality = QualityFilter(mock_config)
+        years = np.array([2015, 1850, 2015, 2015, 2015, 2015])
+        prices = np.array([9000.0, 9000.0, 1.0, np.nan, 0.0, 9000.0])
+        price_valid = np.array([True, True, True, True, False, True])
+        mileages = np.array([1000, 1000, 1000, 1000, 1000, 600000])
+        mileage_valid = np.ones(6, dtype=bool)
+
+        plausible, counts = quality.mask(years, prices, price_valid, mileages, mileage_valid)
+
+        expected = [
+            quality.reason(int(y), float(p) if v else None, int(m))
+            for y, p, v, m in zip(years, prices, price_valid, mileages)
+        ]
+        assert plausible.tolist() == [r is None for r in expected]
+        assert counts == {'implausible_year': 1, 'implausible_price': 2, 'implausible_mileage': 1}
+
+
+class TestImportQualityStage:
+
+    @pytest.mark.parametrize('mode', ['rows', 'columnar'])
+    def test_dedup_and_report(self, app, mock_config, mode, tmp_path):
+        importer, vehicles = _run(app, mock_config, mode, IMPORT_REPORT_DIR=str(tmp_path))
+
+        # The latest listing per VIN wins, even across batches and partitions
+        assert vehicles == {
+            'dup1': (2016, 'Miami'), 'OK1': (2015, 'Chicago'), 'OK2': (2015, 'Miami')
+        }
+        report = importer.quality_report
+        assert report['rows_read'] == 8
+        assert report['rows_imported'] == 3
+        assert report['dropped'] == {
+            'duplicate_vin': 2, 'implausible_mileage': 1,
+            'implausible_price': 1, 'implausible_year': 1,
+        }
+
+        [path] = tmp_path.iterdir()
+        assert json.loads(path.read_text()) == report
+        with app.app_context():
+            assert json.loads(ImportSnapshot.query.one().quality_report) == report
+
+    def test_dedup_can_be_disabled(self, app, mock_config):
+        importer, vehicles = _run(app, mock_config, 'columnar', IMPORT_DEDUP_VINS=False)
+
+        assert importer.quality_report['rows_imported'] == 5
+        assert 'duplicate_vin' not in importer.quality_report['dropped']
+
+    def test_resume_replaces_rows_from_earlier_attempt(self, app, mock_config):
+        importer = DataImporter(dict(mock_config, IMPORT_BATCH_SIZE=2))
+        with app.app_context():
+            importer._process_and_store_data("\n".join(FEED.splitlines()[:3]), app)
+            importer._process_and_store_data(FEED, app, start_row=2)
+
+            assert {v.vin: v.city for v in Vehicle.query.all()} == {
+                'dup1': 'Miami', 'OK1': 'Chicago', 'OK2': 'Miami'
+            }
@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import inspect, text
+from app import initialize_data
+from data.migrations import UPGRADES, SchemaUpgradeError, upgrade_schema
+from data.models import DataVersion, RegionPriceAggregate, SchemaUpgrade, Vehicle, db
+from services.vehicle_service import VehicleService
+
+
+def _create_legacy_vehicles_table():
+    # The vehicles table as created before make/model ids were added
+    Vehicle.__table__.drop(db.engine)
+    db.session.execute(text(
+        "CREATE TABLE vehicles (id INTEGER PRIMARY KEY, vin VARCHAR(64), year INTEGER, "
+        "make VARCHAR(100), model VARCHAR(100), city VARCHAR(100), state VARCHAR(10), "
+        "listing_price FLOAT, listing_mileage INTEGER)"
+    ))
+    db.session.execute(text(
+        "INSERT INTO vehicles (vin, year, make, model, city, state, listing_price, listing_mileage) "
+        "VALUES ('A', 2015, 'Toyota', 'Camry', 'seattle', 'wa', 15000, 50000), "
+        "('B', 2015, ' TOYOTA', 'camry ', 'Dallas', 'TX', 14000, 60000), "
+        "('C', 2016, 'Honda', 'Civic', 'Miami', 'FL', 13000, 40000)"
+    ))
+    db.session.commit()
+
+
+class TestSchemaUpgrades:
+
+    def test_upgrades_run_once(self, app, mock_config):
+        with app.app_context():
+            assert upgrade_schema(mock_config) == [name for name, _ in UPGRADES]
+            assert upgrade_schema(mock_config) == []
+            assert SchemaUpgrade.query.count() == len(UPGRADES)
+
+    def test_legacy_vehicles_table_is_upgraded_and_searchable(self, app, mock_config):
+        service = VehicleService(mock_config)
+
+        with app.app_context():
+            _create_legacy_vehicles_table()
+
+            assert upgrade_schema(mock_config) == ['vehicle_dimension_ids', 'normalized_vehicle_locations']
+            columns = {c['name'] for c in inspect(db.engine).get_columns('vehicles')}
+            indexes = {i['name'] for i in inspect(db.engine).get_indexes('vehicles')}
+            assert {'make_id', 'model_id'} <= columns
+            assert 'ix_vehicles_year_make_model_state' in indexes
+
+            vehicles = service.search_vehicles(2015, 'Toyota', 'Camry')
+            assert sorted(v.vin for v in vehicles) == ['A', 'B']
+            assert {(v.make, v.model) for v in vehicles} == {('toyota', 'camry')}
+
+            # Locations are stored the way the importer stores them, and the aggregates agree
+            region, _ = service.parse_region('WA', '', '')
+            assert [(v.city, v.state) for v in service.search_vehicles(2015, 'Toyota', 'Camry', region)] == [
+                ('Seattle', 'WA')
+            ]
+            aggregate = RegionPriceAggregate.query.filter_by(state='WA').one()
+            assert (aggregate.city, aggregate.listing_count) == ('Seattle', 1)
+            assert db.session.get(DataVersion, 'derived') is not None
+
+    def test_concurrently_applied_upgrades_are_not_an_error(self, app, mock_config):
+        with app.app_context():
+            for name, _ in UPGRADES:
+                db.session.add(SchemaUpgrade(name=name, applied_at=0))
+            db.session.commit()
+
+            # Another worker recorded them between this worker's check and its commit
+            with patch('data.migrations._pending', side_effect=[list(UPGRADES), []]):
+                assert upgrade_schema(mock_config) == []
+
+    def test_failed_upgrade_stops_startup(self, app):
+        with app.app_context():
+            _create_legacy_vehicles_table()
+
+        with patch('data.migrations.DimensionWriter', side_effect=RuntimeError('locked')):
+            with pytest.raises(SchemaUpgradeError):
+                initialize_data(app)
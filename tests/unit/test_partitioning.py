@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import func, select
+from data.models import Vehicle, db
+from data.partitioning import YearPartitioner
+from scripts.data_importer import DataImporter
+from services.vehicle_service import VehicleService
+
+
+CSV_DATA = """vin|year|make|model|dealer_city|dealer_state|listing_price|listing_mileage
+VIN1|2015|toyota|camry|Seattle|WA|13500|125000
+VIN2|2015|toyota|camry|Dallas|TX|14200|98000
+VIN3|2016|toyota|camry|Newark|NJ|15800|75000
+VIN4|2021|toyota|camry|Miami|FL|24500|15000"""
+
+
+@pytest.fixture
+def partitioned_config(mock_config):
+    mock_config['VEHICLE_PARTITIONING'] = True
+    mock_config['PARTITION_YEAR_SPAN'] = 5
+    return mock_config
+
+
+class TestYearPartitioner:
+    
+    def test_ranges_cover_configured_years(self, mock_config):
+        partitioner = YearPartitioner(dict(mock_config, PARTITION_YEAR_SPAN=5))
+        
+        ranges = partitioner.ranges()
+        
+        assert ranges[0] == (1980, 1984)
+        assert ranges[-1] == (2030, 2034)
+        assert all(end - start == 4 for start, end in ranges)
+    
+    def test_range_for_year_clamps(self, mock_config):
+        partitioner = YearPartitioner(dict(mock_config, PARTITION_YEAR_SPAN=5))
+        
+        assert partitioner.range_for_year(2017) == (2015, 2019)
+        assert partitioner.range_for_year(1950) == (1980, 1984)
+        assert partitioner.range_for_year(2050) == (2030, 2034)
+    
+    def test_mysql_partition_clause(self, mock_config):
+        partitioner = YearPartitioner(dict(mock_config, PARTITION_YEAR_SPAN=10))
+        
+        clause = partitioner.mysql_partition_clause()
+        
+        assert clause.startswith("PARTITION BY RANGE (year)")
+        assert "PARTITION p2010 VALUES LESS THAN (2020)" in clause
+        assert "PARTITION p_max VALUES LESS THAN MAXVALUE" in clause
+    
+    def test_disabled_uses_vehicles_table(self, app, mock_config):
+        partitioner = YearPartitioner(mock_config)
+        
+        with app.app_context():
+            assert partitioner.table_for_year(2015) is Vehicle.__table__
+            assert partitioner.entity_for_year(2015) is Vehicle
+    
+    def test_import_and_search_route_to_partitions(self, app, partitioned_config):
+        importer = DataImporter(partitioned_config)
+        
+        with app.app_context():
+            assert importer._process_and_store_data(CSV_DATA, app) is True
+            
+            partitioner = importer.partitioner
+            table_2015 = partitioner.table_for_year(2015)
+            table_2020 = partitioner.table_for_year(2021)
+            assert table_2015.name == 'vehicles_y2015_2019'
+            assert db.session.execute(select(func.count()).select_from(table_2015)).scalar() == 3
+            assert db.session.execute(select(func.count()).select_from(table_2020)).scalar() == 1
+            assert Vehicle.query.count() == 0
+            
+            service = VehicleService(partitioned_config)
+            vehicles = service.search_vehicles(2015, "Toyota", "Camry")
+            assert sorted(v.vin for v in vehicles) == ['VIN1', 'VIN2']
+            assert service.search_vehicles(2021, "toyota", "camry")[0].vin == 'VIN4'
+            assert service.search_vehicles(2017, "toyota", "camry") == []
+    
+    def test_partition_ids_do_not_collide(self, app, partitioned_config):
+        importer = DataImporter(partitioned_config)
+        
+        with app.app_context():
+            importer._process_and_store_data(CSV_DATA, app)
+            
+            ids = []
+            for table in importer.partitioner.all_tables():
+                ids.extend(db.session.execute(select(table.c.id)).scalars())
+            assert len(ids) == 4
+            assert len(set(ids)) == 4
+            assert importer.partitioner.has_data() is True
@@ -0,0 +1,31 @@
+import gc
+
+from data.dimensions import get_dimension_cache
+from data.models import db
+from utils import metrics, prefork
+
+
+class TestPrefork:
+    
+    def test_preload_fills_shared_state_and_freezes(self, populated_db):
+        try:
+            prefork.preload(populated_db)
+            
+            assert gc.get_freeze_count() > 0
+            with populated_db.app_context():
+                cache = get_dimension_cache()
+                assert cache._ids[('toyota', 'camry')] == cache.resolve('Toyota', 'Camry')
+        finally:
+            gc.unfreeze()
+    
+    def test_after_fork_drops_pooled_connections_and_counters(self, populated_db):
+        with populated_db.app_context():
+            db.session.execute(db.select(1))
+            db.session.commit()
+            engine = db.engine
+        metrics.increment('search.cache.hits')
+        
+        prefork.after_fork(populated_db)
+        
+        assert engine.pool.checkedin() == 0
+        assert metrics.snapshot() == {}
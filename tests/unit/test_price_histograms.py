@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pytest
+from jinja2 import Environment, FileSystemLoader
+from data.models import YmmMileageHistogram, Vehicle, db
+from services.aggregate_builder import AggregateBuilder, compute_mileage_histograms
+from services.price_estimator import PriceEstimator
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'templates')
+
+
+@pytest.fixture
+def histogram_db(populated_db, mock_config):
+    with populated_db.app_context():
+        for i, (price, mileage) in enumerate([
+            (21000.0, 10000), (20000.0, 20000), (17000.0, 60000), (16000.0, 70000),
+            (9000.0, 240000), (7000.0, 400000),
+        ]):
+            db.session.add(Vehicle(vin=f'H{i}', year=2015, make='toyota', model='camry',
+                                   city='Seattle', state='WA', listing_price=price,
+                                   listing_mileage=mileage))
+        db.session.commit()
+        AggregateBuilder(mock_config).build()
+        db.session.commit()
+    return populated_db
+
+
+class TestComputeMileageHistograms:
+
+    def test_groups_and_percentiles(self):
+        rng = np.random.default_rng(7)
+        prices = rng.uniform(5000, 30000, 200)
+        mileages = rng.integers(0, 300000, 200)
+        columns = np.column_stack([
+            np.full(200, 2015), np.full(200, 1), rng.integers(1, 3, 200), mileages, prices
+        ]).astype(np.float64)
+
+        rows = compute_mileage_histograms(columns, 50000, 4)
+
+        assert sum(row['listing_count'] for row in rows) == 200
+        assert max(row['bucket'] for row in rows) == 3
+        for row in rows:
+            bucket = np.minimum(mileages // 50000, 3)
+            mask = (columns[:, 2] == row['model_id']) & (bucket == row['bucket'])
+            expected = prices[mask]
+            assert row['listing_count'] == mask.sum()
+            assert row['min_price'] == round(expected.min())
+            assert row['max_price'] == round(expected.max())
+            assert row['p50'] == round(np.median(expected))
+            assert row['p10'] <= row['p25'] <= row['p50'] <= row['p75'] <= row['p90']
+
+    def test_empty_input(self):
+        assert compute_mileage_histograms(np.empty((0, 5)), 25000, 9) == []
+
+
+class TestPriceDistribution:
+
+    def test_built_with_aggregates(self, histogram_db):
+        with histogram_db.app_context():
+            buckets = {row.bucket: row for row in YmmMileageHistogram.query.all()}
+
+            # populated_db adds 125k, 98k, 75k, 150k and 65k mile listings
+            assert sorted(buckets) == [0, 2, 3, 5, 6, 8]
+            assert buckets[8].listing_count == 2
+            assert buckets[8].min_price == 7000
+
+    def test_streamed_build_matches_whole_table(self, app, mock_config):
+        rng = np.random.default_rng(3)
+        with app.app_context():
+            # Groups interleaved in insert order; the build streams them group by group
+            for i in range(300):
+                db.session.add(Vehicle(vin=f'S{i}', year=2014 + i % 3, make='toyota',
+                                       model=('camry', 'corolla')[i % 2], city='Seattle', state='WA',
+                                       listing_price=float(rng.integers(5000, 30000)),
+                                       listing_mileage=int(rng.integers(0, 300000))))
+            db.session.commit()
+            AggregateBuilder(mock_config).build_mileage_histograms()
+
+            columns = np.array([
+                (v.year, v.make_id, v.model_id, v.listing_mileage, v.listing_price) for v in Vehicle.query
+            ], dtype=np.float64)
+            expected = compute_mileage_histograms(columns, 25000, 9)
+            built = [
+                {c.name: getattr(row, c.name) for c in YmmMileageHistogram.__table__.columns}
+                for row in YmmMileageHistogram.query
+            ]
+
+            def key(row):
+                return row['year'], row['make_id'], row['model_id'], row['bucket']
+            assert sorted(built, key=key) == sorted(expected, key=key)
+
+    def test_get_price_distribution(self, histogram_db, mock_config):
+        estimator = PriceEstimator(mock_config)
+
+        with histogram_db.app_context():
+            distribution = estimator.get_price_distribution(2015, 'Toyota', 'Camry', 15000)
+
+            first = distribution[0]
+            assert (first['mileage_min'], first['mileage_max']) == (0, 25000)
+            assert first['count'] == 2
+            assert first['p50'] == 20500
+            assert first['selected'] is True
+            assert distribution[-1]['mileage_max'] is None
+            assert sum(b['selected'] for b in distribution) == 1
+
+            assert estimator.get_price_distribution(2015, 'Honda', 'Civic') == []
+
+    def test_results_page_shows_ranges(self, histogram_db, mock_config):
+        estimator = PriceEstimator(mock_config)
+        env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+
+        with histogram_db.app_context():
+            distribution = estimator.get_price_distribution(2015, 'Toyota', 'Camry', 15000)
+
+        html = env.get_template('results.html').render(
+            ymm='2015 Toyota Camry', estimated_price=15000, listings=[],
+            distribution=distribution, metadata={}
+        )
+
+        assert 'Price Range by Mileage (all regions)' in html
+        assert '200,000+ miles' in html
+        assert '<tr class="selected">' in html
+
+        regional = env.get_template('results.html').render(
+            ymm='2015 Toyota Camry', region='TX', estimated_price=15000, listings=[],
+            distribution=distribution, metadata={}
+        )
+        assert 'every region, not only TX' in regional
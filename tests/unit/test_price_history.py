@@ -0,0 +1,100 @@
+import json
+from datetime import date
+
+import pytest
+from controllers.search_controller import SearchController
+from data.models import ImportSnapshot, YmmDailyPrice, db
+from scripts.data_importer import DataImporter
+from services.price_history import PriceHistoryService
+
+HEADER = "vin|year|make|model|dealer_city|dealer_state|listing_price|listing_mileage"
+
+
+def _import(app, mock_config, snapshot_date, rows):
+    config = dict(mock_config, SNAPSHOT_DATE=snapshot_date)
+    importer = DataImporter(config)
+    with app.app_context():
+        importer._clear_vehicles()
+        db.session.commit()
+        assert importer._process_and_store_data("\n".join([HEADER] + rows), app)
+
+
+@pytest.fixture
+def history_db(app, mock_config):
+    _import(app, mock_config, "2022-08-15", [
+        "VIN1|2015|toyota|camry|Seattle|WA|14000|90000",
+        "VIN2|2015|toyota|camry|Dallas|TX|15000|70000",
+    ])
+    _import(app, mock_config, "2022-08-16", [
+        "VIN1|2015|toyota|camry|Seattle|WA|13000|91000",
+        "VIN3|2015|toyota|camry|Miami|FL|12000|100000",
+        "VIN4|2015|toyota|camry|Miami|FL|11000|",
+    ])
+    return app
+
+
+class TestSnapshotDate:
+
+    def test_configured_date_wins(self, mock_config):
+        importer = DataImporter(dict(mock_config, SNAPSHOT_DATE="2022-01-02"))
+        assert importer._snapshot_date() == date(2022, 1, 2)
+
+    def test_date_from_feed_url(self, mock_config):
+        importer = DataImporter(dict(
+            mock_config, INVENTORY_DATA_URL="https://x/inventory-listing-2022-08-17_first1000.txt"
+        ))
+        assert importer._snapshot_date() == date(2022, 8, 17)
+
+
+class TestDailyHistory:
+
+    def test_rollups_are_appended_per_snapshot(self, history_db):
+        with history_db.app_context():
+            rows = YmmDailyPrice.query.order_by(YmmDailyPrice.snapshot_date).all()
+
+            assert [r.snapshot_date for r in rows] == [date(2022, 8, 15), date(2022, 8, 16)]
+            assert rows[0].listing_count == 2
+            assert rows[0].avg_price == 14500
+            assert rows[1].min_price == 11000
+            assert rows[1].max_price == 13000
+            assert rows[1].avg_mileage == 95500
+            assert ImportSnapshot.query.count() == 2
+
+    def test_reimport_replaces_same_date(self, history_db, mock_config):
+        _import(history_db, mock_config, "2022-08-16", [
+            "VIN5|2015|toyota|camry|Seattle|WA|20000|10000",
+        ])
+        with history_db.app_context():
+            latest = YmmDailyPrice.query.filter_by(snapshot_date=date(2022, 8, 16)).all()
+
+            assert len(latest) == 1
+            assert latest[0].avg_price == 20000
+            assert YmmDailyPrice.query.count() == 2
+            assert ImportSnapshot.query.filter_by(snapshot_date=date(2022, 8, 16)).one().row_count == 1
+
+    def test_get_trend(self, history_db, mock_config):
+        service = PriceHistoryService(mock_config)
+        with history_db.app_context():
+            series = service.get_trend(2015, 'Toyota', 'Camry')
+
+            assert series['date'] == ['2022-08-15', '2022-08-16']
+            assert series['avg_price'] == [14500, 12000]
+
+            series = service.get_trend(2015, 'toyota', 'camry', start=date(2022, 8, 16))
+            assert series['count'] == 1
+
+            assert service.get_trend(2015, 'Honda', 'Civic') is None
+
+    def test_trend_endpoint(self, history_db, mock_config):
+        controller = SearchController(mock_config)
+
+        with history_db.test_request_context('/api/trend?year=2015&make=Toyota&model=Camry'):
+            response = controller.handle_trend_request()
+            assert response.status_code == 200
+            assert json.loads(response.get_data())['series']['listing_count'] == [2, 3]
+
+        with history_db.test_request_context('/api/trend?year=2015&make=Toyota&model=Camry&start=bad'):
+            assert controller.handle_trend_request().status_code == 400
+
+        with history_db.test_request_context('/api/trend?year=2016&make=Toyota&model=Camry'):
+            assert controller.handle_trend_request().status_code == 404
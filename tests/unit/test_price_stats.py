@@ -0,0 +1,56 @@
+import random
+import pytest
+from scipy.stats import linregress
+from services.price_stats import PriceStats
+
+
+def _stats(points):
+    stats = PriceStats()
+    for price, mileage in points:
+        stats.add(price, mileage)
+    return stats
+
+
+class TestPriceStats:
+    
+    def test_counts_and_base_price(self):
+        stats = _stats([(10000.0, 50000), (12000.0, None), (None, 70000)])
+        
+        assert stats.listing_count == 3
+        assert stats.price_count == 2
+        assert stats.reg_count == 1
+        assert stats.base_price == 11000.0
+    
+    def test_regression_matches_linregress(self):
+        rng = random.Random(3)
+        points = [(20000 - 0.05 * m + rng.gauss(0, 800), m)
+                  for m in (rng.randrange(5000, 150000) for _ in range(200))]
+        
+        fit = _stats(points).regression()
+        expected = linregress([m for _, m in points], [p for p, _ in points])
+        
+        assert fit['slope'] == pytest.approx(expected.slope, rel=1e-6)
+        assert fit['intercept'] == pytest.approx(expected.intercept, rel=1e-6)
+        assert fit['r_value'] == pytest.approx(expected.rvalue, rel=1e-6)
+        assert fit['std_err'] == pytest.approx(expected.stderr, rel=1e-6)
+        assert fit['p_value'] == pytest.approx(expected.pvalue, rel=1e-4, abs=1e-300)
+    
+    def test_regression_two_points(self):
+        fit = _stats([(15000.0, 50000), (14000.0, 75000)]).regression()
+        expected = linregress([50000, 75000], [15000.0, 14000.0])
+        
+        assert fit['slope'] == pytest.approx(expected.slope)
+        assert fit['p_value'] == expected.pvalue
+        assert fit['std_err'] == 0.0
+    
+    def test_regression_identical_mileage_raises(self):
+        with pytest.raises(ValueError):
+            _stats([(15000.0, 50000), (14000.0, 50000)]).regression()
+    
+    def test_merge_equals_combined(self):
+        first = [(15000.0, 50000), (14000.0, 75000)]
+        second = [(13000.0, 100000), (None, 20000), (12000.0, None)]
+        
+        merged = _stats(first).merge(_stats(second))
+        
+        assert merged.to_dict() == _stats(first + second).to_dict()
@@ -0,0 +1,101 @@
+import logging
+import os
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from utils import metrics
+from utils.profiling import QueryProfiler, install_query_profiler, register_profiling, uninstall_query_profiler
+
+
+@pytest.fixture(autouse=True)
+def clean_profiler():
+    metrics.reset()
+    yield
+    uninstall_query_profiler()
+    metrics.reset()
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE vehicles (id INTEGER PRIMARY KEY, year INTEGER)'))
+        conn.execute(text('CREATE INDEX ix_year ON vehicles (year)'))
+    return engine
+
+
+class TestQueryProfiler:
+
+    def test_slow_queries_logged_with_plan(self, engine, caplog):
+        install_query_profiler(QueryProfiler(threshold_ms=0))
+
+        with caplog.at_level(logging.WARNING, logger='utils.profiling'):
+            with engine.connect() as conn:
+                conn.execute(text('SELECT id FROM vehicles WHERE year = :year'), {'year': 2015}).all()
+                conn.execute(text('SELECT id FROM vehicles WHERE year = :year'), {'year': 2016}).all()
+
+        slow = [r.getMessage() for r in caplog.records if r.getMessage().startswith('Slow query')]
+        assert len(slow) == 2
+        assert '2015' in slow[0] and 'EXPLAIN' in slow[0] and 'ix_year' in slow[0]
+        # The same statement is only explained once per interval
+        assert 'EXPLAIN' not in slow[1]
+        assert metrics.snapshot()['db.slow_queries'] == 2
+
+    def test_fast_queries_only_counted(self, engine, caplog):
+        install_query_profiler(QueryProfiler(threshold_ms=10000))
+
+        with caplog.at_level(logging.WARNING, logger='utils.profiling'):
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1')).all()
+
+        assert not caplog.records
+        assert metrics.snapshot()['db.queries'] == 1
+
+    def test_uninstall_stops_timing(self, engine):
+        install_query_profiler(QueryProfiler())
+        uninstall_query_profiler()
+
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1')).all()
+
+        assert 'db.queries' not in metrics.snapshot()
+
+
+class TestRequestProfile:
+
+    @pytest.fixture
+    def profiled_app(self, tmp_path, engine):
+        app = Flask(__name__)
+        app.config.update(PROFILING_ENABLED=True, ADMIN_TOKEN='secret', PROFILE_DIR=str(tmp_path))
+
+        @app.route('/search')
+        def search():
+            with engine.connect() as conn:
+                conn.execute(text('SELECT count(*) FROM vehicles')).scalar()
+            return 'ok'
+
+        register_profiling(app)
+        return app
+
+    def test_admin_gets_profile(self, profiled_app, tmp_path):
+        response = profiled_app.test_client().get(
+            '/search?profile=1', headers={'Authorization': 'Bearer secret'}
+        )
+
+        assert response.data == b'ok'
+        assert os.path.dirname(response.headers['X-Profile-Path']) == str(tmp_path)
+        assert os.path.exists(response.headers['X-Profile-Path'])
+        assert response.headers['X-Query-Count'] == '1'
+
+    @pytest.mark.parametrize('headers', [
+        {'X-Profile': '1'},
+        {'X-Profile': '1', 'X-Admin-Token': 'wrong'},
+        {'X-Admin-Token': 'secret'},
+    ])
+    def test_profile_requires_admin_and_flag(self, profiled_app, tmp_path, headers):
+        response = profiled_app.test_client().get('/search', headers=headers)
+
+        assert response.status_code == 200
+        assert 'X-Profile-Path' not in response.headers
+        assert not list(tmp_path.iterdir())
@@ -0,0 +1,108 @@
+import json
+import numpy as np
+import pytest
+from data.models import Vehicle, YmmPriceSketch, db
+from services.aggregate_builder import AggregateBuilder
+from controllers.search_controller import SearchController
+from services.vehicle_service import VehicleService
+from utils.quantile_sketch import KLLSketch
+
+
+def _rank_error(sketch, values, q):
+    estimate = sketch.quantile(q)
+    return abs(np.searchsorted(np.sort(values), estimate, side='right') / len(values) - q)
+
+
+class TestKLLSketch:
+
+    def test_small_input_is_exact(self):
+        sketch = KLLSketch(k=200)
+        sketch.update_many([5, 1, 4, 2, 3])
+
+        assert sketch.count == 5
+        assert sketch.quantile(0.5) == 3
+        assert (sketch.min, sketch.max, sketch.mean) == (1, 5, 3)
+
+    def test_rank_error_is_bounded(self):
+        values = np.random.default_rng(1).lognormal(9.5, 0.5, 100000)
+        sketch = KLLSketch(k=200)
+        sketch.update_many(values)
+
+        assert sketch.count == len(values)
+        assert sum(len(items) for items in sketch.compactors) < 1000
+        for q in (0.1, 0.5, 0.9):
+            assert _rank_error(sketch, values, q) < 0.02
+
+    def test_merge_matches_union(self):
+        rng = np.random.default_rng(2)
+        left, right = rng.normal(15000, 3000, 20000), rng.normal(25000, 3000, 30000)
+        merged = KLLSketch().merge(KLLSketch())
+        for part in (left, right):
+            sketch = KLLSketch()
+            sketch.update_many(part)
+            merged.merge(sketch)
+
+        union = np.concatenate([left, right])
+        assert merged.count == len(union)
+        assert merged.min == union.min()
+        for q in (0.1, 0.5, 0.9):
+            assert _rank_error(merged, union, q) < 0.02
+
+    def test_round_trip(self):
+        sketch = KLLSketch(k=50)
+        sketch.update_many(np.random.default_rng(3).uniform(1000, 50000, 5000))
+
+        restored = KLLSketch.from_bytes(sketch.to_bytes())
+
+        assert restored.count == sketch.count
+        assert (restored.min, restored.max) == (sketch.min, sketch.max)
+        assert restored.quantile(0.5) == pytest.approx(sketch.quantile(0.5), rel=1e-6)
+        assert KLLSketch.from_bytes(KLLSketch().to_bytes()).quantile(0.5) is None
+
+
+class TestYmmStatistics:
+
+    def test_statistics_from_sketches(self, populated_db, mock_config):
+        service = VehicleService(mock_config)
+
+        with populated_db.app_context():
+            db.session.add(Vehicle(vin='NOPRICE', year=2015, make='toyota', model='camry',
+                                   city='Seattle', state='WA'))
+            db.session.add(Vehicle(vin='2016A', year=2016, make='toyota', model='camry',
+                                   city='Seattle', state='WA', listing_price=19000.0))
+            db.session.commit()
+            AggregateBuilder(mock_config).build()
+            db.session.commit()
+
+            vehicles = service.search_vehicles(2015, 'Toyota', 'Camry')
+            prices = sorted(v.listing_price for v in vehicles if v.listing_price is not None)
+            stats = service.get_vehicle_statistics(2015, 'Toyota', 'Camry')
+
+            assert YmmPriceSketch.query.count() == 6
+            assert stats['total_vehicles'] == 6
+            assert stats['vehicles_with_prices'] == 5
+            assert stats['price_range']['min'] == prices[0]
+            assert stats['price_range']['max'] == prices[-1]
+            assert stats['price_range']['avg'] == pytest.approx(sum(prices) / len(prices))
+            assert stats['price_range']['p50'] == prices[2]
+
+            both_years = service.get_vehicle_statistics(2015, 'Toyota', 'Camry', end_year=2016)
+            assert both_years['vehicles_with_prices'] == 6
+            assert both_years['price_range']['max'] == 19000.0
+
+            region, _ = service.parse_region('WA', '', '')
+            assert service.get_vehicle_statistics(2015, 'Toyota', 'Camry', region)['total_vehicles'] == 2
+            assert service.get_vehicle_statistics(2015, 'Honda', 'Civic')['price_range'] is None
+
+    def test_api_serves_sketch_statistics(self, populated_db, mock_config):
+        controller = SearchController(mock_config)
+
+        with populated_db.app_context():
+            AggregateBuilder(mock_config).build()
+            db.session.commit()
+
+        with populated_db.test_request_context('/api/estimate?year=2015&make=Toyota&model=Camry&state=WA'):
+            payload = json.loads(controller.handle_api_request().get_data())
+
+        assert payload['statistics']['total_vehicles'] == 1
+        assert payload['statistics']['price_range']['p50'] is not None
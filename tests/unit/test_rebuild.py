@@ -0,0 +1,196 @@
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import func, select, text
+from controllers.job_controller import JobController
+from data.models import DataVersion, ImportJob, PriceGroupAggregate, Vehicle, db
+from data.versions import get_data_version_tracker
+from scripts.import_worker import ImportWorker
+from scripts.rebuild import DerivedDataRebuilder
+from services.import_jobs import ImportJobQueue
+from services.search_cache import SearchCache
+from utils.cache import FileCache, MemoryCache
+
+
+@pytest.fixture
+def rebuild_config(mock_config, tmp_path):
+    return dict(
+        mock_config,
+        CACHE_BACKEND='file',
+        CACHE_DIR=str(tmp_path / 'cache'),
+        QUERY_LOG_PATH=str(tmp_path / 'query_log.json'),
+        QUERY_LOG_FLUSH_EVERY=1,
+        ADMIN_TOKEN='secret',
+    )
+
+
+def _camry_count(search_cache):
+    return search_cache.get_summary(2015, 'Toyota', 'Camry')['vehicle_count']
+
+
+class TestDerivedDataRebuilder:
+
+    def test_rebuild_publishes_aggregates_and_version(self, populated_db, rebuild_config):
+        rebuilder = DerivedDataRebuilder(rebuild_config)
+
+        with populated_db.app_context():
+            assert get_data_version_tracker(rebuild_config).current() == ''
+
+            assert rebuilder.run(populated_db) is True
+
+            version = db.session.get(DataVersion, 'derived').version
+            assert get_data_version_tracker(rebuild_config).current() == version
+            assert db.session.scalar(select(func.count()).select_from(PriceGroupAggregate)) > 0
+            # Index statistics were refreshed
+            assert db.session.execute(text('SELECT count(*) FROM sqlite_stat1')).scalar() > 0
+
+    def test_new_generation_is_warm_before_it_is_served(self, populated_db, rebuild_config):
+        search_cache = SearchCache(rebuild_config)
+        rebuilder = DerivedDataRebuilder(rebuild_config, search_cache)
+        search_cache.record_query(2015, 'Toyota', 'Camry')
+
+        with populated_db.app_context():
+            assert _camry_count(search_cache) == 5
+            db.session.add(Vehicle(vin='NEW', year=2015, make='toyota', model='camry',
+                                   city='Boise', state='ID', listing_price=9000.0))
+            db.session.commit()
+
+            # The old generation keeps being served until the new one is published
+            assert _camry_count(search_cache) == 5
+            assert rebuilder.refresh_caches(populated_db) is True
+
+            entry = search_cache.cache.get(search_cache._key(2015, 'Toyota', 'Camry', None))
+            assert entry['vehicle_count'] == 6
+            assert _camry_count(search_cache) == 6
+
+    def test_memory_cache_worker_warms_before_switching(self, populated_db, rebuild_config):
+        config = dict(rebuild_config, CACHE_BACKEND='memory', DATA_VERSION_CHECK_SECONDS=0)
+        search_cache = SearchCache(config)
+        rebuilder = DerivedDataRebuilder(config, search_cache)
+        search_cache.record_query(2015, 'Toyota', 'Camry')
+        gate = threading.Event()
+
+        def prepare(version):
+            gate.wait(5)
+            search_cache.warm_up(populated_db, version=version)
+
+        with populated_db.app_context():
+            tracker = get_data_version_tracker(config)
+            tracker.prepare_with(prepare)
+            assert _camry_count(search_cache) == 5
+            db.session.add(Vehicle(vin='NEW', year=2015, make='toyota', model='camry',
+                                   city='Boise', state='ID', listing_price=9000.0))
+            db.session.commit()
+
+            assert rebuilder.refresh_caches(populated_db) is True
+            published = db.session.get(DataVersion, 'derived').version
+            # The import worker's memory is not the web worker's: nothing was warmed there
+            assert search_cache.cache.get(search_cache._key(2015, 'Toyota', 'Camry', None, published)) is None
+            # Until this worker has warmed the new version it keeps serving the old one
+            assert tracker.current() == ''
+            assert _camry_count(search_cache) == 5
+
+            gate.set()
+            deadline = time.monotonic() + 5
+            while tracker.current() != published and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert tracker.current() == published
+            entry = search_cache.cache.get(search_cache._key(2015, 'Toyota', 'Camry', None))
+            assert entry['vehicle_count'] == 6
+
+    def test_failed_rebuild_keeps_current_generation(self, populated_db, rebuild_config):
+        search_cache = SearchCache(rebuild_config)
+        rebuilder = DerivedDataRebuilder(rebuild_config, search_cache)
+
+        with populated_db.app_context():
+            assert rebuilder.run(populated_db) is True
+            version = get_data_version_tracker(rebuild_config).current()
+            groups = db.session.scalar(select(func.count()).select_from(PriceGroupAggregate))
+            assert _camry_count(search_cache) == 5
+
+            with patch.object(rebuilder.aggregates, 'build_group_aggregates',
+                              side_effect=RuntimeError('disk full')):
+                assert rebuilder.run(populated_db) is False
+
+            assert get_data_version_tracker(rebuild_config).current() == version
+            assert db.session.scalar(select(func.count()).select_from(PriceGroupAggregate)) == groups
+            assert _camry_count(search_cache) == 5
+
+    def test_prune_removes_expired_entries(self, tmp_path):
+        for cache in (MemoryCache(ttl=60, max_entries=10), FileCache(str(tmp_path), ttl=60)):
+            cache.set('fresh', 1)
+            cache.ttl = -1
+            cache.set('stale', 2)
+
+            assert cache.prune() == 1
+            assert cache.get('fresh') == 1
+            assert len(cache) == 1
+
+
+class TestRebuildJobs:
+
+    def test_worker_runs_rebuild_job(self, populated_db, rebuild_config):
+        worker = ImportWorker(populated_db, worker_id='test-worker')
+        worker.queue = ImportJobQueue(rebuild_config)
+        worker.rebuilder = DerivedDataRebuilder(rebuild_config)
+
+        with populated_db.app_context():
+            job, _ = worker.queue.enqueue('rebuild')
+            job_id = job.id
+
+        with patch.object(worker.importer, 'run_job') as run_import:
+            assert worker.run_once() is True
+            run_import.assert_not_called()
+
+        with populated_db.app_context():
+            job = db.session.get(ImportJob, job_id)
+            assert job.kind == 'rebuild'
+            assert job.status == 'succeeded'
+            assert db.session.get(DataVersion, 'derived') is not None
+
+    def test_model_training_failure_does_not_fail_published_rebuild(self, populated_db, rebuild_config,
+                                                                     tmp_path):
+        config = dict(rebuild_config, VALUATION_MODEL_PATH=str(tmp_path / 'model.npz'))
+        worker = ImportWorker(populated_db, worker_id='test-worker')
+        worker.queue = ImportJobQueue(config)
+        worker.rebuilder = DerivedDataRebuilder(config)
+
+        with populated_db.app_context():
+            job_id = worker.queue.enqueue('rebuild')[0].id
+
+        with patch.object(worker.rebuilder.trainer, 'train', return_value=None):
+            assert worker.run_once() is True
+
+        with populated_db.app_context():
+            job = db.session.get(ImportJob, job_id)
+            assert job.status == 'succeeded'
+            assert 'Valuation model retraining failed' in job.error
+            assert get_data_version_tracker(config).current() == db.session.get(DataVersion, 'derived').version
+
+    def test_rebuild_endpoint_requires_admin(self, app, rebuild_config):
+        controller = JobController(rebuild_config)
+
+        with app.test_request_context('/admin/rebuild', method='POST'):
+            assert controller.handle_rebuild_request().status_code == 403
+        with app.test_request_context('/admin/rebuild', method='POST',
+                                      headers={'Authorization': 'Bearer wrong'}):
+            assert controller.handle_rebuild_request().status_code == 403
+            assert ImportJob.query.count() == 0
+
+    def test_rebuild_endpoint_queues_one_job(self, app, rebuild_config):
+        controller = JobController(rebuild_config)
+        headers = {'X-Admin-Token': 'secret'}
+
+        with app.test_request_context('/admin/rebuild', method='POST', headers=headers):
+            response = controller.handle_rebuild_request()
+            payload = json.loads(response.get_data())
+            assert response.status_code == 202
+            assert payload['job']['kind'] == 'rebuild'
+            assert payload['status_url'] == f"/jobs/{payload['job']['id']}"
+
+            again = controller.handle_rebuild_request()
+            assert again.status_code == 409
+            assert json.loads(again.get_data())['job']['id'] == payload['job']['id']
@@ -0,0 +1,169 @@
+import json
+
+import pytest
+from controllers.search_controller import SearchController
+from data.gazetteer import Gazetteer, get_gazetteer
+from data.models import RegionPriceAggregate, Vehicle, db
+from services.aggregate_builder import AggregateBuilder
+from services.price_estimator import PriceEstimator
+from services.vehicle_service import VehicleService
+
+
+@pytest.fixture
+def regional_db(populated_db, mock_config):
+    with populated_db.app_context():
+        for vin, city, price, mileage in [
+            ('WA1', 'Tacoma', 14800.0, 90000),
+            ('WA2', 'Bellevue', 16900.0, 60000),
+            ('WA3', 'Spokane', 12500.0, 140000),
+        ]:
+            db.session.add(Vehicle(vin=vin, year=2015, make='toyota', model='camry',
+                                   city=city, state='WA', listing_price=price,
+                                   listing_mileage=mileage))
+        db.session.commit()
+        AggregateBuilder(mock_config).build()
+        db.session.commit()
+    return populated_db
+
+
+class TestGazetteer:
+    
+    def test_resolve_zip_and_city(self):
+        gazetteer = get_gazetteer()
+        
+        assert gazetteer.resolve('98101').city == 'Seattle'
+        assert gazetteer.resolve('seattle, wa').zip == '98101'
+        assert gazetteer.resolve('Seattle').state == 'WA'
+        assert gazetteer.resolve('00000') is None
+    
+    def test_ambiguous_city_requires_state(self):
+        gazetteer = get_gazetteer()
+        
+        assert gazetteer.resolve('Portland') is None
+        assert gazetteer.resolve('Portland, ME').state == 'ME'
+    
+    def test_radius_region(self):
+        gazetteer = get_gazetteer()
+        region = gazetteer.radius_region(gazetteer.resolve('98101'), 50)
+        
+        assert ('Seattle', 'WA') in region.places
+        assert ('Tacoma', 'WA') in region.places
+        assert ('Spokane', 'WA') not in region.places
+        assert region.states == ['WA']
+        # Towns missing from the gazetteer can't be matched, and the region says so
+        assert f"{len(region.places)} gazetteer cities" in region.note
+    
+    def test_configured_gazetteer_covers_more_towns(self, populated_db, mock_config, tmp_path):
+        path = tmp_path / 'gazetteer.csv'
+        path.write_text(
+            'zip,city,state,lat,lon\n'
+            '98101,Seattle,WA,47.6062,-122.3321\n'
+            '98032,Kent,WA,47.3809,-122.2348\n'
+        )
+        service = VehicleService(dict(mock_config, GAZETTEER_PATH=str(path)))
+        
+        with populated_db.app_context():
+            db.session.add(Vehicle(vin='KENT', year=2015, make='toyota', model='camry',
+                                   city='Kent', state='WA', listing_price=15500.0))
+            db.session.commit()
+            region, _ = service.parse_region('', 'Seattle, WA', '25')
+            
+            assert sorted(v.city for v in service.search_vehicles(2015, 'Toyota', 'Camry', region)) == [
+                'Kent', 'Seattle'
+            ]
+            assert region.note.startswith('Only listings in the 2 gazetteer cities')
+
+
+class TestRegionalSearch:
+    
+    def test_parse_region(self, mock_config):
+        service = VehicleService(mock_config)
+        
+        region, error = service.parse_region('wa', '', '')
+        assert error is None
+        assert region.state == 'WA'
+        assert region.label == 'in WA'
+        
+        assert service.parse_region('', '', '') == (None, None)
+        assert service.parse_region('XX', '', '')[1] is not None
+        assert service.parse_region('WA', '98101', '')[1] is not None
+        assert service.parse_region('', 'Atlantis', '')[1] == 'Unknown location: Atlantis'
+        assert service.parse_region('', '98101', '-5')[1] is not None
+        
+        region, error = service.parse_region('', '98101', '25')
+        assert region.label == 'within 25 mi of Seattle, WA'
+    
+    def test_search_by_state_and_radius(self, regional_db, mock_config):
+        service = VehicleService(mock_config)
+        
+        with regional_db.app_context():
+            by_state, _ = service.parse_region('WA', '', '')
+            nearby, _ = service.parse_region('', 'Seattle, WA', '50')
+            
+            assert len(service.search_vehicles(2015, 'Toyota', 'Camry', by_state)) == 4
+            assert sorted(v.city for v in service.search_vehicles(2015, 'Toyota', 'Camry', nearby)) == [
+                'Bellevue', 'Seattle', 'Tacoma'
+            ]
+    
+    def test_aggregates_built_per_city(self, regional_db):
+        with regional_db.app_context():
+            rows = RegionPriceAggregate.query.filter_by(state='WA').all()
+            
+            assert sorted(row.city for row in rows) == ['Bellevue', 'Seattle', 'Spokane', 'Tacoma']
+            assert sum(row.listing_count for row in rows) == 4
+    
+    def test_regional_estimate_matches_listing_estimate(self, regional_db, mock_config):
+        service = VehicleService(mock_config)
+        estimator = PriceEstimator(mock_config)
+        
+        with regional_db.app_context():
+            region, _ = service.parse_region('WA', '', '')
+            vehicles = service.search_vehicles(2015, 'Toyota', 'Camry', region)
+            
+            for mileage in (None, 100000):
+                price, metadata = estimator.estimate_regional_price(
+                    2015, 'Toyota', 'Camry', region, mileage
+                )
+                expected_price, expected = estimator.estimate_price(vehicles, mileage)
+                
+                assert price == expected_price
+                assert metadata['method'] == expected['method']
+                assert metadata['vehicle_count'] == 4
+                assert metadata['region'] == 'in WA'
+            assert metadata['slope'] == pytest.approx(expected['slope'])
+    
+    def test_cached_region_statements_rebind_values(self, regional_db, mock_config):
+        service = VehicleService(mock_config)
+        estimator = PriceEstimator(mock_config)
+        
+        with regional_db.app_context():
+            counts = []
+            for state, near in (('WA', ''), ('TX', ''), ('', 'Seattle, WA'), ('', 'Dallas, TX')):
+                region, _ = service.parse_region(state, near, '50')
+                stats = estimator.load_region_stats(2015, 'Toyota', 'Camry', region)
+                counts.append(stats.listing_count)
+            
+            assert counts == [4, 1, 3, 1]
+    
+    def test_regional_estimate_without_aggregates(self, populated_db, mock_config):
+        service = VehicleService(mock_config)
+        estimator = PriceEstimator(mock_config)
+        
+        with populated_db.app_context():
+            region, _ = service.parse_region('TX', '', '')
+            price, metadata = estimator.estimate_regional_price(2015, 'Toyota', 'Camry', region)
+            
+            assert price == 0.0
+            assert metadata['method'] == 'no_data'
+    
+    def test_api_reports_radius_coverage(self, regional_db, mock_config):
+        controller = SearchController(mock_config)
+        
+        with regional_db.test_request_context('/api/estimate?year=2015&make=Toyota&model=Camry&near=98101'):
+            payload = json.loads(controller.handle_api_request().get_data())
+        with regional_db.test_request_context('/api/estimate?year=2015&make=Toyota&model=Camry&state=WA'):
+            state_payload = json.loads(controller.handle_api_request().get_data())
+        
+        assert payload['region'] == 'within 50 mi of Seattle, WA'
+        assert 'other towns are not matched' in payload['region_note']
+        assert state_payload['region_note'] is None
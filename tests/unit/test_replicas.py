@@ -0,0 +1,113 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import pytest
+from data.models import ReplicationHeartbeat, Vehicle, db
+from data.replicas import ReplicaRouter, touch_heartbeat
+from services.aggregate_builder import AggregateBuilder
+from services.vehicle_service import VehicleService
+
+
+@pytest.fixture
+def replica_files(populated_db):
+    with populated_db.app_context():
+        touch_heartbeat(db.session)
+        db.session.commit()
+        primary_path = db.engine.url.database
+
+    paths = []
+    for _ in range(2):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        shutil.copyfile(primary_path, path)
+        paths.append(path)
+    yield paths
+    for path in paths:
+        os.unlink(path)
+
+
+def _service(mock_config, paths, max_lag=30):
+    service = VehicleService(mock_config)
+    service.replica_router = ReplicaRouter(
+        [f'sqlite:///{path}' for path in paths], check_interval=0, max_lag=max_lag
+    )
+    return service
+
+
+class TestReplicaRouting:
+    
+    def test_round_robin_across_replicas(self, populated_db, mock_config, replica_files):
+        # Make the replicas distinguishable by deleting a row from the second one
+        conn = sqlite3.connect(replica_files[1])
+        conn.execute("DELETE FROM vehicles WHERE vin = '1HGBH41JXMN109186'")
+        conn.commit()
+        conn.close()
+        service = _service(mock_config, replica_files)
+        
+        with populated_db.app_context():
+            counts = [len(service.search_vehicles(2015, "Toyota", "Camry")) for _ in range(4)]
+        
+        assert counts == [5, 4, 5, 4]
+        stats = service.replica_router.stats()
+        assert [r['reads'] for r in stats['replicas']] == [2, 2]
+        assert stats['primary_reads'] == 0
+    
+    def test_unreachable_replica_is_skipped(self, populated_db, mock_config, replica_files):
+        service = _service(mock_config, ['/nonexistent/dir/replica.db', replica_files[0]])
+        
+        with populated_db.app_context():
+            for _ in range(3):
+                assert len(service.search_vehicles(2015, "Toyota", "Camry")) == 5
+        
+        stats = service.replica_router.stats()
+        assert stats['replicas'][0]['healthy'] is False
+        assert stats['replicas'][1]['reads'] == 3
+    
+    def test_failover_to_primary_when_query_fails(self, populated_db, mock_config, replica_files):
+        conn = sqlite3.connect(replica_files[0])
+        conn.execute("DROP TABLE vehicles")
+        conn.commit()
+        conn.close()
+        service = _service(mock_config, replica_files[:1])
+        
+        with populated_db.app_context():
+            vehicles = service.search_vehicles(2015, "Toyota", "Camry")
+        
+        assert len(vehicles) == 5
+        stats = service.replica_router.stats()
+        assert stats['replicas'][0]['failures'] == 1
+    
+    def test_statistics_read_from_replica(self, populated_db, mock_config, replica_files):
+        service = _service(mock_config, replica_files[:1])
+        
+        with populated_db.app_context():
+            # Sketches built on the primary after the replica was copied
+            AggregateBuilder(mock_config).build()
+            db.session.commit()
+            stats = service.get_vehicle_statistics(2015, "Toyota", "Camry")
+        
+        assert stats['total_vehicles'] == 0
+        assert service.replica_router.stats()['replicas'][0]['reads'] == 1
+    
+    def test_lagging_replica_is_skipped(self, populated_db, mock_config, replica_files):
+        with populated_db.app_context():
+            heartbeat = db.session.get(ReplicationHeartbeat, 1)
+            heartbeat.updated_at += 120
+            db.session.commit()
+        service = _service(mock_config, replica_files[:1], max_lag=30)
+        
+        with populated_db.app_context():
+            assert len(service.search_vehicles(2015, "Toyota", "Camry")) == 5
+        
+        stats = service.replica_router.stats()
+        assert stats['replicas'][0]['lag_seconds'] == pytest.approx(120)
+        assert stats['replicas'][0]['reads'] == 0
+        assert stats['primary_reads'] == 1
+    
+    def test_no_replicas_reads_primary(self, populated_db, mock_config):
+        service = VehicleService(mock_config)
+        
+        with populated_db.app_context():
+            assert service.replica_router.read_engine() is None
+            assert len(service.search_vehicles(2015, "Toyota", "Camry")) == 5
@@ -0,0 +1,135 @@
+import json
+
+import pytest
+from controllers.search_controller import SearchController
+from data.models import Vehicle, db
+from services.search_cache import SearchCache
+from utils.cache import FileCache, MemoryCache
+from utils.query_log import CountMinSketch, QueryLog, normalize_query
+
+
+@pytest.fixture
+def cache_config(mock_config, tmp_path):
+    return dict(
+        mock_config,
+        CACHE_BACKEND='file',
+        CACHE_DIR=str(tmp_path / 'cache'),
+        QUERY_LOG_PATH=str(tmp_path / 'query_log.json'),
+        QUERY_LOG_FLUSH_EVERY=2,
+    )
+
+
+class TestCaches:
+
+    def test_memory_cache_lru_and_ttl(self):
+        cache = MemoryCache(ttl=60, max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+
+        cache.ttl = -1
+        cache.set('d', 4)
+        assert cache.get('d') is None
+
+    def test_file_cache_is_shared(self, tmp_path):
+        writer = FileCache(str(tmp_path), ttl=60)
+        reader = FileCache(str(tmp_path), ttl=60)
+        writer.set('key', {'listings': [{'price': 1.5}]})
+
+        assert reader.get('key') == {'listings': [{'price': 1.5}]}
+        assert reader.get('other') is None
+        reader.clear()
+        assert writer.get('key') is None
+
+
+class TestQueryLog:
+
+    def test_count_min_never_undercounts(self):
+        sketch = CountMinSketch(width=64, depth=4)
+        for i in range(500):
+            sketch.add(('key', i % 50))
+
+        assert all(sketch.estimate(('key', i)) >= 10 for i in range(50))
+
+    def test_normalize_query(self):
+        assert normalize_query(2015, ' Toyota ', 'Land  Cruiser', 'wa', '', '25') == (
+            2015, 'toyota', 'land cruiser', 'WA', '', ''
+        )
+
+    def test_top_keys_are_shared_through_file(self, cache_config):
+        first, second = QueryLog(cache_config), QueryLog(cache_config)
+        camry = normalize_query(2015, 'Toyota', 'Camry')
+        civic = normalize_query(2018, 'Honda', 'Civic')
+
+        for _ in range(4):
+            first.record(camry)
+        second.record(civic)
+        second.record(camry)
+
+        top = QueryLog(cache_config).top(2)
+        assert [key for key, _ in top] == [camry, civic]
+        assert top[0][1] == pytest.approx(5, rel=0.01)
+
+    def test_counts_decay(self, cache_config):
+        log = QueryLog(dict(cache_config, QUERY_LOG_HALF_LIFE_SECONDS=3600))
+        key = normalize_query(2015, 'Toyota', 'Camry')
+        log.record(key)
+        log.record(key)
+
+        with open(cache_config['QUERY_LOG_PATH']) as f:
+            data = json.load(f)
+        data['updated_at'] -= 3600
+        with open(cache_config['QUERY_LOG_PATH'], 'w') as f:
+            json.dump(data, f)
+
+        assert log.top(1)[0][1] == pytest.approx(1, rel=0.01)
+
+
+class TestSearchCache:
+
+    def test_summary_served_from_cache(self, populated_db, cache_config):
+        search_cache = SearchCache(cache_config)
+
+        with populated_db.app_context():
+            summary = search_cache.get_summary(2015, 'Toyota', 'Camry')
+            assert summary['vehicle_count'] == 5
+            assert summary['stats']['price_count'] == 5
+
+            db.session.add(Vehicle(vin='NEW', year=2015, make='toyota', model='camry',
+                                   city='Boise', state='ID', listing_price=9000.0))
+            db.session.commit()
+
+            assert search_cache.get_summary(2015, 'Toyota', 'Camry')['vehicle_count'] == 5
+            search_cache.clear()
+            assert search_cache.get_summary(2015, 'Toyota', 'Camry')['vehicle_count'] == 6
+            assert search_cache.get_summary(2015, 'Honda', 'Civic') is None
+
+    def test_cached_estimate_matches_estimate_price(self, populated_db, cache_config):
+        controller = SearchController(cache_config)
+
+        with populated_db.app_context():
+            vehicles = controller.vehicle_service.search_vehicles(2015, 'Toyota', 'Camry')
+            expected, _ = controller.price_estimator.estimate_price(vehicles, 100000)
+            summary = controller.search_cache.get_summary(2015, 'Toyota', 'Camry')
+            cached, metadata = controller._estimate(summary, 2015, 'Toyota', 'Camry', 100000, None)
+
+        assert cached == expected
+        assert metadata['method'] == 'regression'
+
+    def test_searches_are_logged_and_warmed(self, populated_db, cache_config):
+        controller = SearchController(cache_config)
+        for _ in range(2):
+            with populated_db.test_request_context('/api/estimate?year=2015&make=Toyota&model=Camry'):
+                assert controller.handle_api_request().status_code == 200
+
+        search_cache = SearchCache(cache_config)
+        search_cache.clear()
+        assert search_cache.warm_up(populated_db) == 1
+
+        with populated_db.app_context():
+            key = search_cache._key(2015, 'Toyota', 'Camry', None)
+        assert search_cache.cache.get(key)['vehicle_count'] == 5
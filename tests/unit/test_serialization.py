@@ -0,0 +1,41 @@
+import json
+import numpy as np
+from utils.serialization import dumps, listings_to_columns
+
+
+class TestSerialization:
+    
+    def test_listings_to_columns(self):
+        listings = [
+            {'id': 'VIN1', 'vehicle': '2015 toyota camry', 'price': 13500.0,
+             'mileage': 125000, 'location': 'Seattle, WA'},
+            {'id': 'VIN2', 'vehicle': '2015 toyota camry', 'price': None,
+             'mileage': 98000, 'location': 'Dallas, TX'},
+        ]
+        
+        columns = listings_to_columns(listings)
+        
+        assert columns['count'] == 2
+        assert columns['id'] == ['VIN1', 'VIN2']
+        assert columns['price'] == [13500.0, None]
+        assert columns['mileage'] == [125000, 98000]
+        assert columns['location'] == ['Seattle, WA', 'Dallas, TX']
+        assert 'vehicle' not in columns
+    
+    def test_listings_to_columns_empty(self):
+        columns = listings_to_columns([])
+        
+        assert columns['count'] == 0
+        assert columns['id'] == []
+    
+    def test_dumps_compact_bytes(self):
+        data = dumps({'a': 1, 'b': [1, 2]})
+        
+        assert isinstance(data, bytes)
+        assert b' ' not in data
+        assert json.loads(data) == {'a': 1, 'b': [1, 2]}
+    
+    def test_dumps_numpy_values(self):
+        data = dumps({'slope': np.float64(-0.05), 'count': np.int64(5)})
+        
+        assert json.loads(data) == {'slope': -0.05, 'count': 5}
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+from services.search_cache import SearchCache
+from utils import metrics
+from utils.cache import FileCache
+from utils.single_flight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _run_concurrently(count, target):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight('test')
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': 42}
+
+        results = _run_concurrently(8, lambda: flight.do('key', slow))
+
+        assert len(calls) == 1
+        assert all(result == {'value': 42} for result in results)
+        assert metrics.snapshot() == {'test.executed': 1, 'test.coalesced': 7}
+        assert flight.in_flight() == 0
+
+    def test_errors_reach_every_waiter(self):
+        flight = SingleFlight('test')
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError('boom')
+
+        results = _run_concurrently(4, lambda: flight.do('key', fail))
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert metrics.snapshot()['test.executed'] == 1
+
+    def test_waiters_stop_waiting_after_timeout(self):
+        flight = SingleFlight('test')
+        release = threading.Event()
+        leader = threading.Thread(target=lambda: flight.do('key', release.wait))
+        leader.start()
+        while not flight.in_flight():
+            time.sleep(0.01)
+
+        assert flight.do('key', lambda: 'own', timeout=0.05) == 'own'
+        release.set()
+        leader.join()
+        assert metrics.snapshot()['test.wait_timeouts'] == 1
+
+
+class TestFileCacheLock:
+
+    def test_lock_times_out_while_held(self, tmp_path):
+        first, second = FileCache(str(tmp_path), ttl=60), FileCache(str(tmp_path), ttl=60)
+
+        with first.lock('key', timeout=1) as locked:
+            assert locked
+            with second.lock('key', timeout=0.05) as contended:
+                assert not contended
+            with second.lock('other', timeout=0.05) as other:
+                assert other
+        with second.lock('key', timeout=0.05) as locked:
+            assert locked
+
+
+class TestSearchCacheCoalescing:
+
+    @pytest.mark.parametrize('cross_process', [False, True])
+    def test_concurrent_misses_run_one_search(self, populated_db, mock_config, tmp_path,
+                                              monkeypatch, cross_process):
+        search_cache = SearchCache(dict(
+            mock_config, CACHE_BACKEND='file', CACHE_DIR=str(tmp_path),
+            SINGLE_FLIGHT_CROSS_PROCESS=cross_process,
+        ))
+        original = search_cache.vehicle_service.summarize_vehicles
+        searches = []
+
+        def slow_search(*args):
+            searches.append(args)
+            time.sleep(0.2)
+            return original(*args)
+
+        monkeypatch.setattr(search_cache.vehicle_service, 'summarize_vehicles', slow_search)
+
+        def search():
+            with populated_db.app_context():
+                return search_cache.get_summary(2015, 'Toyota', 'Camry')['vehicle_count']
+
+        assert _run_concurrently(6, search) == [5] * 6
+        assert len(searches) == 1
+        counters = metrics.snapshot()
+        assert counters['search.single_flight.executed'] == 1
+        assert counters['search.single_flight.coalesced'] == 5
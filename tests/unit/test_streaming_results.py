@@ -0,0 +1,100 @@
+import os
+
+import pytest
+from flask import Response
+from sqlalchemy import event
+from controllers.search_controller import SearchController
+from data.models import db
+from services.aggregate_builder import AggregateBuilder
+from services.vehicle_service import VehicleService
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'templates')
+
+
+@pytest.fixture
+def stream_config(mock_config):
+    return dict(mock_config, SEARCH_CACHE_ENABLED=False, QUERY_LOG_PATH=None,
+                STREAM_RESULTS_MIN_LISTINGS=5, STREAM_YIELD_PER=2)
+
+
+@pytest.fixture
+def stream_app(populated_db, stream_config):
+    with populated_db.app_context():
+        AggregateBuilder(stream_config).build()
+        db.session.commit()
+    populated_db.template_folder = TEMPLATE_DIR
+    controller = SearchController(stream_config)
+    populated_db.add_url_rule('/search', 'search', controller.handle_search_request, methods=['POST'])
+    return populated_db
+
+
+class TestIterVehicles:
+    
+    def test_streams_matches_and_stops_at_limit(self, populated_db, stream_config):
+        service = VehicleService(stream_config)
+        
+        with populated_db.app_context():
+            all_vins = sorted(v.vin for v in service.search_vehicles(2015, 'Toyota', 'Camry'))
+            assert sorted(v.vin for v in service.iter_vehicles(2015, 'Toyota', 'Camry')) == all_vins
+            assert len(list(service.iter_vehicles(2015, 'Toyota', 'Camry', limit=3))) == 3
+            
+            texas, _ = service.parse_region('TX', '', '')
+            assert [v.city for v in service.iter_vehicles(2015, 'Toyota', 'Camry', texas)] == ['Dallas']
+            assert list(service.iter_vehicles(2015, 'Honda', 'Civic')) == []
+    
+    def test_limit_is_applied_by_the_query(self, populated_db, stream_config):
+        service = VehicleService(stream_config)
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+        
+        with populated_db.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                assert len(list(service.iter_vehicles(2015, 'Toyota', 'Camry', limit=3))) == 3
+                assert len(list(service.iter_vehicles(2015, 'Toyota', 'Camry', limit=2))) == 2
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        
+        searches = [(sql, params) for sql, params in statements if 'FROM vehicles' in sql]
+        assert len(searches) == 2 and all('LIMIT' in sql for sql, _ in searches)
+        assert searches[0][0] == searches[1][0]
+        assert [params[-2] for _, params in searches] == [3, 2]
+
+
+class TestStreamingResults:
+    
+    def test_large_group_is_streamed(self, stream_app, stream_config):
+        form = {'year': '2015', 'make': 'Toyota', 'model': 'Camry', 'mileage': '50,000'}
+        with stream_app.test_request_context('/search', method='POST', data=form):
+            result = SearchController(stream_config).handle_search_request()
+            assert isinstance(result, Response) and result.is_streamed
+        
+        body = stream_app.test_client().post('/search', data=form).get_data(as_text=True)
+        assert 'Estimated Price:</strong> $' in body
+        assert '5 listings shown' in body
+        assert body.count('<td>1HGBH41JXMN1091') == 5
+        assert body.rstrip().endswith('</html>')
+    
+    def test_streamed_estimate_matches_buffered_page(self, stream_app, stream_config):
+        client = stream_app.test_client()
+        form = {'year': '2015', 'make': 'Toyota', 'model': 'Camry', 'mileage': '50000'}
+        streamed = client.post('/search', data=form).get_data(as_text=True)
+        
+        stream_config['STREAM_RESULTS_MIN_LISTINGS'] = 0
+        controller = SearchController(stream_config)
+        with stream_app.test_request_context('/search', method='POST', data=form):
+            buffered = controller.handle_search_request()
+        
+        def price(page):
+            return page.split('Estimated Price:</strong>')[1].split('<')[0]
+        assert price(streamed) == price(buffered)
+    
+    def test_small_group_is_rendered_whole(self, stream_app, stream_config):
+        form = {'year': '2015', 'make': 'Toyota', 'model': 'Camry', 'state': 'TX'}
+        with stream_app.test_request_context('/search', method='POST', data=form):
+            result = SearchController(stream_config).handle_search_request()
+        
+        assert isinstance(result, str)
+        assert 'Sample Listings (1)' in result
@@ -0,0 +1,152 @@
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from controllers.search_controller import SearchController
+from scripts.train_valuation_model import ValuationModelTrainer
+from services.price_estimator import PriceEstimator
+from services.price_stats import PriceStats
+from services.valuation_model import (
+    ValuationModel, ValuationModelFit, fit_valuation_model, get_valuation_model
+)
+
+
+def _synthetic_listings(n=4000, seed=3):
+    rng = np.random.default_rng(seed)
+    make_effect = {'toyota': 0.1, 'honda': 0.0, 'ford': -0.1}
+    model_effect = {'toyota|camry': 0.05, 'toyota|prius': -0.05, 'honda|civic': 0.0,
+                    'honda|accord': 0.1, 'ford|focus': -0.1}
+    state_effect = {'WA': 0.05, 'TX': -0.05, 'FL': 0.0}
+
+    models = rng.choice(list(model_effect), n)
+    makes = np.array([m.split('|')[0] for m in models])
+    states = rng.choice(list(state_effect), n)
+    years = rng.integers(2010, 2021, n)
+    mileages = rng.integers(1000, 200000, n)
+    log_price = (
+        9.6 + 0.08 * (years - 2015) - 0.15 * (np.log1p(mileages) - 11)
+        + np.array([make_effect[m] for m in makes])
+        + np.array([model_effect[m] for m in models])
+        + np.array([state_effect[s] for s in states])
+        + rng.normal(0, 0.05, n)
+    )
+    return years, makes, models, states, mileages, np.exp(log_price)
+
+
+@pytest.fixture
+def fitted():
+    return fit_valuation_model(*_synthetic_listings(), alpha=1.0)
+
+
+class TestValuationModel:
+
+    def test_recovers_factor_effects(self, fitted):
+        expected = np.exp(9.6 + 0.08 * 3 - 0.15 * (np.log1p(50000) - 11) + 0.1 + 0.05 + 0.05)
+
+        predicted = fitted.predict(2018, 'Toyota', ' Camry ', 50000, 'wa')
+
+        assert predicted == pytest.approx(expected, rel=0.03)
+        assert fitted.rmse == pytest.approx(0.05, abs=0.01)
+        # More miles, lower price
+        assert fitted.predict(2018, 'toyota', 'camry', 150000) < fitted.predict(2018, 'toyota', 'camry', 20000)
+
+    def test_unseen_model_uses_make(self, fitted):
+        assert fitted.knows('toyota', 'corolla')
+        assert not fitted.knows('tesla', 'model 3')
+
+        toyota = fitted.predict(2016, 'toyota', 'corolla', 80000)
+        ford = fitted.predict(2016, 'ford', 'ranger', 80000)
+        assert toyota > ford
+
+    def test_batched_fit_matches_single_fit(self, fitted):
+        columns = _synthetic_listings()
+        fit = ValuationModelFit(alpha=1.0)
+        batches = [[column[start:start + 700] for column in columns] for start in range(0, 4000, 700)]
+        for batch in batches:
+            fit.add(*batch)
+        fit.solve()
+        for batch in batches:
+            fit.add_residuals(*batch)
+        batched = fit.model()
+
+        assert batched.row_count == fitted.row_count == 4000
+        assert batched.rmse == pytest.approx(fitted.rmse, rel=1e-6)
+        assert batched.smearing == pytest.approx(fitted.smearing, rel=1e-6)
+        for args in ((2018, 'toyota', 'camry', 50000, 'WA'), (2011, 'ford', 'focus', 180000, 'TX')):
+            assert batched.predict(*args) == pytest.approx(fitted.predict(*args), rel=1e-6)
+
+    def test_trainer_streams_batches(self, populated_db, mock_config):
+        trainer = ValuationModelTrainer(mock_config)
+
+        with populated_db.app_context():
+            with patch('scripts.train_valuation_model.TRAINING_BATCH_ROWS', 2):
+                batches = list(trainer.iter_training_batches())
+                streamed = trainer.train()
+            whole = fit_valuation_model(*(np.concatenate(column) for column in zip(*batches)))
+
+        assert [len(batch[0]) for batch in batches] == [2, 2, 1]
+        assert streamed.row_count == 5
+        assert streamed.predict(2015, 'toyota', 'camry', 90000, 'WA') == pytest.approx(
+            whole.predict(2015, 'toyota', 'camry', 90000, 'WA'), rel=1e-6
+        )
+
+    def test_save_and_load(self, fitted, tmp_path):
+        path = str(tmp_path / 'model.npz')
+        fitted.save(path)
+
+        loaded = ValuationModel.load(path)
+
+        assert loaded.row_count == fitted.row_count
+        assert loaded.predict(2014, 'honda', 'civic', 90000, 'TX') == pytest.approx(
+            fitted.predict(2014, 'honda', 'civic', 90000, 'TX'), rel=1e-5
+        )
+        assert get_valuation_model(path).row_count == fitted.row_count
+        assert get_valuation_model(str(tmp_path / 'missing.npz')) is None
+
+
+class TestModelFallback:
+
+    @pytest.fixture
+    def model_config(self, populated_db, mock_config, tmp_path):
+        config = dict(mock_config, VALUATION_MODEL_PATH=str(tmp_path / 'model.npz'))
+        with populated_db.app_context():
+            assert ValuationModelTrainer(config).train().row_count == 5
+        return config
+
+    def test_sparse_group_uses_model(self, model_config):
+        estimator = PriceEstimator(dict(model_config, MIN_VEHICLES_FOR_REGRESSION=10))
+        stats = PriceStats()
+        stats.add(15000.0, 90000)
+
+        price, metadata = estimator.estimate_group(stats, 2015, 'toyota', 'camry', 90000)
+
+        assert metadata['method'] == 'model'
+        assert metadata['fallback_reason'] == 'insufficient_data'
+        assert metadata['vehicle_count'] == 1
+        assert 12000 < price < 17000
+
+    def test_dense_group_keeps_regression(self, model_config):
+        estimator = PriceEstimator(model_config)
+        stats = PriceStats()
+        for price, mileage in ((13500.0, 125000), (14200.0, 98000), (15800.0, 75000)):
+            stats.add(price, mileage)
+
+        _, metadata = estimator.estimate_group(stats, 2015, 'toyota', 'camry', 90000)
+
+        assert metadata['method'] == 'regression'
+
+    def test_unseen_model_gets_estimate(self, populated_db, model_config):
+        controller = SearchController(model_config)
+        url = '/api/estimate?year=2015&make=Toyota&model=Corolla&mileage=60000'
+        with populated_db.test_request_context(url):
+            response = controller.handle_api_request()
+
+        payload = json.loads(response.data)
+        assert response.status_code == 200
+        assert payload['metadata']['method'] == 'model'
+        assert payload['metadata']['fallback_reason'] == 'no_data'
+        assert payload['listings'] == []
+
+        with populated_db.test_request_context('/api/estimate?year=2015&make=Tesla&model=S'):
+            assert controller.handle_api_request().status_code == 404
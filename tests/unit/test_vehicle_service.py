@@ -1,4 +1,7 @@
 import pytest
+from unittest.mock import patch
+from services.aggregate_builder import AggregateBuilder
+from services.price_stats import PriceStats
 from services.vehicle_service import VehicleService
 from data.models import Vehicle, db
 
@@ -40,6 +43,24 @@ class TestVehicleService:
         
         assert len(vehicles) == 5
     
+    def test_summarize_vehicles_matches_materialized_search(self, populated_db, mock_config):
+        service = VehicleService(dict(mock_config, MAX_LISTINGS_DISPLAY=3, STREAM_YIELD_PER=2))
+        
+        with populated_db.app_context():
+            vehicles = service.search_vehicles(2015, "Toyota", "Camry")
+            expected = PriceStats()
+            for vehicle in vehicles:
+                expected.add(vehicle.listing_price, vehicle.listing_mileage)
+            
+            summary = service.summarize_vehicles(2015, "Toyota", "Camry")
+            
+            assert summary['vehicle_count'] == 5
+            assert summary['stats'] == expected.to_dict()
+            assert summary['listings'] == service.get_sample_listings(vehicles)
+            assert len(summary['listings']) == 3
+            assert service.summarize_vehicles(2016, "Toyota", "Camry") is None
+            assert service.summarize_vehicles(2015, "Tesla", "Model S") is None
+    
     def test_get_sample_listings(self, populated_db, mock_config):
         service = VehicleService(mock_config)
         vehicles = service.search_vehicles(2015, "Toyota", "Camry")
@@ -142,48 +163,46 @@ class TestVehicleService:
         assert is_valid is True
         assert error is None
     
-    def test_get_vehicle_statistics_empty(self, mock_config):
+    def test_get_vehicle_statistics_empty(self, app, mock_config):
         service = VehicleService(mock_config)
         
-        stats = service.get_vehicle_statistics([])
+        with app.app_context():
+            stats = service.get_vehicle_statistics(2015, "Toyota", "Camry")
         
         assert stats['total_vehicles'] == 0
         assert stats['vehicles_with_prices'] == 0
-        assert stats['vehicles_with_mileage'] == 0
         assert stats['price_range'] is None
-        assert stats['mileage_range'] is None
     
     def test_get_vehicle_statistics_with_data(self, populated_db, mock_config):
         service = VehicleService(mock_config)
-        vehicles = service.search_vehicles(2015, "Toyota", "Camry")
         
-        stats = service.get_vehicle_statistics(vehicles)
+        with populated_db.app_context():
+            AggregateBuilder(mock_config).build()
+            db.session.commit()
+            stats = service.get_vehicle_statistics(2015, "Toyota", "Camry")
         
         assert stats['total_vehicles'] == 5
         assert stats['vehicles_with_prices'] == 5
-        assert stats['vehicles_with_mileage'] == 5
-        assert stats['price_range'] is not None
-        assert stats['mileage_range'] is not None
-        assert 'min' in stats['price_range']
-        assert 'max' in stats['price_range']
-        assert 'avg' in stats['price_range']
-        assert 'min' in stats['mileage_range']
-        assert 'max' in stats['mileage_range']
-        assert 'avg' in stats['mileage_range']
-    
-    def test_get_vehicle_statistics_partial_data(self, mock_config):
-        service = VehicleService(mock_config)
-        vehicles = [
-            Vehicle(listing_price=10000.0, listing_mileage=100000),
-            Vehicle(listing_price=None, listing_mileage=120000),
-            Vehicle(listing_price=12000.0, listing_mileage=None),
-            Vehicle(listing_price=None, listing_mileage=None)
-        ]
-        
-        stats = service.get_vehicle_statistics(vehicles)
+        for key in ('min', 'max', 'avg', 'p10', 'p50', 'p90'):
+            assert key in stats['price_range']
+    
+    def test_get_vehicle_statistics_partial_data(self, app, mock_config):
+        service = VehicleService(mock_config)
+        
+        with app.app_context():
+            for vin, price in (('A', 10000.0), ('B', None), ('C', 12000.0), ('D', None)):
+                db.session.add(Vehicle(vin=vin, year=2015, make='toyota', model='camry',
+                                       city='Dallas', state='TX', listing_price=price))
+            db.session.commit()
+            AggregateBuilder(mock_config).build()
+            db.session.commit()
+            
+            # Served from the sketches without loading any listing
+            with patch.object(service, 'search_vehicles') as search:
+                stats = service.get_vehicle_statistics(2015, "Toyota", "Camry")
+                search.assert_not_called()
         
         assert stats['total_vehicles'] == 4
         assert stats['vehicles_with_prices'] == 2
-        assert stats['vehicles_with_mileage'] == 2
-        assert stats['price_range'] is not None
-        assert stats['mileage_range'] is not None 
\ No newline at end of file
+        assert stats['price_range']['min'] == 10000.0
+        assert stats['price_range']['max'] == 12000.0 
\ No newline at end of file
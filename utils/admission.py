@@ -0,0 +1,172 @@
+"""
+Admission control for database-bound endpoints.
+
+With ``RATE_LIMIT_PER_SECOND`` set, each client gets a token bucket (that refill,
+``RATE_LIMIT_BURST`` capacity) and is answered 429 once it is empty. Clients are
+told apart by address, so behind a reverse proxy this needs
+``RATE_LIMIT_TRUST_PROXY``; a warning is logged when forwarded requests arrive
+without it. Admitted requests then need one
+of ``MAX_CONCURRENT_SEARCHES`` slots. Up to ``ADMISSION_QUEUE_SIZE`` requests wait
+for a slot for at most ``ADMISSION_QUEUE_TIMEOUT_SECONDS``; the rest get an
+immediate 503. Both responses carry Retry-After, so overload is shed quickly
+instead of every request timing out against a saturated database.
+
+Limits are per worker process.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from flask import Response, g, request
+
+from utils import metrics
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# (endpoint, method) pairs that run searches against the vehicles table
+ADMITTED_ENDPOINTS = {
+    ("index", "POST"),
+    ("api_estimate", "GET"),
+    ("api_estimate", "POST"),
+    ("api_trend", "GET"),
+}
+
+
+class TokenBucketLimiter:
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # client -> (tokens, last refill time), least recently seen first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client: str) -> Tuple[bool, float]:
+        """Take one token for client; returns (allowed, seconds until a token is available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[client] = (tokens, now)
+            # A client forgotten here comes back with a full bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> bool:
+        with self._cond:
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_queue:
+                return False
+
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            # Wake every waiter: the one notified may already have timed out
+            self._cond.notify_all()
+
+
+def client_id(trust_proxy: bool) -> str:
+    if trust_proxy:
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.remote_addr or "unknown"
+
+
+def _reject(status: int, message: str, retry_after: float) -> Response:
+    response = Response(dumps({"error": message}), status=status, mimetype="application/json")
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def register_admission_control(app) -> None:
+    if not app.config.get("ADMISSION_CONTROL_ENABLED", True):
+        return
+
+    rate = app.config.get("RATE_LIMIT_PER_SECOND", 0.0)
+    rate_limiter = None
+    if rate > 0:
+        rate_limiter = TokenBucketLimiter(
+            rate, app.config.get("RATE_LIMIT_BURST", 20), app.config.get("RATE_LIMIT_MAX_CLIENTS", 10000)
+        )
+    concurrency = ConcurrencyLimiter(
+        app.config.get("MAX_CONCURRENT_SEARCHES", 8),
+        app.config.get("ADMISSION_QUEUE_SIZE", 16),
+        app.config.get("ADMISSION_QUEUE_TIMEOUT_SECONDS", 2.0),
+    )
+    trust_proxy = app.config.get("RATE_LIMIT_TRUST_PROXY", False)
+    shed_retry_after = app.config.get("ADMISSION_RETRY_AFTER_SECONDS", 1)
+    app.extensions["admission"] = concurrency
+    proxy_warning = threading.Event()
+
+    @app.before_request
+    def admit_request():
+        if (request.endpoint, request.method) not in ADMITTED_ENDPOINTS:
+            return None
+
+        if rate_limiter is not None:
+            if not trust_proxy and "X-Forwarded-For" in request.headers and not proxy_warning.is_set():
+                proxy_warning.set()
+                logger.warning(
+                    "Rate limiting a forwarded request by the proxy's address: every client behind "
+                    "the proxy shares one bucket. Set RATE_LIMIT_TRUST_PROXY=True if the proxy is trusted."
+                )
+            allowed, retry_after = rate_limiter.acquire(client_id(trust_proxy))
+            if not allowed:
+                metrics.increment("admission.rate_limited")
+                return _reject(429, "Too many requests; slow down and retry", retry_after)
+
+        if not concurrency.acquire():
+            metrics.increment("admission.shed")
+            logger.debug(
+                f"Shedding {request.method} {request.path}: "
+                f"{concurrency.active} active, {concurrency.waiting} queued"
+            )
+            return _reject(503, "Server is busy; retry shortly", shed_retry_after)
+
+        g.admission_slot = True
+        metrics.increment("admission.admitted")
+        return None
+
+    @app.teardown_request
+    def release_slot(exc):
+        if g.pop("admission_slot", False):
+            concurrency.release()
@@ -0,0 +1,19 @@
+import hmac
+
+from flask import request
+
+
+def admin_token_from_request() -> str:
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[len("Bearer "):].strip()
+    return request.headers.get("X-Admin-Token", "")
+
+
+def is_admin(config) -> bool:
+    """True if the current request carries ADMIN_TOKEN; always False when no token is configured."""
+    expected = config.get("ADMIN_TOKEN") or ""
+    supplied = admin_token_from_request()
+    if not expected or not supplied:
+        return False
+    return hmac.compare_digest(supplied.encode("utf-8"), expected.encode("utf-8"))
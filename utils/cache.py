@@ -0,0 +1,184 @@
+"""
+Small key/value caches for precomputed search results.
+
+``memory`` keeps entries in the worker process (LRU with a TTL). ``file`` keeps
+one JSON file per entry under ``CACHE_DIR``, so every gunicorn worker and the
+import worker on a host share the same entries.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Optional, Tuple
+
+from utils.serialization import dumps
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locks on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    shared = False
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def prune(self) -> int:
+        """Drop expired entries; returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at < now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def lock(self, key: str, timeout: float):
+        # Entries are private to this process, which SingleFlight already covers
+        return nullcontext(True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FileCache:
+    shared = True
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key), "rb") as f:
+                entry = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key or entry.get("expires_at", 0) < time.time():
+            return None
+        return entry.get("value")
+
+    def set(self, key: str, value: Any) -> None:
+        entry = {"key": key, "expires_at": time.time() + self.ttl, "value": value}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(dumps(entry))
+            # Readers in other workers see either the old or the new file, never half of one
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not write cache entry: {str(e)}")
+
+    @contextmanager
+    def lock(self, key: str, timeout: float):
+        """Exclusive per-key lock shared by all processes; yields False if it timed out."""
+        if fcntl is None:
+            yield False
+            return
+        with open(self._path(key)[:-5] + ".lock", "w") as f:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        yield False
+                        return
+                    time.sleep(0.01)
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith((".json", ".lock")) and len(name) == 45:
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def prune(self) -> int:
+        """Delete expired entry files, e.g. those of an older data version; returns how many."""
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not (name.endswith(".json") and len(name) == 45):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "rb") as f:
+                    expires_at = json.loads(f.read()).get("expires_at", 0)
+                if expires_at < now:
+                    os.unlink(path)
+                    removed += 1
+            except (OSError, ValueError):
+                pass
+        return removed
+
+    def __len__(self) -> int:
+        return sum(
+            1 for name in os.listdir(self.directory) if name.endswith(".json") and len(name) == 45
+        )
+
+
+_caches: Dict[Tuple, Any] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(config):
+    backend = config.get("CACHE_BACKEND", "memory")
+    ttl = config.get("CACHE_TTL_SECONDS", 600)
+    if backend == "file":
+        key = (backend, config.get("CACHE_DIR") or os.path.join(tempfile.gettempdir(), "carvalue-cache"), ttl)
+    elif backend == "memory":
+        key = (backend, ttl, config.get("CACHE_MAX_ENTRIES", 2048))
+    else:
+        raise ValueError(f"Unknown cache backend: {backend}")
+
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = FileCache(key[1], ttl) if backend == "file" else MemoryCache(ttl, key[2])
+            _caches[key] = cache
+        return cache
@@ -0,0 +1,79 @@
+import gzip
+import logging
+from typing import Optional
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "application/json",
+    "application/javascript",
+}
+
+
+def supported_encodings() -> list:
+    encodings = ["gzip"]
+    if brotli is not None:
+        encodings.insert(0, "br")
+    return encodings
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    return accept_encodings.best_match(supported_encodings())
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    if encoding == "br":
+        # Brotli quality runs 0-11; map the gzip-style level onto it
+        return brotli.compress(data, quality=min(11, max(0, level + 1)))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def register_compression(app) -> None:
+    if not app.config.get("COMPRESSION_ENABLED", True):
+        return
+
+    min_size = app.config.get("COMPRESSION_MIN_SIZE", 500)
+    level = app.config.get("COMPRESSION_LEVEL", 6)
+
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        try:
+            compressed = compress(data, encoding, level)
+        except Exception as e:
+            logger.warning(f"Response compression failed: {str(e)}")
+            return response
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Content-Length"] = str(len(compressed))
+        return response
@@ -0,0 +1,26 @@
+"""
+Process-wide counters.
+
+Counters are per worker process; a scrape of one worker reports that worker's
+numbers only.
+"""
+import threading
+from typing import Dict
+
+_counters: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def increment(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def snapshot() -> Dict[str, float]:
+    with _lock:
+        return dict(_counters)
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,51 @@
+"""
+Hooks for serving from a pre-forked master (gunicorn ``preload_app``).
+
+``preload`` runs once in the master, before any worker is forked. It fills the
+read-only, process-level state every worker would otherwise build for itself:
+dimension ids, the valuation model and the gazetteer. The search cache is
+already warmed by ``create_app``. It then freezes the garbage collector, so the
+collector never writes to those objects' headers and the pages stay shared
+copy-on-write. ``after_fork`` runs in each worker. It drops what must not be
+shared: pooled database connections and the master's counters.
+"""
+import gc
+import logging
+
+from data.dimensions import get_dimension_cache
+from data.gazetteer import get_gazetteer
+from data.models import db
+from data.replicas import get_replica_router
+from services.valuation_model import get_valuation_model
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def preload(app) -> None:
+    with app.app_context():
+        try:
+            pairs = get_dimension_cache().load_all()
+            logger.info(f"Preloaded {pairs} make/model ids")
+        except Exception as e:
+            logger.warning(f"Could not preload dimension ids: {str(e)}")
+            db.session.rollback()
+        finally:
+            db.session.remove()
+    get_valuation_model(app.config.get("VALUATION_MODEL_PATH"))
+    get_gazetteer(app.config.get("GAZETTEER_PATH") or None)
+
+    gc.collect()
+    # Everything allocated so far moves to a generation the collector never scans
+    gc.freeze()
+    logger.info(f"Froze {gc.get_freeze_count()} objects before forking workers")
+
+
+def after_fork(app) -> None:
+    with app.app_context():
+        # close=False leaves the master's sockets alone; the worker opens its own
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    for replica in get_replica_router(app.config).replicas:
+        replica.engine.dispose(close=False)
+    metrics.reset()
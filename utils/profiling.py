@@ -0,0 +1,227 @@
+"""
+Opt-in profiling (``PROFILING_ENABLED``).
+
+Every statement on every engine, primary and replicas alike, is timed through
+SQLAlchemy cursor events. Statements slower than ``SLOW_QUERY_THRESHOLD_MS`` are
+logged with their parameters, together with the database's EXPLAIN plan
+(``SLOW_QUERY_EXPLAIN``). Each statement is explained at most once per
+``SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS``.
+
+Admins (requests carrying ``ADMIN_TOKEN``) can also profile a single request by
+sending ``X-Profile: 1`` or ``?profile=1``. The profile is written to
+``PROFILE_DIR``: pyinstrument HTML if pyinstrument is installed, otherwise a
+cProfile ``.prof`` file. The response names the file in ``X-Profile-Path``.
+"""
+import cProfile
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils import metrics
+from utils.auth import is_admin
+
+try:
+    from pyinstrument import Profiler as InstrumentProfiler
+except ImportError:  # pyinstrument is optional; cProfile is always available
+    InstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "mysql": "EXPLAIN ",
+    "mariadb": "EXPLAIN ",
+    "postgresql": "EXPLAIN ",
+}
+
+
+class QueryProfiler:
+
+    def __init__(self, threshold_ms: float = 200, explain: bool = True,
+                 explain_interval: float = 300, max_param_length: int = 500):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.max_param_length = max_param_length
+        self._explained: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        metrics.increment("db.queries")
+        metrics.increment("db.query_ms", elapsed_ms)
+        if has_request_context():
+            g.query_count = g.get("query_count", 0) + 1
+            g.query_ms = g.get("query_ms", 0.0) + elapsed_ms
+
+        if elapsed_ms < self.threshold_ms:
+            return
+        metrics.increment("db.slow_queries")
+
+        params = repr(parameters)
+        if len(params) > self.max_param_length:
+            params = params[: self.max_param_length] + "..."
+        message = f"Slow query ({elapsed_ms:.1f} ms): {' '.join(statement.split())} | params: {params}"
+
+        plan = self._explain(conn, statement, parameters, context, executemany)
+        if plan:
+            message += "\nEXPLAIN:\n" + plan
+        logger.warning(message)
+
+    def _explain(self, conn, statement, parameters, context, executemany) -> Optional[str]:
+        if not self.explain or executemany:
+            return None
+        if not statement.lstrip()[:6].upper() == "SELECT":
+            return None
+        # A streaming result still owns the connection; don't interleave another query
+        if context is not None and context.execution_options.get("stream_results"):
+            return None
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained.get(statement, float("-inf")) < self.explain_interval:
+                return None
+            self._explained[statement] = now
+            if len(self._explained) > 1000:
+                self._explained.clear()
+
+        try:
+            # Raw DBAPI cursor, so the EXPLAIN is neither re-timed nor re-explained
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"Could not capture EXPLAIN plan: {str(e)}")
+            return None
+        return "\n".join("  " + " | ".join(str(value) for value in row) for row in rows)
+
+
+_profiler: Optional[QueryProfiler] = None
+_install_lock = threading.Lock()
+
+
+def install_query_profiler(profiler: QueryProfiler) -> QueryProfiler:
+    """Time statements on all engines; replaces any profiler installed earlier."""
+    global _profiler
+    with _install_lock:
+        uninstall_query_profiler()
+        event.listen(Engine, "before_cursor_execute", profiler.before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", profiler.after_cursor_execute)
+        _profiler = profiler
+    return profiler
+
+
+def uninstall_query_profiler() -> None:
+    global _profiler
+    if _profiler is None:
+        return
+    event.remove(Engine, "before_cursor_execute", _profiler.before_cursor_execute)
+    event.remove(Engine, "after_cursor_execute", _profiler.after_cursor_execute)
+    _profiler = None
+
+
+def profile_requested() -> bool:
+    flag = request.headers.get("X-Profile") or request.args.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+
+class RequestProfiler:
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._profiler = InstrumentProfiler() if InstrumentProfiler is not None else cProfile.Profile()
+
+    def start(self) -> None:
+        if InstrumentProfiler is not None:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self) -> None:
+        if InstrumentProfiler is not None:
+            if self._profiler.is_running:
+                self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def save(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'request'}-{uuid.uuid4().hex[:8]}"
+        if InstrumentProfiler is not None:
+            path = os.path.join(self.directory, stem + ".html")
+            with open(path, "w") as f:
+                f.write(self._profiler.output_html())
+        else:
+            path = os.path.join(self.directory, stem + ".prof")
+            self._profiler.dump_stats(path)
+        return path
+
+
+def register_profiling(app) -> None:
+    if not app.config.get("PROFILING_ENABLED", False):
+        return
+
+    install_query_profiler(QueryProfiler(
+        threshold_ms=app.config.get("SLOW_QUERY_THRESHOLD_MS", 200),
+        explain=app.config.get("SLOW_QUERY_EXPLAIN", True),
+        explain_interval=app.config.get("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", 300),
+        max_param_length=app.config.get("SLOW_QUERY_MAX_PARAM_LENGTH", 500),
+    ))
+    profile_dir = app.config.get("PROFILE_DIR", "/tmp/carvalue-profiles")
+
+    @app.before_request
+    def start_request_profile():
+        if not profile_requested():
+            return
+        if not is_admin(app.config):
+            logger.info(f"Ignoring profile request from non-admin client {request.remote_addr}")
+            return
+        profiler = RequestProfiler(profile_dir)
+        try:
+            profiler.start()
+        except Exception as e:
+            # e.g. another profiler or a coverage tracer already owns this thread
+            logger.warning(f"Could not start request profile: {str(e)}")
+            return
+        g.request_profiler = profiler
+
+    @app.after_request
+    def save_request_profile(response):
+        profiler = g.pop("request_profiler", None)
+        if profiler is None:
+            return response
+        profiler.stop()
+        try:
+            response.headers["X-Profile-Path"] = profiler.save()
+        except OSError as e:
+            logger.warning(f"Could not save request profile: {str(e)}")
+        response.headers["X-Query-Count"] = str(g.get("query_count", 0))
+        response.headers["X-Query-Time-Ms"] = f"{g.get('query_ms', 0.0):.1f}"
+        return response
+
+    @app.teardown_request
+    def stop_request_profile(exc):
+        # after_request is skipped when the view raises
+        profiler = g.pop("request_profiler", None)
+        if profiler is not None:
+            profiler.stop()
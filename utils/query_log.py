@@ -0,0 +1,169 @@
+"""
+Rolling log of the most frequent search keys.
+
+Each worker counts searches in a count-min sketch and keeps a bounded set of
+heavy-hitter candidates. Every ``QUERY_LOG_FLUSH_EVERY`` searches the candidate
+counts are added to a shared JSON file (``QUERY_LOG_PATH``). Counts in the file
+decay with a half-life of ``QUERY_LOG_HALF_LIFE_SECONDS``, so old searches stop
+counting. Warmup reads the top keys from that file.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: flushes are not serialized between processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# (year, make, model, state, near, radius) with names normalized
+QueryKey = Tuple[int, str, str, str, str, str]
+
+_MASK64 = (1 << 64) - 1
+
+
+def normalize_query(year: int, make: str, model: str, state: str = "",
+                    near: str = "", radius: str = "") -> QueryKey:
+    return (
+        int(year),
+        " ".join(make.lower().split()),
+        " ".join(model.lower().split()),
+        state.strip().upper(),
+        " ".join(near.lower().split()),
+        radius.strip() if near.strip() else "",
+    )
+
+
+class CountMinSketch:
+    """Frequency estimates that never undercount, in ``depth * width`` counters."""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self._rows = np.arange(depth)
+
+    def _columns(self, key) -> np.ndarray:
+        # Double hashing: column_i = h1 + i * h2, from one 64-bit hash of the key
+        h = hash(key) & _MASK64
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return (h1 + self._rows * h2) % self.width
+
+    def add(self, key, count: int = 1) -> int:
+        columns = self._columns(key)
+        self.table[self._rows, columns] += count
+        return int(self.table[self._rows, columns].min())
+
+    def estimate(self, key) -> int:
+        return int(self.table[self._rows, self._columns(key)].min())
+
+    def reset(self) -> None:
+        self.table.fill(0)
+
+
+class QueryLog:
+
+    def __init__(self, config):
+        self.top_k = config.get("QUERY_LOG_TOP_K", 100)
+        self.flush_every = config.get("QUERY_LOG_FLUSH_EVERY", 50)
+        self.half_life = config.get("QUERY_LOG_HALF_LIFE_SECONDS", 86400)
+        self.path = config.get("QUERY_LOG_PATH")
+        self.sketch = CountMinSketch()
+        self._candidates: Dict[QueryKey, int] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def record(self, key: QueryKey) -> None:
+        flush = False
+        with self._lock:
+            self._candidates[key] = self.sketch.add(key)
+            if len(self._candidates) > 2 * self.top_k:
+                self._prune(self._candidates, self.top_k)
+            self._pending += 1
+            if self.path and self._pending >= self.flush_every:
+                flush = True
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            local = self._candidates
+            self._candidates = {}
+            self._pending = 0
+            self.sketch.reset()
+        if not self.path or not local:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".lock", "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                counts = self._load()
+                for key, count in local.items():
+                    counts[key] = counts.get(key, 0.0) + count
+                self._prune(counts, self.top_k)
+                self._save(counts)
+        except OSError as e:
+            logger.warning(f"Could not update query log: {str(e)}")
+
+    def top(self, n: int) -> List[Tuple[QueryKey, float]]:
+        """Most frequent keys, combining the shared log with this worker's unflushed counts."""
+        counts = self._load() if self.path else {}
+        with self._lock:
+            for key, count in self._candidates.items():
+                counts[key] = counts.get(key, 0.0) + count
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+    def _load(self) -> Dict[QueryKey, float]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        decay = 0.5 ** (max(0.0, time.time() - data.get("updated_at", 0)) / self.half_life)
+        return {
+            (int(entry[0]), *entry[1:6]): entry[6] * decay
+            for entry in data.get("entries", [])
+        }
+
+    def _save(self, counts: Dict[QueryKey, float]) -> None:
+        entries = [[*key, round(count, 3)] for key, count in counts.items()]
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"updated_at": time.time(), "entries": entries}, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _prune(counts: Dict, keep: int) -> None:
+        if len(counts) <= keep:
+            return
+        for key, _ in sorted(counts.items(), key=lambda item: item[1])[: len(counts) - keep]:
+            del counts[key]
+
+
+_logs: Dict[Tuple, QueryLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_query_log(config) -> QueryLog:
+    key = (
+        config.get("QUERY_LOG_PATH"),
+        config.get("QUERY_LOG_TOP_K", 100),
+        config.get("QUERY_LOG_FLUSH_EVERY", 50),
+        config.get("QUERY_LOG_HALF_LIFE_SECONDS", 86400),
+    )
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = QueryLog(config)
+            _logs[key] = log
+        return log
@@ -0,0 +1,32 @@
+import json
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+LISTING_COLUMNS = ("id", "price", "mileage", "location")
+
+
+def _default(value: Any) -> Any:
+    # numpy scalars (e.g. regression output from scipy) and similar types
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def listings_to_columns(listings: List[dict]) -> Dict[str, Any]:
+    columns = {
+        name: [listing.get(name) for listing in listings] for name in LISTING_COLUMNS
+    }
+    columns["count"] = len(listings)
+    return columns
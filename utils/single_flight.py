@@ -0,0 +1,63 @@
+"""
+Per-process request coalescing.
+
+Concurrent calls with the same key share one execution: the first caller runs
+the function and the others wait for its result instead of repeating the work.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+
+    def __init__(self, name: str, timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Run fn() once for all concurrent callers with this key and return its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            metrics.increment(f"{self.name}.coalesced")
+            if not call.done.wait(self.timeout if timeout is None else timeout):
+                # The leader is stuck; stop waiting and do the work ourselves
+                metrics.increment(f"{self.name}.wait_timeouts")
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.increment(f"{self.name}.executed")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)